@@ -13,7 +13,16 @@ class Settings:
     NVIDIA_API_KEY: str = os.getenv("NVIDIA_API_KEY")
     API_KEY:str= os.getenv("api_key")  # Added default value
     DEBUG: bool = ENV == "development"
-    DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # postgresql://... (psycopg2 / asyncpg) or sqlite:///path (aiosqlite) for development
+    DATABASE_URL: str = os.getenv(
+        "DATABASE_URL", "sqlite:///" + os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "webagent.db")
+    )
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "300"))
+    DB_CONNECT_RETRIES: int = int(os.getenv("DB_CONNECT_RETRIES", "3"))
+    DB_RETRY_DELAY: float = float(os.getenv("DB_RETRY_DELAY", "0.5"))
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "supersecretkey")
     SECRET_KEY: str = os.getenv("SECRET_KEY", "anotherdefaultsecretkey")  # Added default value
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "120"))
@@ -22,6 +31,141 @@ class Settings:
 
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
+    # GET /api/metrics requires "Authorization: Bearer <METRICS_TOKEN>"; unset, the endpoint is off
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
+    # Shared LLM client pool
+    LLM_CLIENT_CACHE_SIZE: int = int(os.getenv("LLM_CLIENT_CACHE_SIZE", "256"))
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))
+    # Pre-open connections to the known upstreams at startup and ping them every interval
+    LLM_WARMUP_ENABLED: bool = os.getenv("LLM_WARMUP_ENABLED", "true").lower() == "true"
+    LLM_WARMUP_INTERVAL: float = float(os.getenv("LLM_WARMUP_INTERVAL", "60"))
+
+    # Provider routing: comma-separated provider:model routes in preference order.
+    # nvidia uses the user's key, openrouter the server's api_key; extra
+    # OpenAI-compatible providers are added as name=base_url (user's key).
+    # Text generations are billed to the user, so the default has no
+    # server-key route; adding e.g. openrouter:moonshotai/kimi-k2 as a
+    # second route lets the server's key pay for hedges and failovers.
+    LLM_ROUTES: str = os.getenv("LLM_ROUTES", "nvidia:moonshotai/kimi-k2-instruct")
+    LLM_VISION_ROUTES: str = os.getenv("LLM_VISION_ROUTES", "openrouter:Qwen/Qwen2.5-VL-72B-Instruct")
+    LLM_PROVIDERS: str = os.getenv("LLM_PROVIDERS", "")
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "90"))
+    LLM_HEDGE_MIN_DELAY: float = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+    LLM_HEDGE_DEFAULT_DELAY: float = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "4"))
+    LLM_ROUTER_EWMA_ALPHA: float = float(os.getenv("LLM_ROUTER_EWMA_ALPHA", "0.2"))
+    LLM_ROUTER_COOLDOWN: float = float(os.getenv("LLM_ROUTER_COOLDOWN", "30"))
+
+    # SSE frame coalescing
+    STREAM_FLUSH_BYTES: int = int(os.getenv("STREAM_FLUSH_BYTES", "2048"))
+    STREAM_FLUSH_INTERVAL_MS: int = int(os.getenv("STREAM_FLUSH_INTERVAL_MS", "50"))
+    STREAM_DISCONNECT_POLL_MS: int = int(os.getenv("STREAM_DISCONNECT_POLL_MS", "250"))
+
+    # CPU executor pools (bcrypt, image decode/encode) kept off the event loop
+    CPU_HASH_WORKERS: int = int(os.getenv("CPU_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+    CPU_IMAGE_WORKERS: int = int(os.getenv("CPU_IMAGE_WORKERS", str(os.cpu_count() or 1)))
+
+    # Authenticated-user cache; the generations file is shared by all workers on the host
+    USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", "60"))
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+    USER_CACHE_GENERATIONS_PATH: str = os.getenv(
+        "USER_CACHE_GENERATIONS_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "user_cache.gen")
+    )
+
+    # Admission control for generations, shared by all workers on the host
+    SCHEDULER_ENABLED: bool = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+    SCHEDULER_DB_PATH: str = os.getenv(
+        "SCHEDULER_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "scheduler.sqlite3")
+    )
+    SCHEDULER_GLOBAL_SLOTS: int = int(os.getenv("SCHEDULER_GLOBAL_SLOTS", "32"))
+    SCHEDULER_USER_SLOTS: int = int(os.getenv("SCHEDULER_USER_SLOTS", "2"))
+    SCHEDULER_RATE_PER_MINUTE: float = float(os.getenv("SCHEDULER_RATE_PER_MINUTE", "10"))
+    SCHEDULER_BURST: float = float(os.getenv("SCHEDULER_BURST", "5"))
+    SCHEDULER_MAX_QUEUE: int = int(os.getenv("SCHEDULER_MAX_QUEUE", "100"))
+    SCHEDULER_MAX_WAIT: float = float(os.getenv("SCHEDULER_MAX_WAIT", "30"))
+    SCHEDULER_LEASE_TTL: float = float(os.getenv("SCHEDULER_LEASE_TTL", "60"))
+    SCHEDULER_MAX_HOLD: float = float(os.getenv("SCHEDULER_MAX_HOLD", "1800"))
+    # Seconds a streamed response has to start before its slot is given back
+    SCHEDULER_START_TIMEOUT: float = float(os.getenv("SCHEDULER_START_TIMEOUT", "30"))
+    SCHEDULER_POLL_MS: int = int(os.getenv("SCHEDULER_POLL_MS", "100"))
+
+    # Background generation jobs and their resumable event logs
+    JOBS_DB_PATH: str = os.getenv(
+        "JOBS_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "jobs.sqlite3")
+    )
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", "4"))
+    JOBS_POLL_INTERVAL_MS: int = int(os.getenv("JOBS_POLL_INTERVAL_MS", "250"))
+    JOBS_STALE_AFTER: float = float(os.getenv("JOBS_STALE_AFTER", "120"))
+    JOBS_RETENTION: float = float(os.getenv("JOBS_RETENTION", str(24 * 3600)))
+
+    # Project version store: a full snapshot at least every N versions
+    VERSION_SNAPSHOT_INTERVAL: int = int(os.getenv("VERSION_SNAPSHOT_INTERVAL", "10"))
+
+    # Truncated full generations are continued rather than regenerated
+    GENERATION_MAX_CONTINUATIONS: int = int(os.getenv("GENERATION_MAX_CONTINUATIONS", "3"))
+    GENERATION_CONTINUATION_TAIL_CHARS: int = int(os.getenv("GENERATION_CONTINUATION_TAIL_CHARS", "4000"))
+
+    # Parallel (section-wise) full generations
+    PARALLEL_CONCURRENCY: int = int(os.getenv("PARALLEL_CONCURRENCY", "4"))
+    # Seconds to wait for each extra scheduler slot before running on fewer
+    PARALLEL_SLOT_WAIT: float = float(os.getenv("PARALLEL_SLOT_WAIT", "0.5"))
+    PARALLEL_MAX_SECTIONS: int = int(os.getenv("PARALLEL_MAX_SECTIONS", "8"))
+    PARALLEL_PLAN_MAX_TOKENS: int = int(os.getenv("PARALLEL_PLAN_MAX_TOKENS", "2000"))
+    PARALLEL_SECTION_MAX_TOKENS: int = int(os.getenv("PARALLEL_SECTION_MAX_TOKENS", "12000"))
+
+    # /api/generate-component: in-memory LRU in front of the component_cache table
+    COMPONENT_CACHE_MAX_ENTRIES: int = int(os.getenv("COMPONENT_CACHE_MAX_ENTRIES", "1024"))
+    COMPONENT_MAX_TOKENS: int = int(os.getenv("COMPONENT_MAX_TOKENS", "4000"))
+
+    # Near-duplicate prompt index: reuse ("off", "return" or "edit") of the
+    # site generated for a similar earlier prompt
+    PROMPT_INDEX_ENABLED: bool = os.getenv("PROMPT_INDEX_ENABLED", "true").lower() == "true"
+    PROMPT_INDEX_PATH: str = os.getenv(
+        "PROMPT_INDEX_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "prompt_index.sqlite3")
+    )
+    PROMPT_INDEX_MAX_ENTRIES: int = int(os.getenv("PROMPT_INDEX_MAX_ENTRIES", "100000"))
+    PROMPT_INDEX_REUSE: str = os.getenv("PROMPT_INDEX_REUSE", "off")
+    PROMPT_INDEX_RETURN_THRESHOLD: float = float(os.getenv("PROMPT_INDEX_RETURN_THRESHOLD", "0.9"))
+    PROMPT_INDEX_EDIT_THRESHOLD: float = float(os.getenv("PROMPT_INDEX_EDIT_THRESHOLD", "0.6"))
+
+    # Published sites (/sites/{slug}): precompressed files per HTML hash
+    SITES_DIR: str = os.getenv("SITES_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "sites"))
+    SITES_CACHE_CONTROL: str = os.getenv("SITES_CACHE_CONTROL", "public, max-age=60, must-revalidate")
+    SITES_LOOKUP_TTL: float = float(os.getenv("SITES_LOOKUP_TTL", "5"))
+
+    # Edit prompts: documents above CONTEXT_SLICE_MIN_CHARS are sliced
+    CONTEXT_SLICE_MIN_CHARS: int = int(os.getenv("CONTEXT_SLICE_MIN_CHARS", "20000"))
+    CONTEXT_SLICE_BUDGET: int = int(os.getenv("CONTEXT_SLICE_BUDGET", "12000"))
+    CONTEXT_FRAGMENT_MAX_CHARS: int = int(os.getenv("CONTEXT_FRAGMENT_MAX_CHARS", "6000"))
+
+    # Image preprocessing before analysis: fit, tile and re-encode uploads
+    IMAGE_PREPROCESS: bool = os.getenv("IMAGE_PREPROCESS", "true").lower() == "true"
+    IMAGE_MAX_DIMENSION: int = int(os.getenv("IMAGE_MAX_DIMENSION", "1344"))
+    IMAGE_TILE_MAX_ASPECT: float = float(os.getenv("IMAGE_TILE_MAX_ASPECT", "1.5"))
+    IMAGE_MAX_TILES: int = int(os.getenv("IMAGE_MAX_TILES", "4"))
+    IMAGE_FORMAT: str = os.getenv("IMAGE_FORMAT", "auto")  # auto, webp, jpeg or png
+    IMAGE_TARGET_BYTES: int = int(os.getenv("IMAGE_TARGET_BYTES", str(300 * 1024)))
+    IMAGE_BATCH_MAX_FILES: int = int(os.getenv("IMAGE_BATCH_MAX_FILES", "20"))
+    IMAGE_BATCH_CONCURRENCY: int = int(os.getenv("IMAGE_BATCH_CONCURRENCY", "3"))  # per user
+
+    # Exact-match generation cache
+    GENERATION_CACHE_MAX_BYTES: int = int(os.getenv("GENERATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    GENERATION_CACHE_TTL: float = float(os.getenv("GENERATION_CACHE_TTL", str(24 * 3600)))
+    GENERATION_CACHE_DISK_MAX_BYTES: int = int(os.getenv("GENERATION_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+    GENERATION_CACHE_DIR: str = os.getenv(
+        "GENERATION_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "generation_cache")
+    )
+
+    # Perceptual-hash cache of image analyses
+    IMAGE_CACHE_ENABLED: bool = os.getenv("IMAGE_CACHE_ENABLED", "true").lower() == "true"
+    IMAGE_CACHE_MAX_DISTANCE: int = int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", "6"))  # Hamming bits out of 64
+    IMAGE_CACHE_MAX_ENTRIES: int = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "100000"))
+    IMAGE_CACHE_PATH: str = os.getenv(
+        "IMAGE_CACHE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "image_cache.sqlite3")
+    )
+
 
 settings = Settings()
 
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from backend.core import metrics
+from backend.core.config import settings
+
+
+class CpuPool:
+    """
+    A bounded thread pool for CPU-heavy calls that would otherwise block the
+    event loop. bcrypt and Pillow release the GIL while they work, so
+    threads give real parallelism without pickling arguments to a process
+    pool.
+
+    Reports cpu.<name>.queued / running gauges and task count, queue wait
+    and run time counters (seconds, summed) to the metrics registry.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = self._new_executor()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        metrics.register_gauge(f"cpu.{name}.workers", lambda: max_workers)
+        metrics.register_gauge(f"cpu.{name}.queued", lambda: self._queued)
+        metrics.register_gauge(f"cpu.{name}.running", lambda: self._running)
+
+    def _new_executor(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"cpu-{self.name}")
+
+    def _submit(self, fn, args, kwargs):
+        submitted = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self._running -= 1
+                metrics.inc(f"cpu.{self.name}.tasks")
+                metrics.inc(f"cpu.{self.name}.wait_seconds", started - submitted)
+                metrics.inc(f"cpu.{self.name}.run_seconds", finished - started)
+
+        future = self._executor.submit(task)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future) -> None:
+        # Cancelled before a worker picked it up (caller went away)
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn in the pool and await its result from async code."""
+        return await asyncio.wrap_future(self._submit(fn, args, kwargs))
+
+    def shutdown(self) -> None:
+        """Drop queued work and stop the workers; the pool starts fresh if the app starts again."""
+        executor, self._executor = self._executor, self._new_executor()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+hash_pool = CpuPool("hash", settings.CPU_HASH_WORKERS)
+image_pool = CpuPool("image", settings.CPU_IMAGE_WORKERS)
+
+
+def shutdown() -> None:
+    hash_pool.shutdown()
+    image_pool.shutdown()
@@ -0,0 +1,58 @@
+import gzip
+import hashlib
+from typing import Optional
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for GET/HEAD)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def accepts_encoding(request: Request, encoding: str) -> bool:
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == encoding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class Bundle:
+    """
+    A response body computed once: the identity bytes, a gzip variant and
+    a strong ETag, so serving it is a header check and a memory copy.
+    """
+
+    __slots__ = ("body", "gzipped", "etag", "media_type", "cache_control")
+
+    def __init__(self, body: bytes, media_type: str = "application/json", cache_control: str = "no-cache"):
+        self.body = body
+        self.gzipped = gzip.compress(body, 9, mtime=0)
+        self.etag = strong_etag(body)
+        self.media_type = media_type
+        self.cache_control = cache_control
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+        if len(self.gzipped) < len(self.body) and accepts_encoding(request, "gzip"):
+            headers["Content-Encoding"] = "gzip"
+            return Response(self.gzipped, media_type=self.media_type, headers=headers)
+        return Response(self.body, media_type=self.media_type, headers=headers)
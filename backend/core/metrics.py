@@ -0,0 +1,32 @@
+import threading
+from typing import Callable, Dict
+
+# Process-local counters and gauges, served by GET /api/metrics.
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, Callable[[], float]] = {}
+
+
+def inc(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def register_gauge(name: str, fn: Callable[[], float]) -> None:
+    """
+    Register a callable that is sampled every time metrics are read.
+    """
+    with _lock:
+        _gauges[name] = fn
+
+
+def snapshot() -> dict:
+    with _lock:
+        data = dict(_counters)
+        gauges = dict(_gauges)
+    for name, fn in gauges.items():
+        try:
+            data[name] = fn()
+        except Exception:
+            data[name] = None
+    return data
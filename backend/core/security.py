@@ -1,14 +1,17 @@
 from datetime import datetime, timedelta
 # from jose import jwt  # Removed due to import error; using 'import jwt' instead
 from passlib.context import CryptContext
+import secrets
 from typing import Optional
-from fastapi import Depends, HTTPException, status
-from backend.db.session import get_db
+from fastapi import Depends, Header, HTTPException, status
+from backend.db.session import get_async_db, get_async_db_with_retry
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from backend.core.config import settings
 from backend.crud import crud_user
+from backend.schemas.user import CurrentUser
+from backend.core.user_cache import cache as user_cache
 import jwt  # Using PyJWT for JWT operations
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login")
@@ -68,7 +71,7 @@ def decode_token(token: str) -> dict:
         )
 
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+def get_current_user_id(token: str = Depends(oauth2_scheme)) -> str:
     try:
         payload = verify_token(token)
         user_id = payload.get("sub")
@@ -82,11 +85,61 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
         )
+    return user_id
 
-    user = crud_user.get_user(db, user_id=user_id)
+
+async def get_current_user(db: AsyncSession = Depends(get_async_db), user_id: str = Depends(get_current_user_id)):
+    user = await crud_user.get_user(db, user_id=user_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
     return user
+
+
+async def _load_user_snapshot(user_id: str) -> CurrentUser:
+    async with get_async_db_with_retry() as db:
+        user = await crud_user.get_user(db, user_id=user_id)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
+            )
+        return CurrentUser.model_validate(user)
+
+
+async def get_current_user_snapshot(user_id: str = Depends(get_current_user_id)) -> CurrentUser:
+    """
+    Resolve the authenticated user from the user cache, or in a short-lived
+    session on a miss.
+
+    Routes that only need id, name and api_key use this instead of
+    get_current_user: cache hits skip the database entirely, and a miss
+    returns the pooled connection before the route (or its
+    StreamingResponse) runs.
+    """
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    generation = user_cache.generations.get(user_id)
+    user = await _load_user_snapshot(user_id)
+    user_cache.put(user_id, user, generation)
+    return user
+
+
+def require_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Guard for operational endpoints: the request must carry the configured
+    METRICS_TOKEN as a bearer token. Without a configured token the
+    endpoint does not exist.
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.strip().encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,114 @@
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional
+from backend.core import metrics
+from backend.core.config import settings
+from backend.schemas.user import CurrentUser
+
+GENERATION_SLOTS = 4096
+_SLOT = struct.Struct("<Q")
+
+
+class SharedGenerations:
+    """
+    Invalidation counters shared by every worker on the host through a
+    memory-mapped file. User ids hash into one of GENERATION_SLOTS slots;
+    invalidating a user bumps its slot and makes every worker's cached copy
+    (stamped with the old value) stale.
+
+    The bump is a plain read-modify-write: two workers racing on the same
+    slot may both write old + 1, which still differs from what the cached
+    entries were stamped with, so no cross-process lock is needed.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self._map = None
+        self._local = [0] * GENERATION_SLOTS
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                size = GENERATION_SLOTS * _SLOT.size
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                self._map = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def _slot(user_id: str) -> int:
+        return zlib.crc32(user_id.encode("utf-8")) % GENERATION_SLOTS
+
+    def get(self, user_id: str) -> int:
+        slot = self._slot(user_id)
+        if self._map is None:
+            return self._local[slot]
+        return _SLOT.unpack_from(self._map, slot * _SLOT.size)[0]
+
+    def bump(self, user_id: str) -> None:
+        slot = self._slot(user_id)
+        if self._map is None:
+            self._local[slot] += 1
+            return
+        offset = slot * _SLOT.size
+        value = _SLOT.unpack_from(self._map, offset)[0]
+        _SLOT.pack_into(self._map, offset, (value + 1) & 0xFFFFFFFFFFFFFFFF)
+
+
+class UserCache:
+    """TTL + LRU cache of CurrentUser snapshots keyed by user id."""
+
+    def __init__(self, ttl: float, max_entries: int, generations: SharedGenerations):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generations = generations
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (expires_at, generation, user)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str) -> Optional[CurrentUser]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, generation, user = entry
+                if expires_at > time.monotonic() and generation == self.generations.get(user_id):
+                    self._entries.move_to_end(user_id)
+                    metrics.inc("user_cache.hits")
+                    return user
+                del self._entries[user_id]
+        metrics.inc("user_cache.misses")
+        return None
+
+    def put(self, user_id: str, user: CurrentUser, generation: int) -> None:
+        """
+        Store a snapshot loaded after reading generation, so an invalidation
+        that lands while the row is being fetched leaves the entry stale.
+        """
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, generation, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        self.generations.bump(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+        metrics.inc("user_cache.invalidations")
+
+
+cache = UserCache(
+    settings.USER_CACHE_TTL,
+    settings.USER_CACHE_MAX_ENTRIES,
+    SharedGenerations(settings.USER_CACHE_GENERATIONS_PATH),
+)
+metrics.register_gauge("user_cache.entries", lambda: len(cache))
@@ -0,0 +1,62 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from backend.db.models import Project, ProjectVersion
+from backend.services.html_store import put_html
+import uuid
+
+
+def get_project(db: Session, project_id, user_id):
+    result = db.execute(
+        select(Project).where(Project.id == project_id, Project.user_id == user_id)
+    )
+    return result.scalar_one_or_none()
+
+
+def list_projects(db: Session, user_id):
+    result = db.execute(
+        select(Project).where(Project.user_id == user_id).order_by(Project.created_at.desc())
+    )
+    return result.scalars().all()
+
+
+def create_project(db: Session, user_id, name: str):
+    project = Project(id=uuid.uuid4(), user_id=user_id, name=name[:200])
+    db.add(project)
+    db.flush()
+    return project
+
+
+def get_version(db: Session, project: Project, version_id=None):
+    """Return the given version of project, or its head when version_id is None."""
+    version_id = version_id or project.head_version_id
+    if version_id is None:
+        return None
+    result = db.execute(
+        select(ProjectVersion).where(
+            ProjectVersion.id == version_id,
+            ProjectVersion.project_id == project.id,
+        )
+    )
+    return result.scalar_one_or_none()
+
+
+def create_version(db: Session, project: Project, html: str, prompt: str, parent: ProjectVersion = None):
+    number = db.execute(
+        select(ProjectVersion.number)
+        .where(ProjectVersion.project_id == project.id)
+        .order_by(ProjectVersion.number.desc())
+        .limit(1)
+    ).scalar_one_or_none() or 0
+    version = ProjectVersion(
+        id=uuid.uuid4(),
+        project_id=project.id,
+        parent_id=parent.id if parent else None,
+        number=number + 1,
+        prompt=prompt,
+        html_hash=put_html(db, html, parent.html_hash if parent else None),
+    )
+    db.add(version)
+    project.head_version_id = version.id
+    db.commit()
+    db.refresh(version)
+    return version
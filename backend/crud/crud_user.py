@@ -1,25 +1,48 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from backend.db.models import User
 from backend.schemas.user import UserCreate
 import uuid
 
 
+def _as_uuid(user_id):
+    if isinstance(user_id, uuid.UUID):
+        return user_id
+    try:
+        return uuid.UUID(str(user_id))
+    except ValueError:
+        return None
 
 
-def get_user(db: Session, user_id: str):
-    result =  db.execute(select(User).where(User.id == user_id))
+async def get_user(db: AsyncSession, user_id):
+    user_id = _as_uuid(user_id)
+    if user_id is None:
+        return None
+    result = await db.execute(select(User).where(User.id == user_id))
     return result.scalar_one_or_none()
 
 
-def create_user(db: Session, user: UserCreate):
+async def get_user_by_name(db: AsyncSession, name: str):
+    result = await db.execute(select(User).where(User.name == name))
+    return result.scalar_one_or_none()
+
+
+async def create_user(db: AsyncSession, user: UserCreate, password_hash: str):
     db_user = User(
         id=uuid.uuid4(),
         name=user.name,
-        password_hash=user.password,
+        password_hash=password_hash,
         api_key=user.api_key,    
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
+
+
+async def update_api_key(db: AsyncSession, user: User, api_key: str):
+    user.api_key = api_key
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, String
+from sqlalchemy import Column, String, Integer, Text, DateTime, LargeBinary, ForeignKey
 from sqlalchemy.orm import relationship
 from backend.db.base import Base
 import uuid
+from datetime import datetime
 from sqlalchemy.dialects.postgresql import UUID
 
 
@@ -13,3 +14,74 @@ class User(Base):
     password_hash = Column(String(100), nullable=False)
     api_key = Column(String(100), nullable=False)
 
+
+
+class Project(Base):
+    __tablename__ = "projects"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    name = Column(String(200), nullable=False)
+    head_version_id = Column(UUID(as_uuid=True), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    versions = relationship("ProjectVersion", back_populates="project", order_by="ProjectVersion.number")
+
+
+class ProjectVersion(Base):
+    __tablename__ = "project_versions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False, index=True)
+    parent_id = Column(UUID(as_uuid=True), nullable=True)
+    number = Column(Integer, nullable=False)
+    prompt = Column(Text, nullable=True)
+    html_hash = Column(String(64), ForeignKey("html_blobs.hash"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    project = relationship("Project", back_populates="versions")
+
+
+class HtmlBlob(Base):
+    """
+    Content-addressed, zlib-compressed HTML. A blob is either a full
+    snapshot or a line delta against base_hash; depth counts the deltas
+    since the last snapshot so reads never replay a long chain.
+    """
+    __tablename__ = "html_blobs"
+
+    hash = Column(String(64), primary_key=True)  # sha256 of the full HTML
+    kind = Column(String(8), nullable=False)  # "full" or "delta"
+    base_hash = Column(String(64), nullable=True)
+    depth = Column(Integer, nullable=False, default=0)
+    size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+
+class ComponentCacheEntry(Base):
+    """
+    A generated component, keyed by the hash of its request (type,
+    description, style, model routes); the HTML itself is a blob in
+    html_blobs, so identical output is stored once.
+    """
+    __tablename__ = "component_cache"
+
+    key = Column(String(64), primary_key=True)
+    component_type = Column(String(50), nullable=False)
+    html_hash = Column(String(64), ForeignKey("html_blobs.hash"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PublishedSite(Base):
+    """
+    A project published under a stable /sites/{slug} URL. Republishing
+    points the slug at another version; the served files are addressed by
+    html_hash.
+    """
+    __tablename__ = "published_sites"
+
+    slug = Column(String(32), primary_key=True)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False, unique=True)
+    version_id = Column(UUID(as_uuid=True), nullable=False)
+    html_hash = Column(String(64), ForeignKey("html_blobs.hash"), nullable=False)
+    published_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,17 +1,41 @@
 # main.py
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from backend.routes.generate import router as generate_router
 from backend.routes.image_to_website import router as image_to_website_router
 from backend.routes.user import router as user_router
+from backend.routes.metrics import router as metrics_router
+from backend.routes.projects import router as projects_router
+from backend.routes.jobs import router as jobs_router
+from backend.routes.templates import router as templates_router
+from backend.routes.sites import router as sites_router
 from backend.db.base import Base  # Import Base
 from backend.db.session import engine # Import engine
+from backend.services import llm_clients, jobs, templates
+from backend.core import executor
+from backend.core.config import settings
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="WebAgent AI World-Class Website Builder", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = asyncio.create_task(llm_clients.keep_warm()) if settings.LLM_WARMUP_ENABLED else None
+    templates.get_library()  # build the template bundles before the first request
+    await jobs.get_runner().start()
+    yield
+    await jobs.get_runner().stop()
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await llm_clients.close_all()
+    executor.shutdown()
+
+
+app = FastAPI(title="WebAgent AI World-Class Website Builder", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,3 +48,8 @@ app.add_middleware(
 app.include_router(generate_router)
 app.include_router(image_to_website_router)
 app.include_router(user_router)
+app.include_router(projects_router)
+app.include_router(jobs_router)
+app.include_router(templates_router)
+app.include_router(sites_router)
+app.include_router(metrics_router)
@@ -3,11 +3,11 @@
 from fastapi import APIRouter, Request, HTTPException, Depends
 from fastapi.responses import JSONResponse, StreamingResponse
 from backend.services.website_generator import generate_html_stream
+from backend.services.projects import ProjectNotFound
+from backend.services import scheduler
 import logging
-from backend.db.session import get_db
-from backend.core.security import get_current_user
-from backend.db.models import User # Import the User model
-from sqlalchemy.orm import Session # Import Session
+from backend.core.security import get_current_user_snapshot
+from backend.schemas.user import CurrentUser
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -15,21 +15,61 @@ logger = logging.getLogger(__name__)
 @router.post("/api/generate")
 async def generate_website(
     request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user_snapshot)
 ):
     try:
         body = await request.json()
         prompt = body.get("prompt", "").strip()
         previous_html = body.get("previous_html")
         previous_prompt = body.get("previous_prompt")
+        edit_output = body.get("edit_output", "document")  # "document" or "diff"
+        project_id = body.get("project_id")
+        version_id = body.get("version_id")
+        mode = body.get("mode", "single")  # "single" or "parallel" (full generations only)
+        reuse = body.get("reuse")  # "off", "return" or "edit" (full generations only)
 
         if not prompt:
             return JSONResponse(status_code=400, content={"error": "Prompt is required"})
-            
-        stream = await generate_html_stream(prompt, db, current_user, previous_html, previous_prompt)
-        return StreamingResponse(stream, media_type="text/event-stream")
+        if mode not in ("single", "parallel"):
+            return JSONResponse(status_code=400, content={"error": f"Unknown mode: {mode}"})
+        if reuse not in (None, "off", "return", "edit"):
+            return JSONResponse(status_code=400, content={"error": f"Unknown reuse: {reuse}"})
 
+        # Edits are short; they go ahead of full-site generations in the queue
+        priority = scheduler.PRIORITY_EDIT if previous_html or project_id else scheduler.PRIORITY_FULL
+        try:
+            lease = await scheduler.acquire(current_user.id, priority)
+        except scheduler.Rejected as e:
+            return scheduler.rejection_response(e)
+
+        try:
+            stream = await generate_html_stream(
+                prompt,
+                current_user,
+                previous_html,
+                previous_prompt,
+                request=request,
+                edit_output=edit_output,
+                project_id=project_id,
+                version_id=version_id,
+                lease=lease,
+                mode=mode,
+                reuse=reuse,
+            )
+        except BaseException:
+            await lease.release()
+            raise
+        return StreamingResponse(
+            stream,
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",  # Disable nginx buffering
+            }
+        )
+
+    except ProjectNotFound as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
     except Exception as e:
         logger.error(f"Generation error: {str(e)}")
         return JSONResponse(status_code=500, content={"error": str(e)})
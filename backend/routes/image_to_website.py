@@ -1,15 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status,Body
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, status, Body, Request
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from PIL import Image
-import io
+from typing import List
 import logging
-import tempfile
-import os
+from PIL import Image
 from backend.schemas.token import DescriptionRequest
-from backend.db.session import get_db
-from backend.core.security import get_current_user
-from backend.db.models import User
+from backend.core.security import get_current_user_snapshot
+from backend.schemas.user import CurrentUser
+from backend.core.config import settings
+from backend.core.executor import image_pool
+from backend.services.streaming import sse_stream
+from backend.services import scheduler
+from backend.services.image_pipeline import (
+    read_upload, prepare_image, is_archive, expand_archive, ImageTooLarge, InvalidImage, TooManyImages
+)
 
 router = APIRouter(tags=["image-to-website"])
 logger = logging.getLogger(__name__)
@@ -17,12 +20,12 @@ logger = logging.getLogger(__name__)
 # Allowed image file types
 ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/jpg", "image/png", "image/webp", "image/gif"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_ARCHIVE_SIZE = 50 * 1024 * 1024  # 50MB
 
 @router.post("/api/analyze-image")
 async def analyze_uploaded_image(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user_snapshot)
 ):
     """
     Analyze an uploaded image and return a description without generating code.
@@ -36,61 +39,60 @@ async def analyze_uploaded_image(
                 detail=f"Invalid file type. Allowed types: {', '.join(ALLOWED_IMAGE_TYPES)}"
             )
         
-        # Read and validate file size
-        file_content = await file.read()
-        if len(file_content) > MAX_FILE_SIZE:
+        # Read the upload in chunks, enforcing the size limit while reading
+        try:
+            file_content = await read_upload(file, MAX_FILE_SIZE)
+        except ImageTooLarge:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"File size too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
             )
         
-        # Convert to PIL Image and validate
+        # Decode, resize and re-encode once, in memory, off the event loop
         try:
-            image = Image.open(io.BytesIO(file_content))
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-        except Exception as e:
+            image = await image_pool.run(prepare_image, file_content)
+        except (InvalidImage, OSError, Image.DecompressionBombError) as e:
             logger.error(f"Error processing image: {str(e)}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid image file or unsupported format"
             )
         
-        # Save image temporarily to get file path for analysis
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-            image.save(temp_file.name, format='PNG')
-            temp_path = temp_file.name
+        response = {
+            "success": True,
+            "filename": file.filename,
+            "file_size": len(file_content),
+            "image_dimensions": f"{image.original_width}x{image.original_height}",
+            "preprocessing": image.stats(),
+        }
+
+        from backend.services.image_to_website import describe_image
         
-        try:
-            
-            from backend.services.image_to_website import analyze_image
-            
-            # Analyze the image using the existing function
-            description = analyze_image(temp_path)
-            
-            # Clean up temporary file
-            os.unlink(temp_path)
-            
-            if description.startswith("Error"):
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=description
-                )
-            
+        # Re-uploads of the same or a nearly identical mockup reuse the
+        # stored description instead of calling the vision model again
+        description, distance = await describe_image(image, current_user.id)
+        
+        if description.startswith("Error"):
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=description
+            )
+
+        if distance is not None:
             return {
-                "success": True,
+                **response,
                 "description": description,
-                "filename": file.filename,
-                "file_size": len(file_content),
-                "image_dimensions": f"{image.width}x{image.height}",
-                "message": "Image analyzed successfully. Use this description to generate website code."
+                "cached": True,
+                "match_distance": distance,
+                "message": "Matched a previously analyzed image. Use this description to generate website code."
             }
-            
-        except Exception as e:
-            # Clean up temporary file in case of error
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-            raise e
+        
+        return {
+            **response,
+            "description": description,
+            "cached": False,
+            "message": "Image analyzed successfully. Use this description to generate website code."
+        }
         
     except HTTPException:
         raise
@@ -101,11 +103,91 @@ async def analyze_uploaded_image(
             detail="Internal server error during image analysis"
         )
 
+@router.post("/api/analyze-images")
+async def analyze_uploaded_images(
+    http_request: Request,
+    files: List[UploadFile] = File(...),
+    merge: bool = Form(False),
+    generate: bool = Form(False),
+    current_user: CurrentUser = Depends(get_current_user_snapshot)
+):
+    """
+    Analyze several screenshots (or zip archives of them) concurrently and
+    stream each description as it completes. With merge the descriptions
+    are combined into one site brief for /api/generate-website; with
+    generate the website is generated from that brief in the same stream.
+    """
+    too_many = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Too many images. Maximum per batch: {settings.IMAGE_BATCH_MAX_FILES}"
+    )
+    images = []
+    for file in files:
+        try:
+            if is_archive(file.filename, file.content_type):
+                archive = await read_upload(file, MAX_ARCHIVE_SIZE)
+                images.extend(await image_pool.run(
+                    expand_archive, archive, settings.IMAGE_BATCH_MAX_FILES, MAX_FILE_SIZE
+                ))
+            elif file.content_type in ALLOWED_IMAGE_TYPES:
+                images.append((file.filename, await read_upload(file, MAX_FILE_SIZE)))
+            else:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid file type for {file.filename}. Allowed types: zip, {', '.join(ALLOWED_IMAGE_TYPES)}"
+                )
+        except ImageTooLarge:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{file.filename} is too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB per image, "
+                       f"{MAX_ARCHIVE_SIZE // (1024*1024)}MB per archive"
+            )
+        except InvalidImage:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{file.filename} is not a valid zip archive"
+            )
+        except TooManyImages:
+            raise too_many
+        if len(images) > settings.IMAGE_BATCH_MAX_FILES:
+            raise too_many
+
+    if not images:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No images found in the upload"
+        )
+    if generate and not current_user.api_key:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="API key not found for user."
+        )
+
+    from backend.services.image_to_website import screenshot_to_code
+
+    events = screenshot_to_code(images, current_user, merge=merge, generate=generate)
+    if generate:
+        try:
+            lease = await scheduler.acquire(current_user.id, scheduler.PRIORITY_FULL)
+        except scheduler.Rejected as e:
+            return scheduler.rejection_response(e)
+        events = lease.hold(events)
+    return StreamingResponse(
+        sse_stream(events, request=http_request),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "Access-Control-Allow-Origin": "*",
+            "X-Accel-Buffering": "no",  # Disable nginx buffering
+        }
+    )
+
 @router.post("/api/generate-website")
 async def generate_website_from_description(
     request: DescriptionRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    http_request: Request,
+    current_user: CurrentUser = Depends(get_current_user_snapshot)
 ):
     """
     Generate website code from a description.
@@ -114,17 +196,27 @@ async def generate_website_from_description(
     description = request.description
     
     try:
-        if not description or description.strip() == "":
+        # Import the generate_html_code function from the service
+        from backend.services.image_to_website import generate_html_code, is_valid_description
+
+        # Validate before taking a scheduler slot, so a bad request holds none
+        if not is_valid_description(description):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Description is required"
             )
         
-        # Import the generate_html_code function from the service
-        from backend.services.image_to_website import generate_html_code
-        
+        try:
+            lease = await scheduler.acquire(current_user.id, scheduler.PRIORITY_FULL)
+        except scheduler.Rejected as e:
+            return scheduler.rejection_response(e)
+
         # Generate HTML code using the existing function
-        html_stream = generate_html_code(description, current_user)
+        try:
+            html_stream = await generate_html_code(description, current_user, request=http_request, lease=lease)
+        except BaseException:
+            await lease.release()
+            raise
         
         return StreamingResponse(
             html_stream,
@@ -0,0 +1,104 @@
+# routes/jobs.py
+
+import json
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from backend.core import metrics
+from backend.core.security import get_current_user_snapshot
+from backend.schemas.job import JobCreate, JobResponse
+from backend.schemas.user import CurrentUser
+from backend.services import scheduler
+from backend.services.jobs import JobNotFound, follow, get_runner
+from backend.services.streaming import format_sse
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+async def _get_job_or_404(job_id: str, current_user: CurrentUser) -> dict:
+    try:
+        return await run_in_threadpool(get_runner().store.get, job_id, str(current_user.id))
+    except JobNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+
+@router.post("", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(job_in: JobCreate, current_user: CurrentUser = Depends(get_current_user_snapshot)):
+    """
+    Queue a generation that runs independently of this connection. Its
+    output is read (and re-read from any point) via /api/jobs/{id}/stream.
+    """
+    if job_in.kind == "website":
+        if not job_in.description or not job_in.description.strip():
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Description is required")
+        params = {"description": job_in.description}
+    elif job_in.kind == "generate":
+        if not job_in.prompt or not job_in.prompt.strip():
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Prompt is required")
+        params = job_in.model_dump(mode="json", exclude={"kind", "description"}, exclude_none=True)
+        params["prompt"] = job_in.prompt.strip()
+    else:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown job kind: {job_in.kind}")
+    if not current_user.api_key:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="API key not found for user.")
+    try:
+        await scheduler.check_rate(current_user.id)
+    except scheduler.Rejected as e:
+        return scheduler.rejection_response(e)
+    return await get_runner().submit(str(current_user.id), job_in.kind, params)
+
+
+@router.get("", response_model=List[JobResponse])
+async def list_jobs(current_user: CurrentUser = Depends(get_current_user_snapshot)):
+    return await run_in_threadpool(get_runner().store.list, str(current_user.id))
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def read_job(job_id: str, current_user: CurrentUser = Depends(get_current_user_snapshot)):
+    return await _get_job_or_404(job_id, current_user)
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(job_id: str, current_user: CurrentUser = Depends(get_current_user_snapshot)):
+    await _get_job_or_404(job_id, current_user)
+    await get_runner().cancel(job_id)
+    return await _get_job_or_404(job_id, current_user)
+
+
+@router.get("/{job_id}/stream")
+async def stream_job(
+    job_id: str,
+    request: Request,
+    after: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None),
+    current_user: CurrentUser = Depends(get_current_user_snapshot)
+):
+    """
+    Server-sent events of the job's log. Every frame carries its sequence
+    number as the SSE id, so a reconnecting EventSource (Last-Event-ID) or
+    an explicit ?after=N resumes right after the last frame it received.
+    A final "job" event reports the job's status.
+    """
+    await _get_job_or_404(job_id, current_user)
+    try:
+        offset = after if after is not None else int(last_event_id or 0)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Last-Event-ID")
+    if offset:
+        metrics.inc("jobs.stream_resumes")
+
+    async def frames():
+        async for seq, event, data in follow(get_runner(), job_id, offset, request=request):
+            yield format_sse(data, event, event_id=str(seq))
+        job = await _get_job_or_404(job_id, current_user)
+        yield format_sse(json.dumps({"status": job["status"], "error": job["error"]}), "job")
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable nginx buffering
+        }
+    )
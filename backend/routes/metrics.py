@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Depends
+from backend.core import metrics
+from backend.core.security import require_metrics_token
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/api/metrics", dependencies=[Depends(require_metrics_token)])
+def read_metrics():
+    return metrics.snapshot()
@@ -0,0 +1,54 @@
+from typing import List
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from backend.db.session import get_db
+from backend.core.security import get_current_user_snapshot
+from backend.crud import crud_project
+from backend.services.html_store import get_html
+from backend.schemas.user import CurrentUser
+from backend.schemas.project import ProjectResponse, ProjectDetailResponse, VersionDetailResponse
+
+router = APIRouter(prefix="/api/projects", tags=["projects"])
+
+
+def _get_project_or_404(db: Session, project_id: UUID, user: CurrentUser):
+    project = crud_project.get_project(db, project_id, user.id)
+    if project is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    return project
+
+
+@router.get("", response_model=List[ProjectResponse])
+def list_projects(db: Session = Depends(get_db), current_user: CurrentUser = Depends(get_current_user_snapshot)):
+    return crud_project.list_projects(db, current_user.id)
+
+
+@router.get("/{project_id}", response_model=ProjectDetailResponse)
+def read_project(
+    project_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user_snapshot)
+):
+    return _get_project_or_404(db, project_id, current_user)
+
+
+@router.get("/{project_id}/versions/{version_id}", response_model=VersionDetailResponse)
+def read_version(
+    project_id: UUID,
+    version_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user_snapshot)
+):
+    project = _get_project_or_404(db, project_id, current_user)
+    version = crud_project.get_version(db, project, version_id)
+    if version is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Version not found")
+    return VersionDetailResponse(
+        id=version.id,
+        number=version.number,
+        parent_id=version.parent_id,
+        prompt=version.prompt,
+        created_at=version.created_at,
+        html=get_html(db, version.html_hash),
+    )
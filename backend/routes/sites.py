@@ -0,0 +1,66 @@
+from typing import Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from backend.core.security import get_current_user_snapshot
+from backend.schemas.site import PublishRequest, SiteResponse
+from backend.schemas.user import CurrentUser
+from backend.services import sites
+from backend.services.projects import ProjectNotFound
+
+router = APIRouter(tags=["sites"])
+
+
+@router.post("/api/projects/{project_id}/site", response_model=SiteResponse)
+async def publish_site(
+    project_id: UUID,
+    publish_in: Optional[PublishRequest] = None,
+    current_user: CurrentUser = Depends(get_current_user_snapshot),
+):
+    """
+    Publish a version of the project (its head by default) under a stable
+    /sites/{slug} URL. Other workers may keep serving the previous version
+    until their slug lookup expires, up to SITES_LOOKUP_TTL seconds.
+    """
+    version_id = publish_in.version_id if publish_in else None
+    try:
+        return await run_in_threadpool(sites.publish, current_user.id, project_id, version_id)
+    except ProjectNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.get("/api/projects/{project_id}/site", response_model=SiteResponse)
+async def read_site(project_id: UUID, current_user: CurrentUser = Depends(get_current_user_snapshot)):
+    try:
+        site = await run_in_threadpool(sites.get_published, current_user.id, project_id)
+    except ProjectNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    if site is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project is not published")
+    return site
+
+
+@router.delete("/api/projects/{project_id}/site", status_code=status.HTTP_204_NO_CONTENT)
+async def unpublish_site(project_id: UUID, current_user: CurrentUser = Depends(get_current_user_snapshot)):
+    """
+    Take the project's site down. Other workers may keep serving it until
+    their slug lookup expires, up to SITES_LOOKUP_TTL seconds.
+    """
+    try:
+        removed = await run_in_threadpool(sites.unpublish, current_user.id, project_id)
+    except ProjectNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project is not published")
+
+
+@router.api_route("/sites/{slug}", methods=["GET", "HEAD"])
+async def serve_site(slug: str, request: Request):
+    """
+    A published site. Precompressed variants, strong ETags, conditional
+    and range requests; no authentication, the slug is the capability.
+    """
+    response = await sites.site_response(request, slug)
+    if response is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Site not found")
+    return response
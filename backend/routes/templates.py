@@ -0,0 +1,50 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from backend.core.security import get_current_user_snapshot
+from backend.schemas.component import ComponentRequest, ComponentResponse
+from backend.schemas.user import CurrentUser
+from backend.services import components, scheduler
+from backend.services.templates import get_library
+
+router = APIRouter(tags=["templates"])
+logger = logging.getLogger(__name__)
+
+
+@router.get("/api/templates")
+async def list_templates(request: Request):
+    """Template and component listing; a prebuilt, precompressed body with an ETag."""
+    return get_library().listing.response(request)
+
+
+@router.get("/api/templates/{template_id}")
+async def read_template(template_id: str, request: Request):
+    bundle = get_library().template(template_id)
+    if bundle is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Template not found")
+    return bundle.response(request)
+
+
+@router.post("/api/generate-component", response_model=ComponentResponse)
+async def generate_component(
+    component_in: ComponentRequest,
+    current_user: CurrentUser = Depends(get_current_user_snapshot),
+):
+    """
+    Generate a single component (navbar, pricing table, ...). Plain requests
+    for a library component and repeats of earlier requests are answered
+    without a model call.
+    """
+    if not component_in.component_type.strip():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Component type is required")
+    try:
+        return await components.get_component(
+            component_in.component_type, component_in.description, component_in.style, current_user
+        )
+    except scheduler.Rejected as e:
+        return scheduler.rejection_response(e)
+    except Exception as e:
+        logger.error(f"Component generation error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error during component generation"
+        )
@@ -1,13 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session  
-import uuid
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 from datetime import timedelta
-from backend.db.session import get_db
+from backend.db.session import get_async_db
 from backend.db.models import User
+from backend.crud import crud_user
+from backend.core.executor import hash_pool
+from backend.core.user_cache import cache as user_cache
 from backend.core.security import (
     get_password_hash, 
     get_current_user, 
+    get_current_user_snapshot,
     get_hashed_api_key,
     verify_password, 
     create_access_token, 
@@ -16,54 +20,50 @@ from backend.core.security import (
     ACCESS_TOKEN_EXPIRE_MINUTES, 
     REFRESH_TOKEN_EXPIRE_DAYS
 )
-from backend.schemas.user import UserCreate, UserResponse, Token, UserUpdateApiKey
+from backend.schemas.user import UserCreate, UserResponse, Token, UserUpdateApiKey, CurrentUser
 from backend.schemas.token import RefreshTokenRequest
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register_user(user_in: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.name == user_in.name).first():
+async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if await crud_user.get_user_by_name(db, user_in.name):
         raise HTTPException(status_code=400, detail="Username already registered")
 
-    new_user = User(
-        id=uuid.uuid4(),
-        name=user_in.name,
-        password_hash=get_password_hash(user_in.password),
-        api_key=user_in.api_key,
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+    password_hash = await hash_pool.run(get_password_hash, user_in.password)
+    try:
+        return await crud_user.create_user(db, user_in, password_hash)
+    except IntegrityError:
+        # Lost a race with a concurrent registration of the same name
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Username already registered")
 
 @router.post("/update-api-key", response_model=UserResponse)
 async def update_user_api_key(
     update_data: UserUpdateApiKey,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     # Verify current password
-    if not verify_password(update_data.current_password, current_user.password_hash):
+    if not await hash_pool.run(verify_password, update_data.current_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect current password"
         )
     
     # Update the API key
-    current_user.api_key = update_data.new_api_key
-    db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
+    current_user = await crud_user.update_api_key(db, current_user, update_data.new_api_key)
+    # Drop cached copies in this and every other worker
+    user_cache.invalidate(str(current_user.id))
     return current_user
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):  
-    user = db.query(User).filter(User.name == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+    user = await crud_user.get_user_by_name(db, form_data.username)
+    if not user or not await hash_pool.run(verify_password, form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -79,9 +79,9 @@ def login(
     }
 
 @router.post("/refresh", response_model=Token)
-def refresh_token(
+async def refresh_token(
     token_data: RefreshTokenRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     
     payload = decode_token(token_data.refresh_token)
@@ -89,7 +89,7 @@ def refresh_token(
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await crud_user.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -103,7 +103,7 @@ def refresh_token(
     }
 
 @router.get("/me")
-def read_users_me(current_user: User = Depends(get_current_user)):
+def read_users_me(current_user: CurrentUser = Depends(get_current_user_snapshot)):
     return {
         "id": current_user.id,
         "name": current_user.name,
@@ -111,5 +111,5 @@ def read_users_me(current_user: User = Depends(get_current_user)):
     }
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_profile(current_user: User = Depends(get_current_user)):
+async def get_current_user_profile(current_user: CurrentUser = Depends(get_current_user_snapshot)):
     return current_user
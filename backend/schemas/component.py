@@ -0,0 +1,15 @@
+from typing import Optional
+from pydantic import AliasChoices, BaseModel, Field
+
+
+class ComponentRequest(BaseModel):
+    component_type: str = Field(validation_alias=AliasChoices("component_type", "type", "component"))
+    description: Optional[str] = None
+    style: Optional[str] = None
+
+
+class ComponentResponse(BaseModel):
+    component_type: str
+    html: str
+    hash: str
+    source: str  # "library", "cache" or "generated"
@@ -0,0 +1,43 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, Literal, Optional
+from uuid import UUID
+from pydantic import BaseModel, field_validator
+
+
+class JobCreate(BaseModel):
+    """
+    A background generation. kind "generate" takes the /api/generate body
+    (prompt, previous_html, previous_prompt, edit_output, project_id,
+    version_id, mode, reuse); kind "website" takes the /api/generate-website description.
+    """
+    kind: str = "generate"
+    prompt: Optional[str] = None
+    previous_html: Optional[str] = None
+    previous_prompt: Optional[str] = None
+    edit_output: str = "document"
+    project_id: Optional[UUID] = None
+    version_id: Optional[UUID] = None
+    mode: Literal["single", "parallel"] = "single"
+    reuse: Optional[Literal["off", "return", "edit"]] = None
+    description: Optional[str] = None
+
+
+class JobResponse(BaseModel):
+    id: UUID
+    kind: str
+    status: str
+    error: Optional[str] = None
+    last_seq: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    params: Dict[str, Any] = {}
+
+    @field_validator("params", mode="before")
+    @classmethod
+    def load_params(cls, value):
+        if isinstance(value, str):
+            value = json.loads(value)
+        # The previous document can be large; it is not echoed back
+        return {key: val for key, val in value.items() if key != "previous_html"}
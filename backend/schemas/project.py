@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+from pydantic import BaseModel
+
+
+class VersionResponse(BaseModel):
+    id: UUID
+    number: int
+    parent_id: Optional[UUID] = None
+    prompt: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class VersionDetailResponse(VersionResponse):
+    html: str
+
+
+class ProjectResponse(BaseModel):
+    id: UUID
+    name: str
+    head_version_id: Optional[UUID] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ProjectDetailResponse(ProjectResponse):
+    versions: List[VersionResponse] = []
@@ -0,0 +1,17 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+from pydantic import BaseModel
+
+
+class PublishRequest(BaseModel):
+    version_id: Optional[UUID] = None  # the project head when omitted
+
+
+class SiteResponse(BaseModel):
+    slug: str
+    url: str
+    project_id: UUID
+    version_id: UUID
+    etag: str
+    published_at: datetime
@@ -27,4 +27,13 @@ class Token(BaseModel):
 
 class UserUpdateApiKey(BaseModel):
     new_api_key: str
-    current_password: str
\ No newline at end of file
+    current_password: str
+
+class CurrentUser(BaseModel):
+    """Detached view of the authenticated user, safe to use after the session closes."""
+    id: UUID
+    name: str
+    api_key: str
+
+    class Config:
+        from_attributes = True
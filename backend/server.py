@@ -4,9 +4,10 @@ import logging
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse
-from openai import OpenAI
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
-import asyncio
+from backend.services.streaming import sse_stream
+from backend.services.llm_clients import stream_deltas
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,13 +31,15 @@ app.add_middleware(
 NVAPI_KEY = os.getenv("NVAPI_KEY")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
+MAX_TOKENS = 150000
+
 # AI Clients
-nvidia_client = OpenAI(
+nvidia_client = AsyncOpenAI(
     base_url="https://integrate.api.nvidia.com/v1",
     api_key=NVAPI_KEY
 )
 
-router_client = OpenAI(
+router_client = AsyncOpenAI(
     base_url="https://openrouter.ai/api/v1",
     api_key=OPENROUTER_API_KEY
 )
@@ -177,25 +180,15 @@ async def generate_website(request: Request):
                 {"role": "user", "content": enhanced_prompt}
             ]
 
-        completion = nvidia_client.chat.completions.create(
+        completion = await nvidia_client.chat.completions.create(
             model="deepseek-ai/deepseek-r1-0528",
             messages=messages,
             temperature=0.2,
-            max_tokens=150000,
+            max_tokens=MAX_TOKENS,
             stream=True
         )
 
-        async def stream_generator():
-            try:
-                for chunk in completion:
-                    if chunk.choices and chunk.choices[0].delta.content:
-                        yield chunk.choices[0].delta.content.encode("utf-8")
-                        await asyncio.sleep(0.01)
-            except Exception as e:
-                logger.error(f"Stream error: {str(e)}")
-                yield f"\n[ERROR]: Stream interrupted - {str(e)}".encode("utf-8")
-
-        return StreamingResponse(stream_generator(), media_type="text/event-stream")
+        return StreamingResponse(sse_stream(stream_deltas(completion, MAX_TOKENS), request=request), media_type="text/event-stream")
 
     except Exception as e:
         logger.error(f"Generation error: {str(e)}")
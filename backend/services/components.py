@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from backend.core import metrics
+from backend.core.config import settings
+from backend.db.models import ComponentCacheEntry
+from backend.db.session import get_db_with_retry
+from backend.schemas.user import CurrentUser
+from backend.services import llm_router, scheduler
+from backend.services.html_store import get_html, html_hash, put_html
+from backend.services.templates import get_library
+
+logger = logging.getLogger(__name__)
+
+TEMPERATURE = 0.2
+_FENCE = re.compile(r"```[a-zA-Z]*\n(.*?)```", re.S)
+
+
+def get_component_system_prompt():
+    return """
+You are an expert web developer. Output ONLY the HTML for one reusable website component styled with TailwindCSS classes (Tailwind is already loaded on the page).
+Use a single root element. A <script> inside the root element is allowed if the component needs interactivity.
+Do NOT output <!DOCTYPE>, <html>, <head> or <body>, markdown code fences, or any text besides the HTML.
+If You want to use image use www.unsplash.com. to get images(use related images).
+"""
+
+
+def normalize_type(component_type: str) -> str:
+    return re.sub(r"[\s_]+", "-", component_type.strip().lower())
+
+
+def _normalize_text(text: Optional[str]) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+def request_key(component_type: str, description: Optional[str], style: Optional[str]) -> str:
+    """Content address of a component request: what was asked for and how it would be generated."""
+    system_hash = hashlib.sha256(get_component_system_prompt().encode("utf-8")).hexdigest()
+    raw = json.dumps([component_type, _normalize_text(description), _normalize_text(style), settings.LLM_ROUTES, system_hash])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def extract_html(text: str) -> str:
+    match = _FENCE.search(text)
+    return (match.group(1) if match else text).strip() + "\n"
+
+
+class ComponentCache:
+    """
+    Generated components by request key: a bounded in-memory LRU in front
+    of the component_cache table, whose HTML is deduplicated in html_blobs.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()  # key -> (hash, html)
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, value: Tuple[str, str]) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                return value
+        with get_db_with_retry() as db:
+            entry = db.get(ComponentCacheEntry, key)
+            if entry is None:
+                return None
+            value = (entry.html_hash, get_html(db, entry.html_hash))
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, component_type: str, html: str) -> str:
+        try:
+            with get_db_with_retry() as db:
+                digest = put_html(db, html)
+                if db.get(ComponentCacheEntry, key) is None:
+                    db.add(ComponentCacheEntry(key=key, component_type=component_type, html_hash=digest))
+        except IntegrityError:
+            # Another worker stored the same request first.
+            digest = html_hash(html)
+        self._remember(key, (digest, html))
+        return digest
+
+
+_cache: Optional[ComponentCache] = None
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def get_cache() -> ComponentCache:
+    global _cache
+    if _cache is None:
+        _cache = ComponentCache(settings.COMPONENT_CACHE_MAX_ENTRIES)
+    return _cache
+
+
+async def _generate(key: str, component_type: str, description: Optional[str], style: Optional[str], current_user: CurrentUser) -> dict:
+    request = f"Component: {component_type}"
+    if description:
+        request += f"\nDescription: {description}"
+    if style:
+        request += f"\nStyle: {style}"
+    lease = await scheduler.acquire(current_user.id, scheduler.PRIORITY_EDIT)
+    try:
+        text = await llm_router.complete(
+            settings.LLM_ROUTES,
+            current_user.api_key,
+            [
+                {"role": "system", "content": get_component_system_prompt()},
+                {"role": "user", "content": request},
+            ],
+            TEMPERATURE,
+            settings.COMPONENT_MAX_TOKENS,
+        )
+    finally:
+        await lease.release()
+    html = extract_html(text or "")
+    digest = await run_in_threadpool(get_cache().put, key, component_type, html)
+    metrics.inc("components.generated")
+    return {"component_type": component_type, "html": html, "hash": digest, "source": "generated"}
+
+
+async def get_component(
+    component_type: str,
+    description: Optional[str],
+    style: Optional[str],
+    current_user: CurrentUser,
+) -> dict:
+    """
+    A component from, in order: the shipped library (plain requests for a
+    known type), the content-addressed cache, or a model call. Concurrent
+    identical requests share one model call.
+    """
+    component_type = normalize_type(component_type)
+    if not _normalize_text(description) and not _normalize_text(style):
+        html = get_library().component(component_type)
+        if html is not None:
+            metrics.inc("components.library")
+            return {"component_type": component_type, "html": html, "hash": html_hash(html), "source": "library"}
+
+    key = request_key(component_type, description, style)
+    cached = await run_in_threadpool(get_cache().get, key)
+    if cached is not None:
+        metrics.inc("components.cache_hits")
+        return {"component_type": component_type, "html": cached[1], "hash": cached[0], "source": "cache"}
+
+    task = _inflight.get(key)
+    if task is None:
+        if not current_user.api_key:
+            raise Exception("API key not found for user.")
+        # A task of its own, so the generation survives the first caller disconnecting
+        task = asyncio.ensure_future(_generate(key, component_type, description, style, current_user))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        metrics.inc("components.coalesced")
+    return dict(await asyncio.shield(task))
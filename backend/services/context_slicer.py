@@ -0,0 +1,192 @@
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import List, Tuple
+from backend.core import metrics
+from backend.core.config import settings
+
+BLOCK_TAGS = {
+    "head", "body", "header", "nav", "main", "section", "article", "aside",
+    "footer", "form", "div", "ul", "ol", "table", "script", "style", "template",
+}
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+}
+# Words users say vs. what the markup says.
+_ALIASES = {
+    "colour": "color", "colours": "color", "colors": "color",
+    "button": "btn", "buttons": "btn", "navbar": "nav", "navigation": "nav",
+    "menu": "nav", "banner": "hero", "image": "img", "images": "img",
+    "picture": "img", "photo": "img", "heading": "h1", "title": "h1",
+    "js": "script", "javascript": "script", "css": "style", "styles": "style",
+}
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        if token in _ALIASES:
+            tokens.append(_ALIASES[token])
+    return tokens
+
+
+@dataclass
+class Fragment:
+    start: int
+    end: int
+    tag: str
+    attrs: str
+    children: List["Fragment"] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+    def label(self) -> str:
+        return f"<{self.tag}{self.attrs}>"
+
+
+class _BlockIndexer(HTMLParser):
+    """Record the character span of every block-level element."""
+
+    def __init__(self, html: str):
+        super().__init__(convert_charrefs=False)
+        self.html = html
+        # getpos() counts "\n" only; splitlines() would also break on \r,
+        # \f, \x1c-\x1e, \x85, \u2028 and \u2029 and shift every offset.
+        self.line_offsets = [0]
+        for line in html.split("\n"):
+            self.line_offsets.append(self.line_offsets[-1] + len(line) + 1)
+        self.root = Fragment(0, len(html), "document", "")
+        self.stack: List[Tuple[str, Fragment]] = []
+
+    def _offset(self) -> int:
+        line, col = self.getpos()
+        return self.line_offsets[line - 1] + col
+
+    def _parent(self) -> Fragment:
+        for _, fragment in reversed(self.stack):
+            if fragment is not None:
+                return fragment
+        return self.root
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        fragment = None
+        if tag in BLOCK_TAGS:
+            keep = [f' {k}="{v}"' for k, v in attrs if k in ("id", "class") and v]
+            fragment = Fragment(self._offset(), len(self.html), tag, "".join(keep)[:80])
+            self._parent().children.append(fragment)
+        self.stack.append((tag, fragment))
+
+    def handle_endtag(self, tag):
+        if not any(name == tag for name, _ in self.stack):
+            return
+        end = self.html.find(">", self._offset())
+        end = len(self.html) if end == -1 else end + 1
+        while self.stack:
+            name, fragment = self.stack.pop()
+            if fragment is not None:
+                fragment.end = end
+            if name == tag:
+                break
+
+
+def index_fragments(html: str, max_size: int = None) -> List[Fragment]:
+    """
+    Split html into non-overlapping fragments in document order: the
+    outermost block elements no larger than max_size, descending into
+    larger ones (head, body, big wrappers) until they fit.
+    """
+    max_size = max_size or settings.CONTEXT_FRAGMENT_MAX_CHARS
+    indexer = _BlockIndexer(html)
+    indexer.feed(html)
+    indexer.close()
+
+    fragments: List[Fragment] = []
+
+    def walk(node: Fragment):
+        for child in node.children:
+            if child.size <= max_size or not child.children:
+                fragments.append(child)
+            else:
+                walk(child)
+
+    walk(indexer.root)
+    return fragments
+
+
+def rank_fragments(html: str, fragments: List[Fragment], query: str) -> List[Tuple[float, int]]:
+    """BM25 score of every fragment against the edit request, best first."""
+    docs = [Counter(tokenize(html[f.start:f.end])) for f in fragments]
+    terms = set(tokenize(query))
+    if not docs or not terms:
+        return []
+    k1, b = 1.5, 0.75
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_length = sum(lengths) / len(lengths) or 1
+    idf = {}
+    for term in terms:
+        df = sum(1 for doc in docs if term in doc)
+        idf[term] = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+    scores = []
+    for i, doc in enumerate(docs):
+        score = 0.0
+        for term in terms:
+            tf = doc.get(term)
+            if not tf:
+                continue
+            score += idf[term] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[i] / avg_length))
+        if score > 0:
+            scores.append((score, i))
+    scores.sort(reverse=True)
+    return scores
+
+
+def slice_context(html: str, query: str, budget: int = None):
+    """
+    Build a reduced edit context for html: a compact outline of every
+    fragment plus the verbatim text of the fragments most relevant to
+    query, up to budget characters.
+
+    Returns (context_text, spans) where spans are the document offsets of
+    the included fragments, or None when slicing would not help.
+    """
+    budget = budget or settings.CONTEXT_SLICE_BUDGET
+    fragments = index_fragments(html)
+    ranked = rank_fragments(html, fragments, query)
+    if not ranked:
+        return None
+
+    chosen = set()
+    used = 0
+    for _, i in ranked:
+        if used + fragments[i].size > budget and chosen:
+            continue
+        chosen.add(i)
+        used += fragments[i].size
+    if used >= len(html) * 0.8:
+        return None
+
+    outline = []
+    excerpts = []
+    for i, fragment in enumerate(fragments):
+        marker = "*" if i in chosen else " "
+        outline.append(f"{marker} [{i}] {fragment.label()} ({fragment.size} chars)")
+        if i in chosen:
+            excerpts.append(f"--- fragment [{i}] ---\n{html[fragment.start:fragment.end]}")
+    context = (
+        f"The current document is {len(html)} characters long. Outline of its blocks "
+        f"(* = included below):\n" + "\n".join(outline) +
+        "\n\nRelevant fragments, verbatim:\n" + "\n".join(excerpts)
+    )
+    metrics.inc("context.slice.chars_full", len(html))
+    metrics.inc("context.slice.chars_sent", len(context))
+    spans = [[fragments[i].start, fragments[i].end] for i in sorted(chosen)]
+    return context, spans
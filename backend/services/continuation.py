@@ -0,0 +1,159 @@
+import logging
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from backend.core import metrics
+from backend.core.config import settings
+from backend.services.streaming import StreamEvent
+
+logger = logging.getLogger(__name__)
+
+# open_completion(messages, max_tokens, outcome) -> raw delta stream
+OpenCompletion = Callable[[List[dict], int, dict], Awaitable[AsyncIterator[StreamEvent]]]
+
+CODE_END = "===CODE_END==="
+LONG_LINE = 2000  # a partial line longer than this is streamed without waiting for its newline
+MIN_OVERLAP = 40  # shorter repeats are left alone, unless they restart the whole output
+OVERLAP_WINDOW = 4000  # how far back a continuation's start is searched for repeated text
+
+CONTINUE_PROMPT = """Your previous response was cut off. It ends with the text shown in your last message.
+Continue from exactly that point, starting with the next line. Do not repeat what was already written, \
+do not restart the document and do not add any commentary. Keep the same ===SECTION_START=== / ===SECTION_END=== format."""
+
+
+def is_complete(text: str) -> bool:
+    """A full generation is complete once the code section is closed and the document ends."""
+    return CODE_END in text and "</html>" in text.lower()
+
+
+def overlap(produced: str, head: str) -> int:
+    """
+    Length of the longest prefix of head that is also a suffix of produced,
+    i.e. the text a continuation repeated. Linear time (KMP prefix function).
+    """
+    pattern = head + "\0" + produced
+    fail = [0] * len(pattern)
+    k = 0
+    for i in range(1, len(pattern)):
+        while k and pattern[i] != pattern[k]:
+            k = fail[k - 1]
+        if pattern[i] == pattern[k]:
+            k += 1
+        fail[i] = k
+    return fail[-1] if pattern else 0
+
+
+async def complete_document(
+    open_completion: OpenCompletion,
+    messages: List[dict],
+    max_tokens: int,
+) -> AsyncIterator[StreamEvent]:
+    """
+    Open a full generation and return its delta stream, continued in place
+    when the response is cut short.
+
+    A response is incomplete when it stops at max_tokens, is interrupted
+    upstream, or lacks ===CODE_END=== or </html>. The stream is then
+    continued with a request seeded with the tail of what was already sent,
+    and the continuation is spliced into the same stream. Text the model
+    repeats at the start of a continuation is dropped. The line being
+    written is held back until its newline, so a cut in the middle of a
+    line leaves no fragment behind for the continuation to collide with.
+    """
+    outcome: dict = {}
+    first = await open_completion(messages, max_tokens, outcome)
+    return _continue(open_completion, messages, max_tokens, first, outcome)
+
+
+async def _continue(
+    open_completion: OpenCompletion,
+    messages: List[dict],
+    max_tokens: int,
+    deltas: AsyncIterator[StreamEvent],
+    outcome: dict,
+) -> AsyncIterator[StreamEvent]:
+    produced = ""  # text sent downstream
+    continuations = 0
+    while True:
+        error: Optional[str] = None
+        added = 0
+        partial = ""  # current line, not yet sent
+        head: Optional[str] = "" if continuations else None  # continuation start, before de-duplication
+        async for event, data in deltas:
+            if event == "error":
+                error = data
+                continue
+            if event is not None:
+                yield event, data
+                continue
+            if head is not None:
+                # Buffer while the continuation could still be repeating
+                # earlier text, i.e. while it still occurs in what was sent.
+                head += data
+                if len(head) < OVERLAP_WINDOW and head in produced[-OVERLAP_WINDOW:]:
+                    continue
+                data, head = _dedup(produced, head), None
+            added += len(data)
+            partial += data
+            cut = partial.rfind("\n") + 1
+            if not cut and len(partial) > LONG_LINE:
+                cut = len(partial)
+            if cut:
+                produced += partial[:cut]
+                yield None, partial[:cut]
+                partial = partial[cut:]
+        if head:
+            data = _dedup(produced, head)
+            added += len(data)
+            partial += data
+
+        truncated = error is not None or outcome.get("finish_reason") == "length"
+        if not truncated and is_complete(produced + partial):
+            if partial:
+                yield None, partial
+            return
+
+        if continuations >= settings.GENERATION_MAX_CONTINUATIONS:
+            if partial:
+                yield None, partial
+            if error is not None:
+                yield "error", error
+            return
+        if continuations and not added:
+            # The last continuation added nothing; asking again won't help.
+            if partial:
+                yield None, partial
+            if error is not None:
+                yield "error", error
+            return
+
+        continuations += 1
+        metrics.inc("generation.continuations")
+        logger.info(
+            f"Generation incomplete ({error or outcome.get('finish_reason') or 'missing end'}); "
+            f"continuing ({continuations}/{settings.GENERATION_MAX_CONTINUATIONS})"
+        )
+        # The unsent partial line is dropped and rewritten by the continuation.
+        tail = produced[-settings.GENERATION_CONTINUATION_TAIL_CHARS:]
+        outcome = {}
+        try:
+            deltas = await open_completion(
+                messages + [
+                    {"role": "assistant", "content": tail},
+                    {"role": "user", "content": CONTINUE_PROMPT},
+                ],
+                max_tokens,
+                outcome,
+            )
+        except Exception as e:
+            logger.error(f"Continuation failed: {str(e)}")
+            if partial:
+                yield None, partial
+            yield "error", error or f"Continuation failed - {str(e)}"
+            return
+
+
+def _dedup(produced: str, head: str) -> str:
+    repeated = overlap(produced[-OVERLAP_WINDOW:], head)
+    if repeated < MIN_OVERLAP and repeated < len(produced):
+        return head
+    metrics.inc("generation.continuation_overlap_chars", repeated)
+    return head[repeated:]
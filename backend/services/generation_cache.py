@@ -0,0 +1,276 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from backend.core import metrics
+from backend.core.config import settings
+from backend.services.streaming import StreamEvent
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(prompt: str, model: str, temperature: float, system_prompt: str) -> str:
+    """Key for a full generation: normalised prompt + sampling parameters."""
+    normalized = " ".join(prompt.split()).casefold()
+    system_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+    raw = json.dumps([normalized, model, temperature, system_hash])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _size(events: List[StreamEvent]) -> int:
+    return sum(len(data) for _, data in events)
+
+
+class GenerationCache:
+    """
+    Size-bounded LRU of completed generations with a TTL. Entries pushed
+    out of memory are spilled to GENERATION_CACHE_DIR as compressed JSON
+    and promoted back on the next hit.
+
+    The lock only guards the in-memory LRU. Compression and file I/O run
+    in the threadpool, outside the lock, so neither the event loop nor
+    other lookups wait on the disk.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, directory: Optional[str], disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created_at, events)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json.z")
+
+    def _spill(self, evicted: List[tuple]) -> None:
+        for key, created_at, events in evicted:
+            self._spill_one(key, created_at, events)
+        if evicted:
+            self._prune_disk()
+
+    def _spill_one(self, key: str, created_at: float, events: List[StreamEvent]) -> None:
+        try:
+            payload = zlib.compress(json.dumps({"created_at": created_at, "events": events}).encode("utf-8"))
+            tmp = self._path(key) + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, self._path(key))
+            metrics.inc("generation_cache.spills")
+        except OSError as e:
+            logger.warning(f"Generation cache spill failed: {str(e)}")
+
+    def _prune_disk(self) -> None:
+        """Drop the oldest spilled entries once the directory exceeds disk_max_bytes."""
+        if not self.disk_max_bytes:
+            return
+        try:
+            files = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json.z")]
+            total = sum(entry.stat().st_size for entry in files)
+            for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+                if total <= self.disk_max_bytes:
+                    break
+                total -= entry.stat().st_size
+                os.unlink(entry.path)
+        except OSError as e:
+            logger.warning(f"Generation cache prune failed: {str(e)}")
+
+    def _load_spilled(self, key: str):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                entry = json.loads(zlib.decompress(f.read()))
+        except (OSError, ValueError, zlib.error):
+            return None
+        if time.time() - entry["created_at"] > self.ttl:
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+            return None
+        return entry["created_at"], [tuple(event) for event in entry["events"]]
+
+    def _insert(self, key: str, created_at: float, events: List[StreamEvent]) -> List[tuple]:
+        """Add an entry; returns the (key, created_at, events) pushed out of memory."""
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= _size(self._entries.pop(key)[1])
+            self._entries[key] = (created_at, events)
+            self._bytes += _size(events)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, (old_created, old_events) = self._entries.popitem(last=False)
+                self._bytes -= _size(old_events)
+                metrics.inc("generation_cache.evictions")
+                evicted.append((old_key, old_created, old_events))
+        return evicted if self.directory else []
+
+    def lookup(self, key: str) -> Optional[List[StreamEvent]]:
+        """The entry for key if it is in memory, without touching the disk."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                return entry[1]
+            self._bytes -= _size(self._entries.pop(key)[1])
+            return None
+
+    async def get(self, key: str) -> Optional[List[StreamEvent]]:
+        events = self.lookup(key)
+        if events is not None or not self.directory:
+            return events
+        spilled = await run_in_threadpool(self._load_spilled, key)
+        if spilled is None:
+            return None
+        metrics.inc("generation_cache.disk_hits")
+        await self._store(key, *spilled)
+        return spilled[1]
+
+    async def put(self, key: str, events: List[StreamEvent]) -> None:
+        await self._store(key, time.time(), list(events))
+
+    async def _store(self, key: str, created_at: float, events: List[StreamEvent]) -> None:
+        evicted = self._insert(key, created_at, events)
+        if evicted:
+            await run_in_threadpool(self._spill, evicted)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+cache = GenerationCache(
+    max_bytes=settings.GENERATION_CACHE_MAX_BYTES,
+    ttl=settings.GENERATION_CACHE_TTL,
+    directory=settings.GENERATION_CACHE_DIR,
+    disk_max_bytes=settings.GENERATION_CACHE_DISK_MAX_BYTES,
+)
+metrics.register_gauge("generation_cache.entries", lambda: cache.stats()["entries"])
+metrics.register_gauge("generation_cache.bytes", lambda: cache.stats()["bytes"])
+
+
+class _Flight:
+    """One upstream generation shared by every concurrent identical request."""
+
+    def __init__(self):
+        self.events: List[StreamEvent] = []
+        self.finished = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self.changed = asyncio.Condition()
+
+    async def append(self, event: StreamEvent) -> None:
+        async with self.changed:
+            self.events.append(event)
+            self.changed.notify_all()
+
+    async def finish(self) -> None:
+        async with self.changed:
+            self.finished = True
+            self.changed.notify_all()
+
+
+_inflight: Dict[str, _Flight] = {}
+metrics.register_gauge("generation_cache.inflight", lambda: len(_inflight))
+
+
+def _cacheable(events: List[StreamEvent]) -> bool:
+    if any(event == "error" for event, _ in events):
+        return False
+    done = [data for event, data in events if event == "done"]
+    return bool(done) and json.loads(done[-1]).get("code_complete", False)
+
+
+async def _produce(key: str, flight: _Flight, open_stream) -> None:
+    try:
+        source = await open_stream()
+        async for event in source:
+            await flight.append(event)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Generation error: {str(e)}")
+        await flight.append(("error", f"Generation failed - {str(e)}"))
+    finally:
+        if _inflight.get(key) is flight:
+            _inflight.pop(key)
+        await flight.finish()
+    if _cacheable(flight.events):
+        await cache.put(key, flight.events)
+        metrics.inc("generation_cache.stores")
+
+
+async def _subscribe(key: str, flight: _Flight) -> AsyncIterator[StreamEvent]:
+    flight.subscribers += 1
+    position = 0
+    try:
+        while True:
+            async with flight.changed:
+                await flight.changed.wait_for(lambda: len(flight.events) > position or flight.finished)
+                pending = flight.events[position:]
+                finished = flight.finished
+            for event in pending:
+                yield event
+            position += len(pending)
+            if finished and position == len(flight.events):
+                return
+    finally:
+        flight.subscribers -= 1
+        # Nobody is reading any more: stop paying for the upstream stream.
+        # The flight is unlisted first, so a request arriving before the
+        # cancellation lands starts a new one instead of joining a dead one.
+        if flight.subscribers == 0 and not flight.finished and flight.task is not None:
+            if _inflight.get(key) is flight:
+                _inflight.pop(key)
+            flight.task.cancel()
+
+
+async def cached_stream(
+    key: str,
+    open_stream: Callable[[], Awaitable[AsyncIterator[StreamEvent]]],
+) -> AsyncIterator[StreamEvent]:
+    """
+    Serve a generation from the cache, join an identical generation that is
+    already running, or start a new one with open_stream().
+
+    Concurrent identical requests share a single upstream stream (opened
+    with the first requester's API key) and all receive its events live.
+    """
+    events = cache.lookup(key)
+    flight = _inflight.get(key) if events is None else None
+    if events is None and flight is None:
+        events = await cache.get(key)
+        # Another request may have started the generation while the disk was read
+        flight = _inflight.get(key)
+
+    if events is not None:
+        metrics.inc("generation_cache.hits")
+        for event in events:
+            yield event
+        return
+
+    if flight is not None:
+        metrics.inc("generation_cache.coalesced")
+    else:
+        metrics.inc("generation_cache.misses")
+        flight = _Flight()
+        _inflight[key] = flight
+        flight.task = asyncio.ensure_future(_produce(key, flight, open_stream))
+    subscription = _subscribe(key, flight)
+    try:
+        async for event in subscription:
+            yield event
+    finally:
+        await subscription.aclose()
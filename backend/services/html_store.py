@@ -0,0 +1,95 @@
+import difflib
+import hashlib
+import json
+import zlib
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.db.models import HtmlBlob
+
+
+# INSERT ... ON CONFLICT DO NOTHING, per dialect
+_INSERT_OR_IGNORE = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+
+def html_hash(html: str) -> str:
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def make_delta(base: str, target: str) -> list:
+    """
+    Line delta from base to target: ["c", i, j] copies base lines i:j,
+    ["i", text] inserts text.
+    """
+    a = base.splitlines(keepends=True)
+    b = target.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b).get_opcodes():
+        if tag == "equal":
+            ops.append(["c", i1, i2])
+        elif tag in ("replace", "insert"):
+            ops.append(["i", "".join(b[j1:j2])])
+    return ops
+
+
+def apply_delta(base: str, ops: list) -> str:
+    lines = base.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if op[0] == "c":
+            parts.extend(lines[op[1]:op[2]])
+        else:
+            parts.append(op[1])
+    return "".join(parts)
+
+
+def put_html(db: Session, html: str, base_hash: str = None) -> str:
+    """
+    Store html (if not already stored) and return its hash. When a base
+    version is given the blob is stored as a delta against it, unless the
+    chain has reached VERSION_SNAPSHOT_INTERVAL or the delta is not
+    meaningfully smaller than a full snapshot.
+
+    Blobs are content addressed, so a concurrent writer storing the same
+    html first is not an error: the insert is skipped and the caller's
+    transaction is left untouched.
+    """
+    digest = html_hash(html)
+    if db.get(HtmlBlob, digest) is not None:
+        return digest
+
+    full = zlib.compress(html.encode("utf-8"), 9)
+    blob = dict(hash=digest, kind="full", base_hash=None, depth=0, size=len(html), data=full)
+
+    base = db.get(HtmlBlob, base_hash) if base_hash else None
+    if base is not None and base.depth + 1 < settings.VERSION_SNAPSHOT_INTERVAL:
+        ops = make_delta(get_html(db, base_hash), html)
+        delta = zlib.compress(json.dumps(ops).encode("utf-8"), 9)
+        if len(delta) < len(full) // 2:
+            blob = dict(
+                hash=digest, kind="delta", base_hash=base_hash,
+                depth=base.depth + 1, size=len(html), data=delta,
+            )
+
+    insert = _INSERT_OR_IGNORE.get(db.get_bind().dialect.name)
+    if insert is not None:
+        db.execute(insert(HtmlBlob).values(**blob).on_conflict_do_nothing(index_elements=["hash"]))
+    else:
+        db.add(HtmlBlob(**blob))
+        db.flush()
+    return digest
+
+
+def get_html(db: Session, digest: str) -> str:
+    chain = []
+    blob = db.get(HtmlBlob, digest)
+    if blob is None:
+        raise KeyError(digest)
+    while blob.kind == "delta":
+        chain.append(blob)
+        blob = db.get(HtmlBlob, blob.base_hash)
+    html = zlib.decompress(blob.data).decode("utf-8")
+    for delta in reversed(chain):
+        html = apply_delta(html, json.loads(zlib.decompress(delta.data)))
+    return html
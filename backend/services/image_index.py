@@ -0,0 +1,244 @@
+import itertools
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from PIL import Image
+from backend.core import metrics
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+PHASH_SIZE = 32
+PHASH_LOW = 8
+# DCT-II basis for the 8 lowest frequencies of a 32-sample row.
+_DCT = [
+    [math.cos(math.pi * u * (2 * x + 1) / (2 * PHASH_SIZE)) for x in range(PHASH_SIZE)]
+    for u in range(PHASH_LOW)
+]
+
+
+def dhash(image: Image.Image) -> int:
+    """Difference hash: brightness gradient between neighbours on a 9x8 grayscale thumbnail."""
+    pixels = image.convert("L").resize((9, 8), Image.BILINEAR).tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def phash(image: Image.Image) -> int:
+    """DCT hash: low 8x8 frequencies of a 32x32 grayscale thumbnail against their median."""
+    pixels = image.convert("L").resize((PHASH_SIZE, PHASH_SIZE), Image.BILINEAR).tobytes()
+    rows = [pixels[y * PHASH_SIZE:(y + 1) * PHASH_SIZE] for y in range(PHASH_SIZE)]
+    # Separable DCT, computing only the coefficients that end up in the hash.
+    row_coeffs = [[sum(b * p for b, p in zip(basis, row)) for basis in _DCT] for row in rows]
+    coeffs = [
+        sum(_DCT[v][y] * row_coeffs[y][u] for y in range(PHASH_SIZE))
+        for v in range(PHASH_LOW)
+        for u in range(PHASH_LOW)
+    ]
+    median = sorted(coeffs[1:])[len(coeffs) // 2 - 1]  # the DC term would skew the median
+    value = 0
+    for c in coeffs:
+        value = (value << 1) | (c > median)
+    return value
+
+
+def perceptual_hashes(image: Image.Image) -> Tuple[int, int]:
+    return phash(image), dhash(image)
+
+
+def _signed(value: int) -> int:
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def _unsigned(value: int) -> int:
+    return value & ((1 << HASH_BITS) - 1)
+
+
+def _segments(count: int) -> List[Tuple[int, int]]:
+    """Split 64 bits into count contiguous (shift, width) ranges of near-equal width."""
+    bounds = [HASH_BITS * i // count for i in range(count + 1)]
+    return [(bounds[i], bounds[i + 1] - bounds[i]) for i in range(count)]
+
+
+def _flip_masks(width: int, radius: int) -> List[int]:
+    """Every width-bit mask with at most radius bits set."""
+    return [
+        sum(1 << bit for bit in bits)
+        for k in range(radius + 1)
+        for bits in itertools.combinations(range(width), k)
+    ]
+
+
+class ImageIndex:
+    """
+    Near-duplicate lookup of analysed images by perceptual hash.
+
+    Multi-index hashing: the 64-bit pHash is split into m segments of about
+    log2(max_entries) bits, each with its own exact-match table. A hash
+    within max_distance bits of a stored one differs from it by at most
+    max_distance // m bits on some segment, so a lookup probes each table
+    with those few bit flips and only compares against the (small) buckets
+    it hits. The dHash is checked as well to reject pHash collisions.
+
+    Every entry belongs to the user whose upload it describes, and a
+    lookup only matches that user's entries: a description can quote
+    whatever text was in the screenshot.
+
+    Entries are kept in LRU order up to max_entries and persisted to a
+    SQLite file so they survive restarts.
+    """
+
+    def __init__(self, path: Optional[str], max_distance: int, max_entries: int):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        count = max(1, min(max_distance + 1, round(HASH_BITS / math.log2(max(max_entries, 2)))))
+        self._segments = _segments(count)
+        self._probes = [_flip_masks(width, max_distance // count) for _, width in self._segments]
+        self._tables: List[Dict[int, Set[int]]] = [{} for _ in self._segments]  # segment -> pHashes
+        self._ids: Dict[int, Set[int]] = {}  # pHash -> entry ids
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (phash, dhash, description, owner)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(image_analyses)")]
+            if columns and "owner" not in columns:
+                # Entries from before per-user scoping cannot be attributed to anyone
+                logger.info("Dropping image analyses stored without an owner")
+                self._conn.execute("DROP TABLE image_analyses")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS image_analyses ("
+                "id INTEGER PRIMARY KEY, owner TEXT NOT NULL, phash INTEGER NOT NULL, "
+                "dhash INTEGER NOT NULL, description TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.commit()
+            self._load()
+
+    def _load(self) -> None:
+        rows = self._conn.execute(
+            "SELECT id, phash, dhash, description, owner FROM image_analyses ORDER BY last_used DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for entry_id, p, d, description, owner in reversed(rows):
+            self._insert(entry_id, _unsigned(p), _unsigned(d), description, owner)
+        self._conn.execute(
+            "DELETE FROM image_analyses WHERE id NOT IN "
+            "(SELECT id FROM image_analyses ORDER BY last_used DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+        self._conn.commit()
+        logger.info(f"Loaded {len(rows)} image analyses into the perceptual-hash index")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _keys(self, p: int):
+        for (shift, width), table in zip(self._segments, self._tables):
+            yield table, (p >> shift) & ((1 << width) - 1)
+
+    def _insert(self, entry_id: int, p: int, d: int, description: str, owner: str) -> None:
+        self._entries[entry_id] = (p, d, description, owner)
+        ids = self._ids.setdefault(p, set())
+        ids.add(entry_id)
+        if len(ids) == 1:
+            for table, key in self._keys(p):
+                table.setdefault(key, set()).add(p)
+
+    def _remove(self, entry_id: int) -> None:
+        p = self._entries.pop(entry_id)[0]
+        ids = self._ids[p]
+        ids.discard(entry_id)
+        if ids:
+            return
+        del self._ids[p]
+        for table, key in self._keys(p):
+            bucket = table[key]
+            bucket.discard(p)
+            if not bucket:
+                del table[key]
+
+    def lookup(self, hashes: Tuple[int, int], owner) -> Optional[Tuple[str, int]]:
+        """Return (description, distance) of owner's closest stored image within max_distance."""
+        p, d = hashes
+        owner = str(owner)
+        with self._lock:
+            limit = self.max_distance
+            near: Set[int] = set()
+            for (table, key), probes in zip(self._keys(p), self._probes):
+                for flip in probes:
+                    bucket = table.get(key ^ flip)
+                    if bucket:
+                        near.update(h for h in bucket if (h ^ p).bit_count() <= limit)
+            best = None
+            for h in near:
+                distance = (h ^ p).bit_count()
+                for entry_id in self._ids[h]:
+                    entry = self._entries[entry_id]
+                    if entry[3] != owner or (entry[1] ^ d).bit_count() > limit:
+                        continue
+                    if best is None or distance < best[1]:
+                        best = (entry_id, distance)
+            if best is None:
+                metrics.inc("image_cache.misses")
+                return None
+            entry_id, distance = best
+            self._entries.move_to_end(entry_id)
+            if self._conn is not None:
+                self._conn.execute("UPDATE image_analyses SET last_used = ? WHERE id = ?", (time.time(), entry_id))
+                self._conn.commit()
+            metrics.inc("image_cache.hits")
+            return self._entries[entry_id][2], distance
+
+    def add(self, hashes: Tuple[int, int], description: str, owner) -> None:
+        p, d = hashes
+        owner = str(owner)
+        with self._lock:
+            if self._conn is not None:
+                cursor = self._conn.execute(
+                    "INSERT INTO image_analyses (owner, phash, dhash, description, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (owner, _signed(p), _signed(d), description, time.time()),
+                )
+                entry_id = cursor.lastrowid
+            else:
+                entry_id = self._next_id
+                self._next_id += 1
+            self._insert(entry_id, p, d, description, owner)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                evicted.append((oldest,))
+            if self._conn is not None:
+                if evicted:
+                    self._conn.executemany("DELETE FROM image_analyses WHERE id = ?", evicted)
+                self._conn.commit()
+            metrics.inc("image_cache.evictions", len(evicted))
+
+
+_index: Optional[ImageIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> ImageIndex:
+    """The process-wide index, loaded from disk on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ImageIndex(
+                settings.IMAGE_CACHE_PATH,
+                settings.IMAGE_CACHE_MAX_DISTANCE,
+                settings.IMAGE_CACHE_MAX_ENTRIES,
+            )
+            metrics.register_gauge("image_cache.entries", lambda: len(_index))
+        return _index
@@ -0,0 +1,211 @@
+import base64
+import io
+import math
+import zipfile
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from PIL import Image, features
+from backend.core import metrics
+from backend.core.config import settings
+from backend.services.image_index import perceptual_hashes
+
+READ_CHUNK_SIZE = 256 * 1024
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif")
+# Qwen2.5-VL turns every 28x28 pixel patch into one vision token.
+VISION_PATCH_SIZE = 28
+QUALITY_LADDER = (85, 75, 65, 50)
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+class InvalidImage(Exception):
+    pass
+
+
+class TooManyImages(Exception):
+    pass
+
+
+def estimate_vision_tokens(width: int, height: int) -> int:
+    return math.ceil(width / VISION_PATCH_SIZE) * math.ceil(height / VISION_PATCH_SIZE)
+
+
+@dataclass
+class ImageTile:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+
+@dataclass
+class PreparedImage:
+    """An upload decoded once and re-encoded as one or more VLM-sized tiles."""
+    original_width: int
+    original_height: int
+    original_size: int
+    tiles: List[ImageTile] = field(default_factory=list)
+    fingerprint: Optional[Tuple[int, int]] = None  # (pHash, dHash)
+
+    @property
+    def encoded_size(self) -> int:
+        return sum(len(tile.data) for tile in self.tiles)
+
+    @property
+    def vision_tokens(self) -> int:
+        return sum(estimate_vision_tokens(tile.width, tile.height) for tile in self.tiles)
+
+    def stats(self) -> dict:
+        original_tokens = estimate_vision_tokens(self.original_width, self.original_height)
+        return {
+            "tiles": len(self.tiles),
+            "format": self.tiles[0].mime_type if self.tiles else None,
+            "original_bytes": self.original_size,
+            "encoded_bytes": self.encoded_size,
+            "bytes_saved": max(0, self.original_size - self.encoded_size),
+            "original_vision_tokens": original_tokens,
+            "vision_tokens": self.vision_tokens,
+            "vision_tokens_saved": max(0, original_tokens - self.vision_tokens),
+        }
+
+
+async def read_upload(file, max_size: int) -> bytes:
+    """
+    Read an UploadFile in chunks, failing as soon as max_size is exceeded
+    instead of after the whole upload has been copied into memory.
+    """
+    if file.size is not None and file.size > max_size:
+        raise ImageTooLarge(file.size)
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_size:
+            raise ImageTooLarge(total)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def is_archive(filename: str, content_type: str) -> bool:
+    return content_type in ("application/zip", "application/x-zip-compressed") or (filename or "").lower().endswith(".zip")
+
+
+def expand_archive(data: bytes, max_files: int, max_size: int) -> List[Tuple[str, bytes]]:
+    """
+    Extract the images of a zip archive in name order (page order for
+    exports like page-01.png, page-02.png). Sizes are checked against the
+    archive directory before anything is decompressed.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile as e:
+        raise InvalidImage(str(e))
+    members = sorted(
+        (info for info in archive.infolist()
+         if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+         and not info.filename.startswith("__MACOSX/")),
+        key=lambda info: info.filename,
+    )
+    if len(members) > max_files:
+        raise TooManyImages(len(members))
+    images = []
+    for info in members:
+        if info.file_size > max_size:
+            raise ImageTooLarge(info.file_size)
+        images.append((info.filename.rsplit("/", 1)[-1], archive.read(info)))
+    return images
+
+
+def _output_format() -> str:
+    fmt = settings.IMAGE_FORMAT.lower()
+    if fmt == "auto":
+        return "WEBP" if features.check("webp") else "JPEG"
+    return {"jpg": "JPEG"}.get(fmt, fmt.upper())
+
+
+def _encode(image: Image.Image, fmt: str, target_bytes: int) -> ImageTile:
+    """
+    Encode without metadata, stepping quality down until the tile fits
+    target_bytes (or the lowest quality is reached).
+    """
+    data = b""
+    if fmt == "PNG":
+        buffered = io.BytesIO()
+        image.save(buffered, format="PNG", compress_level=3)
+        data = buffered.getvalue()
+    else:
+        for quality in QUALITY_LADDER:
+            buffered = io.BytesIO()
+            image.save(buffered, format=fmt, quality=quality)
+            data = buffered.getvalue()
+            if len(data) <= target_bytes:
+                break
+    return ImageTile(data=data, mime_type=f"image/{fmt.lower()}", width=image.width, height=image.height)
+
+
+def _fit(image: Image.Image, max_dimension: int, max_tiles: int) -> Image.Image:
+    """Downscale so the width fits max_dimension and the height fits in max_tiles tiles."""
+    width, height = image.size
+    scale = min(1.0, max_dimension / width, max_dimension * max_tiles / height)
+    if scale < 1.0:
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+    return image
+
+
+def prepare_image(data: bytes, max_dimension: int = None) -> PreparedImage:
+    """
+    Decode data once, fit it to the VLM's useful resolution, split tall
+    full-page screenshots into vertical tiles and encode each tile as
+    WebP/JPEG with adaptive quality, all in memory. EXIF and other metadata
+    are dropped by the re-encode.
+
+    With IMAGE_PREPROCESS disabled the image is sent at full resolution as
+    a single lossless PNG.
+    """
+    max_dimension = max_dimension or settings.IMAGE_MAX_DIMENSION
+    try:
+        image = Image.open(io.BytesIO(data))
+        original_width, original_height = image.size
+        if settings.IMAGE_PREPROCESS:
+            image.draft("RGB", (max_dimension, max_dimension))
+        # open() only reads the header; decode now so truncated or corrupt
+        # pixel data is reported here rather than by a later resize or hash
+        image.load()
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+    except Exception as e:
+        raise InvalidImage(str(e))
+
+    prepared = PreparedImage(
+        original_width=original_width,
+        original_height=original_height,
+        original_size=len(data),
+        fingerprint=perceptual_hashes(image),
+    )
+    if not settings.IMAGE_PREPROCESS:
+        prepared.tiles.append(_encode(image, "PNG", 0))
+        return prepared
+
+    image = _fit(image, max_dimension, settings.IMAGE_MAX_TILES)
+    tile_height = max(1, math.floor(min(max_dimension, image.width * settings.IMAGE_TILE_MAX_ASPECT)))
+    count = min(settings.IMAGE_MAX_TILES, math.ceil(image.height / tile_height))
+    tile_height = math.ceil(image.height / count)
+    fmt = _output_format()
+    for i in range(count):
+        box = (0, i * tile_height, image.width, min(image.height, (i + 1) * tile_height))
+        prepared.tiles.append(_encode(image.crop(box), fmt, settings.IMAGE_TARGET_BYTES))
+
+    stats = prepared.stats()
+    metrics.inc("image.bytes_saved", stats["bytes_saved"])
+    metrics.inc("image.vision_tokens_saved", stats["vision_tokens_saved"])
+    return prepared
@@ -1,55 +1,45 @@
-import base64
-import io
+import asyncio
 import json
-from PIL import Image
-import asyncio 
 import logging
-from openai import OpenAI
-from backend.db.models import User
+import weakref
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from backend.schemas.user import CurrentUser
 from backend.core.config import settings
+from backend.core.executor import image_pool
+from backend.services.streaming import StreamEvent, sse_stream
+from backend.services.section_parser import parse_sections
+from PIL import Image
+from backend.services.image_pipeline import PreparedImage, prepare_image, InvalidImage
+from backend.services.image_index import get_index
+from backend.services import llm_router
+from backend.services.continuation import complete_document
 
 logger = logging.getLogger(__name__)
+
+MAX_TOKENS = 85000
 api_key = settings.API_KEY  # Use the API key from settings
 
-def analyze_image(image_path: str) -> str:
+# Per-user cap on concurrent analyze_image calls, shared by all of a user's batches
+_user_slots: "weakref.WeakValueDictionary" = weakref.WeakValueDictionary()
+
+async def analyze_image(image: PreparedImage) -> str:
     """
     Analyze an uploaded image and provide a detailed description of its content and layout.
 
     Args:
-        image_path: The file path to the image to analyze
+        image: The decoded and re-encoded upload (see services.image_pipeline)
 
     Returns:
         A detailed description of the image content, layout, and website type
     """
-    if not image_path:
-        return "Error: No image path provided"
-
-    # Use the provided API key or default key (Note: The provided API key in the original code seems to be hardcoded and not used)
-    
+    if image is None:
+        return "Error: No image provided"
 
     if not api_key:
         return "Error: API key not provided"
 
     try:
-        # Open the image from the file path
-        try:
-            image = Image.open(image_path)
-        except FileNotFoundError:
-            return f"Error: Image file not found at {image_path}"
-        except Exception as e:
-            return f"Error opening image file: {str(e)}"
-
-        # Configure Nebius OpenAI client (Note: This is configured to use OpenRouter, not Nebius)
-        client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=api_key,
-        )
-
-        # Convert image to base64
-        buffered = io.BytesIO()
-        image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
         # Create prompt
         prompt = """
         Analyze this image and provide a concise description.
@@ -58,48 +48,127 @@ def analyze_image(image_path: str) -> str:
         Focus on structural and visual elements that would be important for recreating the design.
         """
 
-        # Use Qwen2.5-VL-72B-Instruct model for image analysis
-        response = client.chat.completions.create(
-            model="Qwen/Qwen2.5-VL-72B-Instruct",
-            messages=[
+        if len(image.tiles) > 1:
+            prompt += f"""
+        The screenshot is a full page split into {len(image.tiles)} vertical tiles, given top to bottom.
+        Describe it as one page.
+        """
+
+        # Vision model routes (Qwen2.5-VL-72B-Instruct on OpenRouter by default)
+        return await llm_router.complete(
+            settings.LLM_VISION_ROUTES,
+            api_key,
+            [
                 {
                     "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
+                    "content": [{"type": "text", "text": prompt}] + [
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/png;base64,{img_str}"
+                                "url": tile.data_url
                             }
                         }
+                        for tile in image.tiles
                     ]
                 }
             ],
+            temperature=0.7,
             max_tokens=1000,
-            temperature=0.7
         )
 
-        return response.choices[0].message.content
-
     except Exception as e:
         return f"Error analyzing image: {str(e)}"
 
-def generate_html_code(description: str, current_user: User) -> str:
+async def describe_image(image: PreparedImage, user_id) -> Tuple[str, Optional[int]]:
     """
-    Generate HTML/CSS/JavaScript code based on a website description.
-
-    Args:
-        description: Detailed description of the website to generate
-        nebius_api_key: Nebius API key for code generation
+    analyze_image behind the perceptual-hash cache of user_id's earlier uploads.
 
     Returns:
-        Complete HTML code with embedded CSS and JavaScript
+        (description, Hamming distance of the cached match or None if the model was called)
     """
-    if not description or description.startswith("Error"):
-        return "Error: Invalid or missing description"
+    if settings.IMAGE_CACHE_ENABLED:
+        index = await run_in_threadpool(get_index)
+        match = await run_in_threadpool(index.lookup, image.fingerprint, user_id)
+        if match is not None:
+            return match
+
+    description = await analyze_image(image)
 
+    if settings.IMAGE_CACHE_ENABLED and not description.startswith("Error"):
+        await run_in_threadpool(index.add, image.fingerprint, description, user_id)
+    return description, None
 
 
+def _user_slot(user_id) -> asyncio.Semaphore:
+    slot = _user_slots.get(user_id)
+    if slot is None:
+        slot = asyncio.Semaphore(settings.IMAGE_BATCH_CONCURRENCY)
+        _user_slots[user_id] = slot
+    return slot
+
+
+async def _describe_upload(position: int, filename: str, data: bytes, slot: asyncio.Semaphore, user_id) -> dict:
+    result = {"index": position, "filename": filename}
+    async with slot:
+        try:
+            image = await image_pool.run(prepare_image, data)
+        except (InvalidImage, OSError, Image.DecompressionBombError) as e:
+            # One bad upload fails on its own; the rest of the batch carries on
+            logger.error(f"Error processing image {filename}: {str(e)}")
+            return {**result, "error": "Invalid image file or unsupported format"}
+        description, distance = await describe_image(image, user_id)
+    if description.startswith("Error"):
+        return {**result, "error": description}
+    return {**result, "description": description, "cached": distance is not None}
+
+
+async def analyze_images(images: List[Tuple[str, bytes]], current_user: CurrentUser) -> AsyncIterator[dict]:
+    """
+    Analyze (filename, data) uploads concurrently, at most
+    IMAGE_BATCH_CONCURRENCY at a time per user, yielding each result as
+    soon as it completes. Results carry their upload index for ordering.
+    """
+    slot = _user_slot(current_user.id)
+    tasks = [
+        asyncio.ensure_future(_describe_upload(position, filename, data, slot, current_user.id))
+        for position, (filename, data) in enumerate(images)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Let cancelled uploads unwind (and release their slot) before returning
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def merge_descriptions(results: List[dict]) -> str:
+    """Combine per-page descriptions, in upload order, into one brief for generate_html_code."""
+    if len(results) == 1:
+        return results[0]["description"]
+    pages = "\n\n".join(
+        f"Page {n} ({result['filename']}):\n{result['description']}"
+        for n, result in enumerate(results, start=1)
+    )
+    return (
+        f"A multi-page website with {len(results)} pages, described below in order. "
+        "Build all pages in one HTML document with navigation between them and a consistent design.\n\n"
+        + pages
+    )
+
+
+async def generation_events(description: str, current_user: CurrentUser) -> AsyncIterator[StreamEvent]:
+    """
+    Start the code generation for a website description.
+
+    Args:
+        description: Detailed description of the website to generate
+        current_user: The user whose API key pays for the generation
+
+    Returns:
+        Section events (analysis/code/summary deltas and done) of the HTML stream
+    """
     # Inline system prompt and enhanced prompt
     system_prompt = """
 You are an expert web developer. You will respond in EXACTLY three parts separated by specific markers:
@@ -136,54 +205,68 @@ Generate a complete, production-ready website that exceeds modern web standards
 Remember to follow the three-part response format with proper markers for analysis, code, and summary.
 """
 
-    nvidia_client = OpenAI(
-        base_url="https://integrate.api.nvidia.com/v1",
-        api_key=current_user.api_key
-    )
-
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": enhanced_prompt}
     ]
 
-    response = nvidia_client.chat.completions.create(
-        model="moonshotai/kimi-k2-instruct",
-        messages=messages,
-        temperature=0.2,
-        max_tokens=85000,
-        stream=True
-    )
+    async def open_completion(messages, max_tokens, outcome=None):
+        return await llm_router.open_stream(settings.LLM_ROUTES, current_user.api_key, messages, 0.2, max_tokens, outcome)
 
-    async def stream_generator():
-        try:
-            for chunk in response:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content.encode("utf-8")
-                    await asyncio.sleep(0.01)
-        except Exception as e:
-            logger.error(f"Stream error: {str(e)}")
-            yield f"\n[ERROR]: Stream interrupted - {str(e)}".encode("utf-8")
+    return parse_sections(await complete_document(open_completion, messages, MAX_TOKENS))
 
-    return stream_generator()
 
+def is_valid_description(description: Optional[str]) -> bool:
+    """False for a missing description or an "Error..." result of analyze_image."""
+    return bool(description and description.strip()) and not description.startswith("Error")
 
-def screenshot_to_code(image_path: str) -> tuple:
-    """
-    Complete pipeline: analyze image and generate corresponding HTML code.
 
-    Args:
-        image_path: Screenshot image path to analyze
+async def generate_html_code(description: str, current_user: CurrentUser, request=None, lease=None):
+    """
+    Generate HTML/CSS/JavaScript code based on a website description.
 
     Returns:
-        Tuple of (description, html_code)
+        An SSE stream of the HTML code with embedded CSS and JavaScript;
+        a scheduler lease, when given, is held until the stream ends
+
+    Raises:
+        ValueError: the description is missing or is an analysis error
     """
-    # Analyze image
-    description = analyze_image(image_path)
+    if not is_valid_description(description):
+        raise ValueError("Invalid or missing description")
 
-    if description.startswith("Error"):
-        return description, "Error: Cannot generate code due to image analysis failure"
+    events = await generation_events(description, current_user)
+    if lease is not None:
+        events = lease.hold(events)
+    return sse_stream(events, request=request)
 
-    # Generate code
-    html_code = generate_html_code(description)
 
-    return description, html_code
\ No newline at end of file
+async def screenshot_to_code(
+    images: List[Tuple[str, bytes]],
+    current_user: CurrentUser,
+    merge: bool = False,
+    generate: bool = False,
+) -> AsyncIterator[StreamEvent]:
+    """
+    Complete pipeline: analyze screenshots and optionally generate the site.
+
+    Yields an "image.analysis" (or "image.error") event per screenshot as
+    it completes, then with merge or generate a "brief" event with the
+    combined description. With generate the code generation for the brief
+    is streamed next; otherwise a final "done" event reports the counts.
+    """
+    results: List[Optional[dict]] = [None] * len(images)
+    async for result in analyze_images(images, current_user):
+        results[result["index"]] = result
+        yield ("image.error" if "error" in result else "image.analysis"), json.dumps(result)
+
+    described = [result for result in results if "description" in result]
+    if described and (merge or generate):
+        brief = merge_descriptions(described)
+        yield "brief", json.dumps({"description": brief})
+        if generate:
+            async for event in await generation_events(brief, current_user):
+                yield event
+            return
+
+    yield "done", json.dumps({"analyzed": len(described), "failed": len(images) - len(described)})
\ No newline at end of file
@@ -0,0 +1,381 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from backend.core import metrics
+from backend.core.config import settings
+from backend.services import scheduler
+from backend.services.streaming import StreamEvent, coalesce
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+JOB_KINDS = ("generate", "website")
+
+INCOMPLETE = "Incomplete: the generation ended before the document was complete"
+
+
+class JobNotFound(Exception):
+    pass
+
+
+class JobStore:
+    """
+    Jobs and their append-only event logs in a local SQLite file (WAL mode,
+    so streams can read while the runner appends). Every worker process on
+    the host opens the same file; a queued job is claimed with a
+    conditional UPDATE, so only one of them runs it.
+    """
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, user_id TEXT NOT NULL, kind TEXT NOT NULL, params TEXT NOT NULL, "
+                "status TEXT NOT NULL, error TEXT, last_seq INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL, heartbeat_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_user ON jobs (user_id, created_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                "job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT, data TEXT NOT NULL, "
+                "PRIMARY KEY (job_id, seq)) WITHOUT ROWID"
+            )
+
+    def _execute(self, sql: str, args=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, args)
+
+    def _query(self, sql: str, args=()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def create(self, user_id: str, kind: str, params: dict) -> dict:
+        job_id = str(uuid.uuid4())
+        self._execute(
+            "INSERT INTO jobs (id, user_id, kind, params, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, user_id, kind, json.dumps(params), QUEUED, time.time()),
+        )
+        return self.get(job_id)
+
+    def get(self, job_id: str, user_id: Optional[str] = None) -> dict:
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        row = rows[0] if rows else None
+        if row is None or (user_id is not None and row["user_id"] != user_id):
+            raise JobNotFound(job_id)
+        return dict(row)
+
+    def list(self, user_id: str, limit: int = 50) -> List[dict]:
+        rows = self._query(
+            "SELECT * FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit)
+        )
+        return [dict(row) for row in rows]
+
+    def queued(self) -> List[str]:
+        rows = self._query("SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,))
+        return [row["id"] for row in rows]
+
+    def claim(self, job_id: str) -> bool:
+        now = time.time()
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+            (RUNNING, now, now, job_id, QUEUED),
+        )
+        return cursor.rowcount == 1
+
+    def append(self, job_id: str, seq: int, event: Optional[str], data: str) -> bool:
+        """
+        Append one event. Returns False if the job is no longer running
+        (cancelled), so the runner can stop.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET last_seq = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+                    (seq, time.time(), job_id, RUNNING),
+                )
+                if cursor.rowcount == 1:
+                    self._conn.execute(
+                        "INSERT INTO job_events (job_id, seq, event, data) VALUES (?, ?, ?, ?)",
+                        (job_id, seq, event, data),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_id: str) -> None:
+        self._execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING))
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+            (status, error, time.time(), job_id, QUEUED, RUNNING),
+        )
+
+    def cancel(self, job_id: str) -> bool:
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+            (CANCELLED, time.time(), job_id, QUEUED, RUNNING),
+        )
+        return cursor.rowcount == 1
+
+    def events(self, job_id: str, after: int, limit: int = 500) -> List[Tuple[int, Optional[str], str]]:
+        return [tuple(row) for row in self._query(
+            "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (job_id, after, limit),
+        )]
+
+    def fail_stale(self, stale_after: float) -> int:
+        """Jobs whose runner stopped heartbeating (process died) cannot be resumed upstream."""
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ? AND heartbeat_at < ?",
+            (FAILED, "Interrupted: the worker running this job stopped", time.time(), RUNNING,
+             time.time() - stale_after),
+        )
+        return cursor.rowcount
+
+    def prune(self, retention: float) -> int:
+        cutoff = time.time() - retention
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)", (cutoff,)
+            )
+            cursor = self._conn.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+            self._conn.execute("COMMIT")
+        return cursor.rowcount
+
+
+async def open_job_source(job: dict) -> AsyncIterator[StreamEvent]:
+    """Start the generation a job describes, as the current state of its user."""
+    from backend.core.security import get_current_user_snapshot
+
+    current_user = await get_current_user_snapshot(job["user_id"])
+    params = json.loads(job["params"])
+    if job["kind"] == "website":
+        from backend.services.image_to_website import generation_events
+        return await generation_events(params["description"], current_user)
+
+    from backend.services.website_generator import generation_events
+    return await generation_events(
+        params["prompt"],
+        current_user,
+        params.get("previous_html"),
+        params.get("previous_prompt"),
+        edit_output=params.get("edit_output", "document"),
+        project_id=params.get("project_id"),
+        version_id=params.get("version_id"),
+        mode=params.get("mode", "single"),
+        reuse=params.get("reuse"),
+    )
+
+
+class JobRunner:
+    """
+    A fixed pool of asyncio workers that run queued jobs, independent of
+    any HTTP connection. Each job's stream is coalesced into frames and
+    appended to the store; readers are woken through an in-process pulse
+    (and poll the store for jobs run by other processes).
+    """
+
+    def __init__(self, store: JobStore, workers: int):
+        self.store = store
+        self.workers = workers
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancelled = set()
+        self._pulses: Dict[str, asyncio.Event] = {}
+
+    async def start(self) -> None:
+        # Fresh per start, so the runner can be restarted on a new event loop
+        self._queue = asyncio.Queue()
+        self._pulses.clear()
+        stale = await run_in_threadpool(self.store.fail_stale, settings.JOBS_STALE_AFTER)
+        pruned = await run_in_threadpool(self.store.prune, settings.JOBS_RETENTION)
+        if stale or pruned:
+            logger.info(f"Jobs: {stale} interrupted, {pruned} expired")
+        for job_id in await run_in_threadpool(self.store.queued):
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        metrics.register_gauge("jobs.queued", self._queue.qsize)
+        metrics.register_gauge("jobs.running", lambda: len(self._running))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._running.values(), return_exceptions=True)
+
+    async def submit(self, user_id: str, kind: str, params: dict) -> dict:
+        job = await run_in_threadpool(self.store.create, user_id, kind, params)
+        self._queue.put_nowait(job["id"])
+        metrics.inc("jobs.submitted")
+        return job
+
+    async def cancel(self, job_id: str) -> bool:
+        cancelled = await run_in_threadpool(self.store.cancel, job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            self._cancelled.add(job_id)
+            task.cancel()
+        self._wake(job_id)
+        return cancelled
+
+    def pulse(self, job_id: str) -> asyncio.Event:
+        event = self._pulses.get(job_id)
+        if event is None:
+            event = self._pulses[job_id] = asyncio.Event()
+        return event
+
+    def _wake(self, job_id: str) -> None:
+        event = self._pulses.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def forget(self, job_id: str) -> None:
+        """Drop the pulse of a finished job (readers of jobs run elsewhere create one)."""
+        self._pulses.pop(job_id, None)
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                if not await run_in_threadpool(self.store.claim, job_id):
+                    continue  # cancelled, or claimed by another process
+                # _run handles its own cancellation, so this only raises
+                # CancelledError when the worker itself is being stopped
+                task = asyncio.ensure_future(self._run(job_id))
+                self._running[job_id] = task
+                try:
+                    await task
+                finally:
+                    self._running.pop(job_id, None)
+                    self._cancelled.discard(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker error on {job_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        # Keeps the job from looking abandoned while the model is silent
+        while True:
+            await asyncio.sleep(settings.JOBS_STALE_AFTER / 4)
+            await run_in_threadpool(self.store.heartbeat, job_id)
+
+    async def _run(self, job_id: str) -> None:
+        started = time.perf_counter()
+        seq = 0
+        status, error = SUCCEEDED, None
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id))
+        lease = None
+        try:
+            job = await run_in_threadpool(self.store.get, job_id)
+            # Rate-limited at submission; here the job only waits its turn
+            params = json.loads(job["params"])
+            edit = params.get("previous_html") or params.get("project_id")
+            lease = await scheduler.acquire(
+                job["user_id"],
+                scheduler.PRIORITY_EDIT if edit else scheduler.PRIORITY_FULL,
+                max_wait=None,
+                rate_limited=False,
+            )
+            source = await open_job_source(job)
+            frames = coalesce(source)
+            try:
+                async for event, data in frames:
+                    seq += 1
+                    if not await run_in_threadpool(self.store.append, job_id, seq, event, data):
+                        status = CANCELLED
+                        break
+                    self._wake(job_id)
+                    if status != SUCCEEDED:
+                        continue
+                    if event == "error":
+                        status, error = FAILED, data
+                    elif event == "done" and json.loads(data).get("code_complete") is False:
+                        status, error = FAILED, INCOMPLETE
+            finally:
+                await frames.aclose()
+        except asyncio.CancelledError:
+            if job_id in self._cancelled:
+                status = CANCELLED
+            else:
+                status, error = FAILED, "Interrupted: the server is shutting down"
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            status, error = FAILED, getattr(e, "detail", None) or str(e)
+        finally:
+            heartbeat.cancel()
+            if lease is not None:
+                await lease.release()
+        await run_in_threadpool(self.store.finish, job_id, status, error)
+        self._wake(job_id)
+        metrics.inc(f"jobs.{status}")
+        metrics.inc("jobs.run_seconds", time.perf_counter() - started)
+
+
+async def follow(runner: JobRunner, job_id: str, after: int = 0, request=None) -> AsyncIterator[Tuple[int, Optional[str], str]]:
+    """
+    Yield (seq, event, data) from the job's log after the given sequence
+    number, waiting for new entries until the job finishes. Works for jobs
+    run by any worker process sharing the store.
+    """
+    poll = settings.JOBS_POLL_INTERVAL_MS / 1000
+    while True:
+        # Read the status before the events, so entries appended just
+        # before the job finished are still picked up below.
+        job = await run_in_threadpool(runner.store.get, job_id)
+        while True:
+            rows = await run_in_threadpool(runner.store.events, job_id, after)
+            for seq, event, data in rows:
+                after = seq
+                yield seq, event, data
+            if not rows:
+                break
+        if job["status"] in FINISHED:
+            runner.forget(job_id)
+            return
+        if request is not None and await request.is_disconnected():
+            return
+        pulse = runner.pulse(job_id)
+        try:
+            await asyncio.wait_for(pulse.wait(), timeout=poll)
+        except asyncio.TimeoutError:
+            pass
+
+
+runner: Optional[JobRunner] = None
+
+
+def get_runner() -> JobRunner:
+    global runner
+    if runner is None:
+        runner = JobRunner(JobStore(settings.JOBS_DB_PATH), settings.JOBS_WORKERS)
+    return runner
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import httpx
+from openai import AsyncOpenAI
+from backend.core import metrics
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+NVIDIA_BASE_URL = "https://integrate.api.nvidia.com/v1"
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# One pooled HTTP/2 transport per upstream host, shared by every API key.
+# The OpenAI wrappers are cheap and only carry the key, so they are kept in a
+# bounded LRU and simply dropped on eviction; the warm connections stay.
+_lock = threading.Lock()
+_transports: Dict[str, httpx.AsyncClient] = {}
+_clients: "OrderedDict[Tuple[str, str], AsyncOpenAI]" = OrderedDict()
+
+metrics.register_gauge("llm.clients.cached", lambda: len(_clients))
+metrics.register_gauge("llm.transports.open", lambda: len(_transports))
+
+
+def _get_transport(base_url: str) -> httpx.AsyncClient:
+    transport = _transports.get(base_url)
+    if transport is None:
+        transport = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(600.0, connect=10.0),
+        )
+        _transports[base_url] = transport
+    return transport
+
+
+def get_client(base_url: str, api_key: str) -> AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client for (base_url, api_key).
+
+    Clients for the same host reuse one connection pool, so a user's first
+    request still lands on an already-negotiated TLS/HTTP2 connection.
+    """
+    key = (base_url, api_key)
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            metrics.inc("llm.clients.hits")
+            return client
+
+        metrics.inc("llm.clients.misses")
+        client = AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=_get_transport(base_url))
+        _clients[key] = client
+        while len(_clients) > settings.LLM_CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+            metrics.inc("llm.clients.evictions")
+        return client
+
+
+# Rough characters per token of generated HTML and prose, for estimates only
+CHARS_PER_TOKEN = 4
+
+
+async def stream_deltas(completion, max_tokens: Optional[int] = None, outcome: Optional[dict] = None):
+    """
+    Yield (None, text) for every content delta of a streamed completion.
+
+    The upstream HTTP stream is closed however iteration ends, so a consumer
+    that stops early (client disconnect) stops the generation upstream too,
+    and is counted as a cancellation. With max_tokens, the cancellation also
+    adds to generation.tokens_saved_estimate: the budget left after the text
+    produced so far, at CHARS_PER_TOKEN characters per token. It is an upper
+    bound, as the model may have finished before using its whole budget.
+    The choice's finish_reason is stored in outcome["finish_reason"] if given.
+    """
+    produced = 0
+    try:
+        async for chunk in completion:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason and outcome is not None:
+                outcome["finish_reason"] = choice.finish_reason
+            if choice.delta.content:
+                produced += len(choice.delta.content)
+                yield None, choice.delta.content
+    except (asyncio.CancelledError, GeneratorExit):
+        metrics.inc("generation.cancelled")
+        if max_tokens:
+            metrics.inc("generation.tokens_saved_estimate", max(0, max_tokens - produced // CHARS_PER_TOKEN))
+        raise
+    except Exception as e:
+        logger.error(f"Stream error: {str(e)}")
+        yield "error", f"Stream interrupted - {str(e)}"
+    finally:
+        await completion.close()
+
+
+async def warmup(base_url: str) -> None:
+    """Open (or keep alive) a connection to base_url."""
+    transport = _get_transport(base_url)
+    try:
+        await transport.head(base_url, timeout=10.0)
+    except Exception as e:
+        logger.debug(f"Warmup of {base_url} failed: {str(e)}")
+
+
+async def keep_warm() -> None:
+    """
+    Background task: warm the known upstreams at startup and ping them
+    periodically so idle connections are not expired by keepalive_expiry.
+    """
+    for base_url in (NVIDIA_BASE_URL, OPENROUTER_BASE_URL):
+        _get_transport(base_url)
+    while True:
+        await asyncio.gather(*(warmup(base_url) for base_url in list(_transports)))
+        await asyncio.sleep(settings.LLM_WARMUP_INTERVAL)
+
+
+async def close_all() -> None:
+    with _lock:
+        transports = list(_transports.values())
+        _transports.clear()
+        _clients.clear()
+    for transport in transports:
+        await transport.aclose()
@@ -0,0 +1,304 @@
+import asyncio
+import functools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import httpx
+import openai
+from openai import AsyncOpenAI
+from backend.core import metrics
+from backend.core.config import settings
+from backend.services.streaming import StreamEvent
+from backend.services.llm_clients import get_client, stream_deltas, NVIDIA_BASE_URL, OPENROUTER_BASE_URL
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_WINDOW = 200  # recent latencies kept per route for the hedge percentile
+MIN_SAMPLES = 20  # below this the hedge uses LLM_HEDGE_DEFAULT_DELAY
+
+# What a latency sample measures: time to the first streamed token, or to
+# a whole non-streamed completion. Kept apart so that slow plans and
+# vision calls do not push the hedge deadline of streams out.
+TTFT = "ttft"
+TOTAL = "total"
+
+
+@dataclass(frozen=True)
+class Route:
+    """One model on one OpenAI-compatible provider."""
+    provider: str
+    base_url: str
+    model: str
+    api_key: Optional[str]  # None: use the caller's key
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+
+class NoRouteAvailable(Exception):
+    """None of the configured routes can be used."""
+
+
+def _providers() -> Dict[str, Tuple[str, Optional[str]]]:
+    providers = {
+        "nvidia": (NVIDIA_BASE_URL, None),
+        "openrouter": (OPENROUTER_BASE_URL, settings.API_KEY or ""),
+    }
+    for entry in settings.LLM_PROVIDERS.split(","):
+        name, sep, base_url = entry.strip().partition("=")
+        if sep:
+            providers[name.strip()] = (base_url.strip(), None)
+    return providers
+
+
+@functools.lru_cache(maxsize=None)
+def routes(spec: str) -> Tuple[Route, ...]:
+    """Parse a comma-separated list of provider:model routes (see LLM_ROUTES)."""
+    providers = _providers()
+    parsed = []
+    for entry in spec.split(","):
+        provider, sep, model = entry.strip().partition(":")
+        if not sep:
+            continue
+        if provider not in providers:
+            logger.warning(f"Unknown LLM provider in route {entry.strip()!r}")
+            continue
+        base_url, api_key = providers[provider]
+        parsed.append(Route(provider, base_url, model.strip(), api_key))
+    return tuple(parsed)
+
+
+class LatencyStats:
+    """Latency of one route: an EWMA for ordering and a window of samples for the hedge deadline."""
+
+    def __init__(self):
+        self.ewma: Optional[float] = None
+        self.samples: Deque[float] = deque(maxlen=SAMPLE_WINDOW)
+
+    def observe(self, seconds: float) -> None:
+        alpha = settings.LLM_ROUTER_EWMA_ALPHA
+        self.ewma = seconds if self.ewma is None else (1 - alpha) * self.ewma + alpha * seconds
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self.samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+_stats: Dict[Tuple[str, str, str], LatencyStats] = {}
+_cooldowns: Dict[Tuple[str, str], float] = {}  # (provider, model) -> monotonic time it may be used again
+
+
+def stats(route: Route, kind: str = TTFT) -> LatencyStats:
+    key = (route.provider, route.model, kind)
+    entry = _stats.get(key)
+    if entry is None:
+        entry = _stats[key] = LatencyStats()
+        prefix = f"llm.route.{route.name}." + ("" if kind == TTFT else f"{kind}_")
+        metrics.register_gauge(prefix + "latency_ewma", lambda: entry.ewma)
+        metrics.register_gauge(prefix + "samples", lambda: len(entry.samples))
+    return entry
+
+
+def cooldown_until(route: Route) -> float:
+    return _cooldowns.get((route.provider, route.model), 0.0)
+
+
+def hedge_delay(route: Route, kind: str = TTFT) -> float:
+    """Seconds to wait for route before hedging: its LLM_HEDGE_PERCENTILE latency of this kind."""
+    delay = stats(route, kind).percentile(settings.LLM_HEDGE_PERCENTILE)
+    if delay is None:
+        delay = settings.LLM_HEDGE_DEFAULT_DELAY
+    return max(settings.LLM_HEDGE_MIN_DELAY, delay)
+
+
+def is_retryable(e: BaseException) -> bool:
+    """Rate limits, server errors and transport failures fail over to the next route."""
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code == 429 or e.status_code >= 500
+    return isinstance(e, (openai.APIConnectionError, httpx.TransportError))
+
+
+def _cooldown(e: BaseException) -> float:
+    response = getattr(e, "response", None)
+    if response is not None:
+        try:
+            return float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    return settings.LLM_ROUTER_COOLDOWN
+
+
+def _order(candidates: Tuple[Route, ...], api_key: Optional[str], kind: str) -> List[Route]:
+    """
+    Usable routes, fastest first. Routes without samples keep their
+    configured place ahead of measured ones so they get measured; routes
+    cooling down after a 429/5xx go last.
+    """
+    now = time.monotonic()
+    usable = [route for route in candidates if route.api_key or (route.api_key is None and api_key)]
+    healthy = [route for route in usable if cooldown_until(route) <= now]
+    cooling = sorted((route for route in usable if route not in healthy), key=cooldown_until)
+    healthy.sort(key=lambda route: stats(route, kind).ewma or 0.0)
+    return healthy + cooling
+
+
+async def _race(
+    candidates: Tuple[Route, ...],
+    api_key: Optional[str],
+    attempt: Callable[[AsyncOpenAI, Route], Awaitable[Any]],
+    discard: Callable[[Any], Awaitable[None]],
+    kind: str,
+) -> Tuple[Route, Any]:
+    """
+    Run attempt on the best route. If it has not answered by its hedge
+    deadline a second route is started alongside (once); a route failing
+    with a retryable error is replaced by the next one. The first success
+    wins and the attempts still running are cancelled. Latencies are
+    recorded, and deadlines taken, from the stats of this kind.
+    """
+    queue = _order(candidates, api_key, kind)
+    if not queue:
+        raise NoRouteAvailable("No LLM route has an API key configured")
+
+    pending: Dict[asyncio.Future, Tuple[Route, float]] = {}
+    last_error: Optional[BaseException] = None
+    hedged = not settings.LLM_HEDGE_ENABLED
+    winner = None
+
+    def launch() -> None:
+        route = queue.pop(0)
+        # Retries are the router's job: a 429/5xx fails over instead of backing off
+        client = get_client(route.base_url, route.api_key or api_key).with_options(max_retries=0)
+        pending[asyncio.ensure_future(attempt(client, route))] = (route, time.monotonic())
+        metrics.inc("llm.router.attempts")
+
+    launch()
+    try:
+        while pending and winner is None:
+            timeout = None
+            if not hedged and queue:
+                route, started = next(iter(pending.values()))
+                timeout = max(0.0, started + hedge_delay(route, kind) - time.monotonic())
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                metrics.inc("llm.router.hedged")
+                launch()
+                continue
+            for task in done:
+                route, started = pending.pop(task)
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    logger.warning(f"LLM route {route.name} failed: {str(last_error)}")
+                    metrics.inc("llm.router.errors")
+                    if is_retryable(last_error):
+                        _cooldowns[(route.provider, route.model)] = time.monotonic() + _cooldown(last_error)
+                        if queue:
+                            metrics.inc("llm.router.failovers")
+                            launch()
+                elif winner is None:
+                    stats(route, kind).observe(time.monotonic() - started)
+                    metrics.inc(f"llm.route.{route.name}.wins")
+                    winner = route, task.result()
+                else:
+                    await discard(task.result())
+    finally:
+        losers = list(pending.items())
+        for task, _ in losers:
+            task.cancel()
+        for task, (route, started) in losers:
+            try:
+                await task
+            except BaseException:
+                pass
+            else:
+                await discard(task.result())
+            if winner is not None:
+                # The loser took at least this long; without the sample a
+                # slow route would keep its stale, optimistic average.
+                stats(route, kind).observe(time.monotonic() - started)
+                metrics.inc("llm.router.cancelled")
+
+    if winner is None:
+        raise last_error
+    return winner
+
+
+async def _first_delta(client: AsyncOpenAI, route: Route, request: dict) -> Tuple[Any, Any]:
+    """Open a streamed completion and read up to its first content chunk (None if it has none)."""
+    completion = await client.chat.completions.create(model=route.model, stream=True, **request)
+    try:
+        while True:
+            try:
+                chunk = await completion.__anext__()
+            except StopAsyncIteration:
+                return completion, None
+            if chunk.choices and (chunk.choices[0].delta.content or chunk.choices[0].finish_reason):
+                return completion, chunk
+    except BaseException:
+        await completion.close()
+        raise
+
+
+async def _close(opened: Tuple[Any, Any]) -> None:
+    await opened[0].close()
+
+
+async def _resume(completion, first, max_tokens: int, outcome: Optional[dict]) -> AsyncIterator[StreamEvent]:
+    if first is not None:
+        choice = first.choices[0]
+        if choice.finish_reason and outcome is not None:
+            outcome["finish_reason"] = choice.finish_reason
+        if choice.delta.content:
+            yield None, choice.delta.content
+    async for event in stream_deltas(completion, max_tokens, outcome):
+        yield event
+
+
+async def open_stream(
+    spec: str,
+    api_key: Optional[str],
+    messages: List[dict],
+    temperature: float,
+    max_tokens: int,
+    outcome: Optional[dict] = None,
+) -> AsyncIterator[StreamEvent]:
+    """
+    Stream a completion from the routes in spec (see LLM_ROUTES), hedged
+    on time-to-first-token. Returns once the first delta has arrived;
+    after that the stream is committed to the winning route. outcome, if
+    given, receives the finish_reason (see stream_deltas).
+    """
+    request = {"messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+    route, (completion, first) = await _race(
+        routes(spec), api_key, lambda client, route: _first_delta(client, route, request), _close, TTFT
+    )
+    return _resume(completion, first, max_tokens, outcome)
+
+
+async def _discard_nothing(_result) -> None:
+    pass
+
+
+async def complete(
+    spec: str,
+    api_key: Optional[str],
+    messages: List[dict],
+    temperature: float,
+    max_tokens: int,
+) -> str:
+    """Non-streamed completion from the routes in spec, hedged on total latency."""
+    async def attempt(client: AsyncOpenAI, route: Route) -> str:
+        response = await client.chat.completions.create(
+            model=route.model, messages=messages, temperature=temperature, max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+
+    route, content = await _race(routes(spec), api_key, attempt, _discard_nothing, TOTAL)
+    return content
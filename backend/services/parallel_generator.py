@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import re
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import quote_plus
+from backend.core import metrics
+from backend.core.config import settings
+from backend.services import llm_router, scheduler
+from backend.services.streaming import StreamEvent
+
+logger = logging.getLogger(__name__)
+
+TEMPERATURE = 0.2
+DEFAULT_SECTIONS = [
+    {"id": "hero", "brief": "Hero with headline, supporting text and a call to action"},
+    {"id": "features", "brief": "Key features or services"},
+    {"id": "pricing", "brief": "Pricing plans"},
+    {"id": "faq", "brief": "Frequently asked questions"},
+    {"id": "footer", "brief": "Footer with navigation, contact details and copyright"},
+]
+DEFAULT_PALETTE = {
+    "primary": "#4f46e5", "secondary": "#0ea5e9", "accent": "#f59e0b", "background": "#ffffff", "text": "#111827",
+}
+DEFAULT_FONTS = {"heading": "Poppins", "body": "Inter"}
+
+_COLOR = re.compile(r"^#[0-9a-fA-F]{3,8}$")
+_NAME = re.compile(r"^[A-Za-z0-9 ]{1,40}$")
+_SECTION_ID = re.compile(r"[^a-z0-9-]+")
+
+
+def get_planning_prompt():
+    return """
+You are an expert web designer planning a single-page website that other developers will build section by section.
+Respond with ONLY a JSON object, no markdown and no commentary, in this shape:
+{
+  "title": "page title",
+  "analysis": "a brief analysis of what the user needs and what type of website would best serve them",
+  "palette": {"primary": "#hex", "secondary": "#hex", "accent": "#hex", "background": "#hex", "text": "#hex"},
+  "fonts": {"heading": "Google Font name", "body": "Google Font name"},
+  "sections": [{"id": "hero", "brief": "what this section contains"}]
+}
+Use 4 to 8 sections in page order, usually starting with a navigation or hero section and ending with a footer.
+"""
+
+
+def get_section_system_prompt():
+    return """
+You are an expert web developer building ONE section of a larger single-page website with TailwindCSS.
+Output ONLY the HTML of that section: a single root element (<nav>, <header>, <section> or <footer>) with the given id.
+A <script> inside the root element is allowed if the section needs interactivity.
+Do NOT output <!DOCTYPE>, <html>, <head> or <body>, markdown code fences, or any text besides the HTML.
+The page defines these Tailwind theme extensions, use them for a consistent design:
+colors primary, secondary, accent, background and text (e.g. bg-primary, text-accent), fonts font-heading and font-body.
+If You want to use image use www.unsplash.com. to get images(use related images). If you want to use ICON make sure to import the library first.
+"""
+
+
+def parse_plan(text: str) -> dict:
+    """The planning response as a plan, with defaults for anything missing or malformed."""
+    plan = {}
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            plan = json.loads(text[start:end + 1])
+        except ValueError:
+            logger.warning("Unparseable page plan; using the default outline")
+    if not isinstance(plan, dict):
+        plan = {}
+
+    palette = dict(DEFAULT_PALETTE)
+    for name, value in (plan.get("palette") or {}).items():
+        if name in palette and isinstance(value, str) and _COLOR.match(value):
+            palette[name] = value
+    fonts = dict(DEFAULT_FONTS)
+    for name, value in (plan.get("fonts") or {}).items():
+        if name in fonts and isinstance(value, str) and _NAME.match(value):
+            fonts[name] = value
+
+    sections, seen = [], set()
+    for section in plan.get("sections") or []:
+        if not isinstance(section, dict):
+            continue
+        section_id = _SECTION_ID.sub("-", str(section.get("id", "")).lower()).strip("-")
+        if not section_id or section_id in seen:
+            continue
+        seen.add(section_id)
+        sections.append({"id": section_id, "brief": str(section.get("brief", ""))})
+    return {
+        "title": str(plan.get("title") or "Website"),
+        "analysis": str(plan.get("analysis") or ""),
+        "palette": palette,
+        "fonts": fonts,
+        "sections": sections[:settings.PARALLEL_MAX_SECTIONS] or DEFAULT_SECTIONS,
+    }
+
+
+def render_head(plan: dict) -> str:
+    """Document prologue shared by every section: Tailwind with the plan's design tokens, fonts."""
+    fonts = plan["fonts"]
+    tailwind_config = {
+        "theme": {
+            "extend": {
+                "colors": plan["palette"],
+                "fontFamily": {name: [family, "sans-serif"] for name, family in fonts.items()},
+            }
+        }
+    }
+    families = "&".join(f"family={quote_plus(family)}:wght@400;600;700" for family in dict.fromkeys(fonts.values()))
+    title = plan["title"].replace("&", "&amp;").replace("<", "&lt;")
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{title}</title>
+<script src="https://cdn.tailwindcss.com"></script>
+<script>tailwind.config = {json.dumps(tailwind_config)}</script>
+<link rel="preconnect" href="https://fonts.googleapis.com">
+<link href="https://fonts.googleapis.com/css2?{families}&display=swap" rel="stylesheet">
+</head>
+<body class="bg-background text-text font-body antialiased">
+"""
+
+
+def section_messages(prompt: str, plan: dict, section: dict) -> List[dict]:
+    outline = "\n".join(f"- {s['id']}: {s['brief']}" for s in plan["sections"])
+    return [
+        {"role": "system", "content": get_section_system_prompt()},
+        {"role": "user", "content": (
+            f"Website: {prompt}\n\nPage outline (in order):\n{outline}\n\n"
+            f"Write the \"{section['id']}\" section: {section['brief']}\n"
+            f"Use id=\"{section['id']}\" on the root element."
+        )},
+    ]
+
+
+async def _strip_fences(deltas: AsyncIterator[StreamEvent]) -> AsyncIterator[StreamEvent]:
+    """Drop markdown code fence lines a model wraps its section in."""
+    partial = ""
+    async for event, data in deltas:
+        if event is not None:
+            yield event, data
+            continue
+        partial += data
+        lines = partial.split("\n")
+        partial = lines.pop()
+        kept = [line for line in lines if not line.lstrip().startswith("```")]
+        if kept:
+            yield None, "\n".join(kept) + "\n"
+    if partial and not partial.lstrip().startswith("```"):
+        yield None, partial + "\n"
+
+
+async def plan_page(prompt: str, api_key: str) -> dict:
+    text = await llm_router.complete(
+        settings.LLM_ROUTES,
+        api_key,
+        [{"role": "system", "content": get_planning_prompt()}, {"role": "user", "content": prompt}],
+        TEMPERATURE,
+        settings.PARALLEL_PLAN_MAX_TOKENS,
+    )
+    return parse_plan(text or "")
+
+
+async def _extra_leases(user_id, wanted: int) -> list:
+    """Up to wanted more scheduler slots for user_id; stops at the first that is not free in time."""
+    leases = []
+    try:
+        for _ in range(max(0, wanted)):
+            leases.append(await scheduler.acquire(
+                user_id, scheduler.PRIORITY_FULL, max_wait=settings.PARALLEL_SLOT_WAIT, rate_limited=False
+            ))
+    except scheduler.Rejected:
+        pass
+    except BaseException:
+        for lease in leases:
+            await lease.release()
+        raise
+    metrics.inc("generation.parallel.extra_slots", len(leases))
+    return leases
+
+
+async def generate_parallel(prompt: str, api_key: str, user_id) -> AsyncIterator[StreamEvent]:
+    """
+    Full generation as a plan plus concurrently generated sections.
+
+    A planning call fixes the outline and design tokens. Every section is
+    then generated as its own completion, at most PARALLEL_CONCURRENCY at a
+    time, and stitched into one document between the shared <head> and the
+    closing tags. Output is the raw three-part response text (for
+    parse_sections), in document order: a section streams live once every
+    section before it is finished, and is buffered until then.
+
+    Each concurrent section stream holds one scheduler slot of user_id.
+    The slot the request was admitted with covers one stream; up to
+    PARALLEL_CONCURRENCY - 1 more are taken before the first section
+    starts, waiting at most PARALLEL_SLOT_WAIT for each. Sections run on
+    as many slots as were free, one at a time when none were, and the
+    extra slots are released when the last section ends. Nothing is
+    started until the returned stream is first read.
+    """
+    plan = await plan_page(prompt, api_key)
+    sections = plan["sections"]
+    queues: List[asyncio.Queue] = [asyncio.Queue() for _ in sections]
+    metrics.inc("generation.parallel")
+    metrics.inc("generation.parallel.sections", len(sections))
+
+    async def run_section(index: int, section: dict, slots: asyncio.Semaphore) -> None:
+        queue = queues[index]
+        try:
+            async with slots:
+                deltas = await llm_router.open_stream(
+                    settings.LLM_ROUTES,
+                    api_key,
+                    section_messages(prompt, plan, section),
+                    TEMPERATURE,
+                    settings.PARALLEL_SECTION_MAX_TOKENS,
+                )
+                async for event in _strip_fences(deltas):
+                    queue.put_nowait(event)
+        except Exception as e:
+            logger.error(f"Section {section['id']} failed: {str(e)}")
+            metrics.inc("generation.parallel.failed_sections")
+            queue.put_nowait(("error", f"Section {section['id']} failed - {str(e)}"))
+        finally:
+            queue.put_nowait(None)
+
+    async def stitched() -> AsyncIterator[StreamEvent]:
+        leases = await _extra_leases(user_id, min(settings.PARALLEL_CONCURRENCY, len(sections)) - 1)
+        slots = asyncio.Semaphore(1 + len(leases))
+        tasks = [asyncio.ensure_future(run_section(i, section, slots)) for i, section in enumerate(sections)]
+        try:
+            yield None, f"===ANALYSIS_START===\n{plan['analysis']}\n===ANALYSIS_END===\n"
+            yield None, "===CODE_START===\n" + render_head(plan)
+            failed: List[str] = []
+            for section, queue in zip(sections, queues):
+                while True:
+                    event = await queue.get()
+                    if event is None:
+                        break
+                    if event[0] == "error":
+                        failed.append(section["id"])
+                        yield "section.error", json.dumps({"section": section["id"], "error": event[1]})
+                        yield None, f"<!-- section {section['id']} could not be generated -->\n"
+                    elif event[0] is None:
+                        yield event
+            yield None, "</body>\n</html>\n===CODE_END===\n"
+            built = [s for s in sections if s["id"] not in failed]
+            summary = "\n".join(f"- {s['id']}: {s['brief']}" for s in built)
+            yield None, (
+                f"===SUMMARY_START===\nBuilt \"{plan['title']}\" from {len(built)} sections generated in parallel "
+                f"with a shared palette and fonts ({plan['fonts']['heading']} / {plan['fonts']['body']}):\n"
+                f"{summary}\n===SUMMARY_END===\n"
+            )
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for lease in leases:
+                await lease.release()
+
+    return stitched()
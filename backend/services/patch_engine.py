@@ -0,0 +1,227 @@
+import difflib
+import json
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Tuple, Union
+from backend.services.streaming import StreamEvent
+
+_SEARCH = re.compile(r"^<{5,}\s*SEARCH$")
+_DIVIDER = re.compile(r"^={5,}$")
+_REPLACE = re.compile(r"^>{5,}\s*REPLACE$")
+
+
+@dataclass
+class PatchBlock:
+    search: str
+    replace: str
+
+
+class PatchStreamParser:
+    """
+    Incremental parser for <<<<<<< SEARCH / ======= / >>>>>>> REPLACE blocks.
+
+    feed() returns the prose outside the blocks as text and every block as
+    soon as its REPLACE marker has been read, so patches can be applied
+    while the model is still writing the next one.
+    """
+
+    def __init__(self):
+        self._state = "text"
+        self._partial = ""
+        self._search: List[str] = []
+        self._replace: List[str] = []
+
+    def _line(self, line: str, out: List[Union[str, PatchBlock]]) -> None:
+        marker = line.strip()
+        if self._state == "text":
+            if _SEARCH.match(marker):
+                self._state = "search"
+                self._search, self._replace = [], []
+            else:
+                out.append(line)
+        elif self._state == "search":
+            if _DIVIDER.match(marker):
+                self._state = "replace"
+            else:
+                self._search.append(line)
+        elif _REPLACE.match(marker):
+            self._state = "text"
+            out.append(PatchBlock("".join(self._search), "".join(self._replace)))
+        else:
+            self._replace.append(line)
+
+    def feed(self, text: str) -> List[Union[str, PatchBlock]]:
+        out: List[Union[str, PatchBlock]] = []
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._line(line + "\n", out)
+        # Prose can be shown before its line ends, unless it may be a marker.
+        if self._state == "text" and self._partial and not self._partial.lstrip().startswith("<"):
+            out.append(self._partial)
+            self._partial = ""
+        return out
+
+    def finish(self) -> List[Union[str, PatchBlock]]:
+        out: List[Union[str, PatchBlock]] = []
+        if self._partial:
+            self._line(self._partial, out)
+            self._partial = ""
+        return out
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _fuzzy_span(document: str, search: str) -> Optional[Tuple[int, int]]:
+    """
+    Find search in document ignoring indentation, inner whitespace and
+    blank lines. Returns the character span of the matched lines.
+    """
+    wanted = [_normalize(line) for line in search.splitlines() if line.strip()]
+    if not wanted:
+        return None
+    offsets = []
+    lines = []
+    pos = 0
+    for line in document.splitlines(keepends=True):
+        if line.strip():
+            offsets.append((pos, pos + len(line)))
+            lines.append(_normalize(line))
+        pos += len(line)
+    count = len(wanted)
+    for i in range(len(lines) - count + 1):
+        if lines[i] == wanted[0] and lines[i:i + count] == wanted:
+            return offsets[i][0], offsets[i + count - 1][1]
+    return None
+
+
+def locate_block(document: str, block: PatchBlock, spans: Optional[List[List[int]]] = None):
+    """
+    Find where block applies in document. Returns (start, end, replacement,
+    strategy) with strategy "exact", "trimmed" or "whitespace", or None.
+
+    Matches inside the given spans (the fragments the model was shown) are
+    preferred over matches elsewhere in the document.
+    """
+    if not block.search.strip():
+        return 0, 0, block.replace, "exact"
+
+    spans = spans or []
+    candidates = [(block.search, block.replace, "exact")]
+    if block.search.endswith("\n"):
+        candidates.append((block.search.rstrip("\n"), block.replace.rstrip("\n"), "trimmed"))
+    for search, replace, strategy in candidates:
+        for span_start, span_end in spans:
+            idx = document.find(search, span_start, span_end)
+            if idx != -1:
+                return idx, idx + len(search), replace, strategy
+        idx = document.find(search)
+        if idx != -1:
+            return idx, idx + len(search), replace, strategy
+
+    match = None
+    for span_start, span_end in spans:
+        local = _fuzzy_span(document[span_start:span_end], block.search)
+        if local is not None:
+            match = (span_start + local[0], span_start + local[1])
+            break
+    if match is None:
+        match = _fuzzy_span(document, block.search)
+    if match is None:
+        return None
+    start, end = match
+    replace = block.replace
+    if document[start:end].endswith("\n") and replace and not replace.endswith("\n"):
+        replace += "\n"
+    return start, end, replace, "whitespace"
+
+
+def apply_block(document: str, block: PatchBlock, spans: Optional[List[List[int]]] = None) -> Tuple[str, Optional[str]]:
+    """
+    Apply one block to document. Returns the new document and the matching
+    strategy used, or None as the strategy when the block did not match.
+    """
+    located = locate_block(document, block, spans)
+    if located is None:
+        return document, None
+    start, end, replace, strategy = located
+    return document[:start] + replace + document[end:], strategy
+
+
+def _shift_spans(spans: List[List[int]], start: int, end: int, delta: int) -> None:
+    for span in spans:
+        if span[0] >= end:
+            span[0] += delta
+            span[1] += delta
+        elif span[1] >= end:
+            span[1] += delta
+
+
+def unified_diff(before: str, after: str) -> str:
+    return "".join(difflib.unified_diff(
+        before.splitlines(keepends=True),
+        after.splitlines(keepends=True),
+        fromfile="previous.html",
+        tofile="current.html",
+    ))
+
+
+async def apply_patch_stream(
+    source: AsyncIterator[StreamEvent],
+    document: str,
+    spans: Optional[List[List[int]]] = None,
+) -> AsyncIterator[StreamEvent]:
+    """
+    Apply SEARCH/REPLACE blocks from a model stream to document as they
+    complete. Emits edit.delta for the model's prose, patch.applied /
+    patch.failed per block, then the patched document and a done event.
+
+    spans are the document offsets of the fragments the model was shown
+    when its context was sliced; they are kept in step with every edit.
+    """
+    spans = [list(span) for span in spans or []]
+    parser = PatchStreamParser()
+    applied = failed = 0
+
+    def handle(items: List[Union[str, PatchBlock]]) -> List[StreamEvent]:
+        nonlocal document, applied, failed
+        events: List[StreamEvent] = []
+        for item in items:
+            if isinstance(item, str):
+                events.append(("edit.delta", item))
+                continue
+            located = locate_block(document, item, spans)
+            index = applied + failed
+            if located is None:
+                failed += 1
+                events.append(("patch.failed", json.dumps({"index": index, "search": item.search[:200]})))
+            else:
+                start, end, replace, strategy = located
+                document = document[:start] + replace + document[end:]
+                _shift_spans(spans, start, end, len(replace) - (end - start))
+                applied += 1
+                events.append(("patch.applied", json.dumps({"index": index, "strategy": strategy})))
+        return events
+
+    async for event, data in source:
+        if event is not None:
+            yield event, data
+            continue
+        for parsed in handle(parser.feed(data)):
+            yield parsed
+    for parsed in handle(parser.finish()):
+        yield parsed
+
+    yield "document", document
+    yield "done", json.dumps({"applied": applied, "failed": failed})
+
+
+async def document_as_diff(source: AsyncIterator[StreamEvent], original: str) -> AsyncIterator[StreamEvent]:
+    """Replace the document event with a unified diff against original."""
+    async for event, data in source:
+        if event == "document":
+            yield "diff", unified_diff(original, data)
+        else:
+            yield event, data
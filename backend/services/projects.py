@@ -0,0 +1,97 @@
+import json
+import logging
+import uuid
+from typing import AsyncIterator, Optional
+from fastapi.concurrency import run_in_threadpool
+from backend.crud import crud_project
+from backend.db.session import get_db_with_retry
+from backend.services.html_store import get_html
+from backend.services.streaming import StreamEvent
+
+logger = logging.getLogger(__name__)
+
+
+class ProjectNotFound(Exception):
+    pass
+
+
+def _as_uuid(value):
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise ProjectNotFound("Invalid project or version id")
+
+
+def load_version(user_id, project_id, version_id=None) -> dict:
+    """
+    Load the HTML and prompt of a stored version (the project head when
+    version_id is None) in a short-lived session.
+    """
+    project_id, version_id = _as_uuid(project_id), _as_uuid(version_id)
+    with get_db_with_retry() as db:
+        project = crud_project.get_project(db, project_id, user_id)
+        if project is None:
+            raise ProjectNotFound("Project not found")
+        version = crud_project.get_version(db, project, version_id)
+        if version is None:
+            if version_id is not None:
+                raise ProjectNotFound("Version not found")
+            return {"version_id": None, "html": None, "prompt": None}
+        return {
+            "version_id": version.id,
+            "html": get_html(db, version.html_hash),
+            "prompt": version.prompt,
+        }
+
+
+def save_version(user_id, project_id, parent_version_id, html: str, prompt: str) -> dict:
+    project_id = _as_uuid(project_id)
+    with get_db_with_retry() as db:
+        project = None
+        if project_id is not None:
+            project = crud_project.get_project(db, project_id, user_id)
+        if project is None:
+            project = crud_project.create_project(db, user_id, prompt)
+        parent = crud_project.get_version(db, project, parent_version_id) if parent_version_id else None
+        version = crud_project.create_version(db, project, html, prompt, parent)
+        return {
+            "project_id": str(project.id),
+            "version_id": str(version.id),
+            "number": version.number,
+            "html_hash": version.html_hash,
+        }
+
+
+async def record_version(
+    source: AsyncIterator[StreamEvent],
+    user_id,
+    prompt: str,
+    project_id=None,
+    parent_version_id=None,
+) -> AsyncIterator[StreamEvent]:
+    """
+    Pass a generation stream through and, when it completes successfully,
+    store the resulting HTML as a new project version. A version event with
+    the new ids is sent just before done.
+    """
+    code = []
+    document: Optional[str] = None
+    async for event, data in source:
+        if event == "code.delta":
+            code.append(data)
+        elif event == "document":
+            document = data
+        elif event == "done":
+            result = json.loads(data)
+            html = document if document is not None else "".join(code).strip()
+            if html and (result.get("code_complete") or result.get("applied")):
+                try:
+                    saved = await run_in_threadpool(
+                        save_version, user_id, project_id, parent_version_id, html, prompt
+                    )
+                    yield "version", json.dumps(saved)
+                except Exception as e:
+                    logger.error(f"Failed to store project version: {str(e)}")
+        yield event, data
@@ -0,0 +1,335 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from backend.core import metrics
+from backend.core.config import settings
+from backend.services.streaming import StreamEvent
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS  # 16 bands of 4 rows: candidates from Jaccard ~0.5 upwards
+MERGE_EVERY = 2048  # inserts buffered before they are merged into the sorted band arrays
+MIN_TOKENS = 2
+SLOT_MASK = np.uint64(0xFFFFFFFF)
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Words that appear in nearly every prompt and say nothing about the site
+STOPWORDS = frozenset("""
+a an and are as at be by can create for from generate i in is it make me my need of on or our please should
+site that the this to web website page want we with would you your build design
+""".split())
+
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def tokens(prompt: str) -> Set[str]:
+    """Content words of a prompt, lower-cased, with a plural "s" stripped."""
+    words = set()
+    for word in _WORD.findall(prompt.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.add(word)
+    return words
+
+
+def signature(words: Set[str]) -> np.ndarray:
+    """MinHash signature: per permutation, the minimum multiply-shift hash over the words."""
+    x = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+    with np.errstate(over="ignore"):
+        hashed = (_A[:, None] * x[None, :] + _B[:, None]) >> np.uint64(32)
+    return hashed.astype(np.uint32).min(axis=1)
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """32-bit LSH key of every band of one signature (BANDS,) or many (n, BANDS)."""
+    rows = signatures.reshape(*signatures.shape[:-1], BANDS, ROWS).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        key = rows[..., 0]
+        for r in range(1, ROWS):
+            key = key * _MIX + rows[..., r]
+    return key >> np.uint64(32)
+
+
+def owner_key(owner: str) -> np.uint64:
+    """32-bit hash of an owner, mixed into its band keys so lookups only meet its own entries."""
+    return np.uint64(zlib.crc32(owner.encode("utf-8")))
+
+
+class PromptIndex:
+    """
+    Near-duplicate lookup of earlier prompts by MinHash/LSH.
+
+    Signatures live in a fixed (max_entries, NUM_PERM) array. Each band
+    has a sorted uint64 array of (band key << 32 | slot), searched with
+    searchsorted. New entries go to a small pending buffer that is scanned
+    linearly and merged into the sorted arrays every MERGE_EVERY inserts.
+    Band entries of evicted slots are not removed; candidates are always
+    re-scored against the slot's current signature, and the arrays are
+    rebuilt once a quarter of them are stale.
+
+    Entries belong to the user whose generation stored them and are only
+    matched for that user: band keys include a hash of the owner, and
+    candidates of any other owner are dropped before scoring.
+
+    Entries are evicted least recently used first and persisted to a
+    SQLite file so they survive restarts.
+    """
+
+    def __init__(self, path: Optional[str], max_entries: int):
+        self.max_entries = max_entries
+        self._sigs = np.zeros((max_entries, NUM_PERM), dtype=np.uint32)
+        self._slot_ids = np.full(max_entries, -1, dtype=np.int64)
+        self._owner_keys = np.zeros(max_entries, dtype=np.uint64)
+        self._last_used = np.full(max_entries, -np.inf)  # free slots are taken first
+        self._entries: Dict[int, Tuple[int, str, str, str]] = {}  # id -> (slot, prompt, html_hash, owner)
+        self._bands: List[np.ndarray] = [np.empty(0, dtype=np.uint64) for _ in range(BANDS)]
+        self._pending = np.empty((BANDS, MERGE_EVERY), dtype=np.uint64)
+        self._pending_count = 0
+        self._stale = 0
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(prompts)")]
+            if columns and "owner" not in columns:
+                # Entries from before per-user scoping cannot be attributed to anyone
+                logger.info("Dropping indexed prompts stored without an owner")
+                self._conn.execute("DROP TABLE prompts")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS prompts ("
+                "id INTEGER PRIMARY KEY, owner TEXT NOT NULL, prompt TEXT NOT NULL, html_hash TEXT NOT NULL, "
+                "signature BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.commit()
+            self._load()
+
+    def _load(self) -> None:
+        rows = self._conn.execute(
+            "SELECT id, prompt, html_hash, signature, last_used, owner FROM prompts ORDER BY last_used DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for slot, (entry_id, prompt, html_hash, sig, last_used, owner) in enumerate(rows):
+            self._sigs[slot] = np.frombuffer(sig, dtype=np.uint32)
+            self._slot_ids[slot] = entry_id
+            self._owner_keys[slot] = owner_key(owner)
+            self._last_used[slot] = last_used
+            self._entries[entry_id] = (slot, prompt, html_hash, owner)
+        self._rebuild()
+        self._conn.execute(
+            "DELETE FROM prompts WHERE id NOT IN (SELECT id FROM prompts ORDER BY last_used DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+        self._conn.commit()
+        logger.info(f"Loaded {len(rows)} prompts into the similarity index")
+
+    def bulk_load(self, entries: List[Tuple[int, str, str, np.ndarray, str]]) -> None:
+        """Fill an empty in-memory index from (id, prompt, html_hash, signature, owner) tuples."""
+        with self._lock:
+            for slot, (entry_id, prompt, html_hash, sig, owner) in enumerate(entries[:self.max_entries]):
+                self._sigs[slot] = sig
+                self._slot_ids[slot] = entry_id
+                self._owner_keys[slot] = owner_key(owner)
+                self._last_used[slot] = 0.0
+                self._entries[entry_id] = (slot, prompt, html_hash, owner)
+                self._next_id = max(self._next_id, entry_id + 1)
+            self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _rebuild(self) -> None:
+        slots = np.flatnonzero(self._slot_ids >= 0).astype(np.uint64)
+        keys = band_keys(self._sigs[slots.astype(np.int64)]) ^ self._owner_keys[slots.astype(np.int64), None]
+        for band in range(BANDS):
+            self._bands[band] = np.sort((keys[:, band] << np.uint64(32)) | slots)
+        self._pending_count = 0
+        self._stale = 0
+
+    def _merge(self) -> None:
+        for band in range(BANDS):
+            pending = np.sort(self._pending[band, :self._pending_count])
+            merged = self._bands[band]
+            self._bands[band] = np.insert(merged, np.searchsorted(merged, pending), pending)
+        self._pending_count = 0
+
+    def _candidates(self, keys: np.ndarray) -> np.ndarray:
+        found = []
+        for band in range(BANDS):
+            low = keys[band] << np.uint64(32)
+            entries = self._bands[band]
+            start = np.searchsorted(entries, low, side="left")
+            end = np.searchsorted(entries, low | SLOT_MASK, side="right")
+            found.append(entries[start:end] & SLOT_MASK)
+            pending = self._pending[band, :self._pending_count]
+            found.append(pending[(pending >> np.uint64(32)) == keys[band]] & SLOT_MASK)
+        slots = np.unique(np.concatenate(found)).astype(np.int64)
+        return slots[self._slot_ids[slots] >= 0]
+
+    def _best(self, sig: np.ndarray, owner: str) -> Optional[Tuple[int, float]]:
+        slots = self._candidates(band_keys(sig) ^ owner_key(owner))
+        slots = slots[[self._entries[int(self._slot_ids[slot])][3] == owner for slot in slots]]
+        if not len(slots):
+            return None
+        similarity = (self._sigs[slots] == sig).mean(axis=1)
+        best = int(np.argmax(similarity))
+        return int(slots[best]), float(similarity[best])
+
+    def _touch(self, slot: int) -> None:
+        now = time.time()
+        self._last_used[slot] = now
+        if self._conn is not None:
+            self._conn.execute("UPDATE prompts SET last_used = ? WHERE id = ?", (now, int(self._slot_ids[slot])))
+            self._conn.commit()
+
+    def lookup(self, prompt: str, threshold: float, owner) -> Optional[dict]:
+        """Owner's stored prompt most similar to prompt, if its estimated Jaccard similarity reaches threshold."""
+        owner = str(owner)
+        words = tokens(prompt)
+        if len(words) < MIN_TOKENS:
+            return None
+        sig = signature(words)
+        with self._lock:
+            best = self._best(sig, owner)
+            if best is None or best[1] < threshold:
+                metrics.inc("prompt_index.misses")
+                return None
+            slot, similarity = best
+            self._touch(slot)
+            _, matched, html_hash, _ = self._entries[int(self._slot_ids[slot])]
+        metrics.inc("prompt_index.hits")
+        return {"prompt": matched, "html_hash": html_hash, "similarity": round(similarity, 3)}
+
+    def add(self, prompt: str, html_hash: str, owner) -> None:
+        owner = str(owner)
+        words = tokens(prompt)
+        if len(words) < MIN_TOKENS:
+            return
+        sig = signature(words)
+        with self._lock:
+            best = self._best(sig, owner)
+            if best is not None and best[1] == 1.0:
+                # Same content words: keep one entry, pointing at the newest site
+                slot = best[0]
+                entry_id = int(self._slot_ids[slot])
+                self._entries[entry_id] = (slot, prompt, html_hash, owner)
+                self._last_used[slot] = time.time()
+                if self._conn is not None:
+                    self._conn.execute(
+                        "UPDATE prompts SET prompt = ?, html_hash = ?, last_used = ? WHERE id = ?",
+                        (prompt, html_hash, self._last_used[slot], entry_id),
+                    )
+                    self._conn.commit()
+                return
+
+            now = time.time()
+            if self._conn is not None:
+                cursor = self._conn.execute(
+                    "INSERT INTO prompts (owner, prompt, html_hash, signature, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (owner, prompt, html_hash, sig.tobytes(), now),
+                )
+                entry_id = cursor.lastrowid
+            else:
+                entry_id = self._next_id
+                self._next_id += 1
+
+            slot = int(np.argmin(self._last_used))
+            evicted = int(self._slot_ids[slot])
+            if evicted >= 0:
+                del self._entries[evicted]
+                self._stale += 1
+                metrics.inc("prompt_index.evictions")
+                if self._conn is not None:
+                    self._conn.execute("DELETE FROM prompts WHERE id = ?", (evicted,))
+            if self._conn is not None:
+                self._conn.commit()
+
+            self._sigs[slot] = sig
+            self._slot_ids[slot] = entry_id
+            self._owner_keys[slot] = owner_key(owner)
+            self._last_used[slot] = now
+            self._entries[entry_id] = (slot, prompt, html_hash, owner)
+            keys = band_keys(sig) ^ self._owner_keys[slot]
+            self._pending[:, self._pending_count] = (keys << np.uint64(32)) | np.uint64(slot)
+            self._pending_count += 1
+            if self._stale > self.max_entries // 4:
+                self._rebuild()
+            elif self._pending_count == MERGE_EVERY:
+                self._merge()
+
+
+_index: Optional[PromptIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> PromptIndex:
+    """The process-wide index, loaded from disk on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PromptIndex(settings.PROMPT_INDEX_PATH, settings.PROMPT_INDEX_MAX_ENTRIES)
+            metrics.register_gauge("prompt_index.entries", lambda: len(_index))
+        return _index
+
+
+def _load_match(prompt: str, threshold: float, owner) -> Optional[dict]:
+    from backend.db.session import get_db_with_retry
+    from backend.services.html_store import get_html
+
+    match = get_index().lookup(prompt, threshold, owner)
+    if match is None:
+        return None
+    try:
+        with get_db_with_retry() as db:
+            match["html"] = get_html(db, match["html_hash"])
+    except KeyError:
+        return None
+    return match
+
+
+async def find_similar(prompt: str, threshold: float, owner) -> Optional[dict]:
+    """A site owner generated earlier for a similar prompt: prompt, html_hash, html, similarity."""
+    return await run_in_threadpool(_load_match, prompt, threshold, owner)
+
+
+async def replay(match: dict) -> AsyncIterator[StreamEvent]:
+    """The stored site as the events of a completed generation."""
+    yield "code.delta", match["html"]
+    yield "done", json.dumps({"sections": ["code"], "code_complete": True, "reused": True})
+
+
+async def announce(source: AsyncIterator[StreamEvent], match: dict, mode: str) -> AsyncIterator[StreamEvent]:
+    """Prefix a stream with a "reuse" event saying it was seeded from an earlier generation."""
+    yield "reuse", json.dumps({"mode": mode, "similarity": match["similarity"]})
+    async for event in source:
+        yield event
+
+
+async def remember(source: AsyncIterator[StreamEvent], prompt: str, owner) -> AsyncIterator[StreamEvent]:
+    """Pass a generation through, indexing prompt for owner once its result is stored as a version."""
+    async for event, data in source:
+        if event == "version":
+            html_hash = json.loads(data).get("html_hash")
+            if html_hash:
+                try:
+                    await run_in_threadpool(get_index().add, prompt, html_hash, owner)
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"Prompt index insert failed: {str(e)}")
+        yield event, data
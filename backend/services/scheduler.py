@@ -0,0 +1,363 @@
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Dict, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from backend.core import metrics
+from backend.core.config import settings
+from backend.services.streaming import StreamEvent
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+PRIORITY_EDIT = 0
+PRIORITY_FULL = 1
+
+# A waiter row not refreshed for this long belongs to a dead worker
+WAITER_STALE_AFTER = 5.0
+
+
+class Rejected(Exception):
+    """Admission refused; the route answers 429 with Retry-After."""
+
+    def __init__(self, reason: str, retry_after: float, queue_position: Optional[int] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.queue_position = queue_position
+
+
+class SlotStore:
+    """
+    Leases, waiters and token buckets in a SQLite file shared by every
+    uvicorn worker on the host. Each decision runs in a BEGIN IMMEDIATE
+    transaction, so the workers see one consistent queue.
+    """
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "id TEXT PRIMARY KEY, user_id TEXT NOT NULL, priority INTEGER NOT NULL, "
+                "acquired_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS waiters ("
+                "id TEXT PRIMARY KEY, user_id TEXT NOT NULL, priority INTEGER NOT NULL, "
+                "enqueued_at REAL NOT NULL, seen_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (user_id TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn, time.time())
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def take_token(self, user_id: str, rate: float, burst: float) -> float:
+        """
+        Take one token from the user's bucket. Returns 0 on success, or the
+        seconds until a token is available.
+        """
+        def take(conn, now):
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE user_id = ?", (user_id,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate if rate > 0 else float(settings.SCHEDULER_MAX_WAIT)
+            conn.execute(
+                "INSERT INTO buckets (user_id, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (user_id, tokens - 1, now),
+            )
+            return 0.0
+        return self._transaction(take)
+
+    def refund_token(self, user_id: str, burst: float) -> None:
+        """Give back a token taken for a request that was then rejected."""
+        self._transaction(lambda conn, now: conn.execute(
+            "UPDATE buckets SET tokens = MIN(?, tokens + 1) WHERE user_id = ?", (burst, user_id)
+        ))
+
+    def enqueue(self, waiter_id: str, user_id: str, priority: int, max_queue: Optional[int]) -> Optional[int]:
+        """Add a waiter; returns the queue length if it is full instead."""
+        def enqueue(conn, now):
+            conn.execute("DELETE FROM waiters WHERE seen_at < ?", (now - WAITER_STALE_AFTER,))
+            if max_queue is not None:
+                waiting = conn.execute("SELECT COUNT(*) FROM waiters").fetchone()[0]
+                if waiting >= max_queue:
+                    return waiting
+            conn.execute(
+                "INSERT INTO waiters (id, user_id, priority, enqueued_at, seen_at) VALUES (?, ?, ?, ?, ?)",
+                (waiter_id, user_id, priority, now, now),
+            )
+            return None
+        return self._transaction(enqueue)
+
+    def try_admit(self, waiter_id: str, global_slots: int, user_slots: int, lease_ttl: float) -> Tuple[bool, int]:
+        """
+        Admit the waiter if it is the first in (priority, arrival) order
+        whose user is under its cap while global slots remain. Waiters of
+        users at their cap are skipped, so one user cannot block others.
+        Returns (admitted, position among the waiters ahead of it).
+        """
+        def admit(conn, now):
+            conn.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+            conn.execute("DELETE FROM waiters WHERE seen_at < ? AND id != ?", (now - WAITER_STALE_AFTER, waiter_id))
+            conn.execute("UPDATE waiters SET seen_at = ? WHERE id = ?", (now, waiter_id))
+            held: Dict[str, int] = dict(conn.execute("SELECT user_id, COUNT(*) FROM leases GROUP BY user_id").fetchall())
+            free = global_slots - sum(held.values())
+            position = 0
+            for wid, user_id, priority in conn.execute(
+                "SELECT id, user_id, priority FROM waiters ORDER BY priority, enqueued_at"
+            ).fetchall():
+                eligible = free > 0 and held.get(user_id, 0) < user_slots
+                if wid == waiter_id:
+                    if not eligible:
+                        return False, position
+                    conn.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+                    conn.execute(
+                        "INSERT INTO leases (id, user_id, priority, acquired_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                        (waiter_id, user_id, priority, now, now + lease_ttl),
+                    )
+                    return True, 0
+                position += 1
+                if eligible:
+                    free -= 1
+                    held[user_id] = held.get(user_id, 0) + 1
+            return False, position
+        return self._transaction(admit)
+
+    def leave(self, waiter_id: str) -> None:
+        self._transaction(lambda conn, now: conn.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,)))
+
+    def renew(self, lease_id: str, lease_ttl: float) -> None:
+        self._transaction(
+            lambda conn, now: conn.execute("UPDATE leases SET expires_at = ? WHERE id = ?", (now + lease_ttl, lease_id))
+        )
+
+    def release(self, lease_id: str) -> None:
+        self._transaction(lambda conn, now: conn.execute("DELETE FROM leases WHERE id = ?", (lease_id,)))
+
+    def counts(self) -> Tuple[int, int]:
+        with self._lock:
+            now = time.time()
+            active = self._conn.execute("SELECT COUNT(*) FROM leases WHERE expires_at >= ?", (now,)).fetchone()[0]
+            waiting = self._conn.execute("SELECT COUNT(*) FROM waiters").fetchone()[0]
+        return active, waiting
+
+
+class Lease:
+    """
+    A held generation slot; renewed in the background until released.
+    A lease handed to hold() is released if the held stream has not been
+    started within SCHEDULER_START_TIMEOUT, e.g. because the client went
+    away before the response began.
+    """
+
+    def __init__(self, scheduler: "Scheduler", lease_id: str, user_id: str):
+        self.scheduler = scheduler
+        self.id = lease_id
+        self.user_id = user_id
+        self.acquired_at = time.monotonic()
+        self._released = False
+        self._start_timer: Optional[asyncio.TimerHandle] = None
+        self._renewer = asyncio.ensure_future(self._renew())
+
+    async def _renew(self) -> None:
+        ttl = settings.SCHEDULER_LEASE_TTL
+        # Stop renewing after SCHEDULER_MAX_HOLD so a lease whose stream
+        # was never consumed (and so never released) still expires.
+        while time.monotonic() - self.acquired_at < settings.SCHEDULER_MAX_HOLD:
+            await asyncio.sleep(ttl / 3)
+            try:
+                await run_in_threadpool(self.scheduler.store.renew, self.id, ttl)
+            except sqlite3.Error as e:
+                logger.warning(f"Lease renewal failed: {str(e)}")
+
+    async def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._renewer.cancel()
+        if self._start_timer is not None:
+            self._start_timer.cancel()
+        held = time.monotonic() - self.acquired_at
+        self.scheduler.observe_hold(held)
+        await run_in_threadpool(self.scheduler.store.release, self.id)
+        self.scheduler.wake()
+
+    def _not_started(self) -> None:
+        metrics.inc("scheduler.unstarted_releases")
+        logger.info("Releasing a generation slot whose stream was never started")
+        asyncio.ensure_future(self.release())
+
+    def hold(self, source: AsyncIterator[StreamEvent]) -> AsyncIterator[StreamEvent]:
+        """Pass source through, releasing the slot when it ends or is closed."""
+        self._start_timer = asyncio.get_running_loop().call_later(settings.SCHEDULER_START_TIMEOUT, self._not_started)
+        return self._hold(source)
+
+    async def _hold(self, source: AsyncIterator[StreamEvent]) -> AsyncIterator[StreamEvent]:
+        self._start_timer.cancel()
+        try:
+            async for event in source:
+                yield event
+        finally:
+            if hasattr(source, "aclose"):
+                await source.aclose()
+            await self.release()
+
+
+class Scheduler:
+    """
+    Admission control in front of the generation services: a per-user
+    token bucket, per-user and global concurrency caps, and a shared
+    priority queue (edits ahead of full generations) for requests over the
+    caps. Requests that cannot be admitted within SCHEDULER_MAX_WAIT, or
+    that find the queue full, are rejected with a Retry-After estimate and
+    their queue position.
+    """
+
+    def __init__(self, store: SlotStore):
+        self.store = store
+        self._pulse = asyncio.Event()
+        self._hold_ewma = 30.0  # seconds a generation holds a slot, smoothed
+        metrics.register_gauge("scheduler.active", lambda: self.store.counts()[0])
+        metrics.register_gauge("scheduler.waiting", lambda: self.store.counts()[1])
+
+    def wake(self) -> None:
+        pulse, self._pulse = self._pulse, asyncio.Event()
+        pulse.set()
+
+    def observe_hold(self, seconds: float) -> None:
+        self._hold_ewma = 0.8 * self._hold_ewma + 0.2 * seconds
+
+    def _estimate_wait(self, position: int) -> float:
+        return self._hold_ewma * (position + 1) / max(1, settings.SCHEDULER_GLOBAL_SLOTS)
+
+    async def acquire(
+        self,
+        user_id: str,
+        priority: int = PRIORITY_FULL,
+        max_wait: Optional[float] = -1,
+        rate_limited: bool = True,
+    ) -> Lease:
+        """
+        Wait for a generation slot. max_wait=None waits indefinitely and
+        never rejects for a full queue (background jobs, already admitted
+        when they were submitted); the default uses SCHEDULER_MAX_WAIT.
+        """
+        if max_wait is not None and max_wait < 0:
+            max_wait = settings.SCHEDULER_MAX_WAIT
+        if rate_limited:
+            await self.check_rate(user_id)
+        try:
+            return await self._admit(user_id, priority, max_wait)
+        except Rejected:
+            if rate_limited:
+                # The request never ran; it should not count against the rate
+                await run_in_threadpool(self.store.refund_token, user_id, settings.SCHEDULER_BURST)
+            raise
+
+    async def _admit(self, user_id: str, priority: int, max_wait: Optional[float]) -> Lease:
+        waiter_id = str(uuid.uuid4())
+        started = time.monotonic()
+        max_queue = settings.SCHEDULER_MAX_QUEUE if max_wait is not None else None
+        queued = await run_in_threadpool(self.store.enqueue, waiter_id, user_id, priority, max_queue)
+        if queued is not None:
+            metrics.inc("scheduler.rejected.queue_full")
+            raise Rejected("Too many requests are queued", self._estimate_wait(queued), queued)
+
+        poll = settings.SCHEDULER_POLL_MS / 1000
+        try:
+            while True:
+                pulse = self._pulse
+                admitted, position = await run_in_threadpool(
+                    self.store.try_admit,
+                    waiter_id,
+                    settings.SCHEDULER_GLOBAL_SLOTS,
+                    settings.SCHEDULER_USER_SLOTS,
+                    settings.SCHEDULER_LEASE_TTL,
+                )
+                if admitted:
+                    waited = time.monotonic() - started
+                    metrics.inc("scheduler.admitted")
+                    metrics.inc("scheduler.wait_seconds", waited)
+                    if waited > poll:
+                        metrics.inc("scheduler.queued")
+                    return Lease(self, waiter_id, user_id)
+                if max_wait is not None and time.monotonic() - started >= max_wait:
+                    metrics.inc("scheduler.rejected.timeout")
+                    raise Rejected("No generation slot became free in time", self._estimate_wait(position), position)
+                try:
+                    await asyncio.wait_for(pulse.wait(), timeout=poll)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            await run_in_threadpool(self.store.leave, waiter_id)
+            raise
+
+    async def check_rate(self, user_id: str) -> None:
+        retry_after = await run_in_threadpool(
+            self.store.take_token, user_id, settings.SCHEDULER_RATE_PER_MINUTE / 60, settings.SCHEDULER_BURST
+        )
+        if retry_after > 0:
+            metrics.inc("scheduler.rejected.rate")
+            raise Rejected("Rate limit exceeded", retry_after)
+
+
+class _Unlimited:
+    """Stand-in lease when the scheduler is disabled."""
+
+    async def release(self) -> None:
+        pass
+
+    def hold(self, source: AsyncIterator[StreamEvent]) -> AsyncIterator[StreamEvent]:
+        return source
+
+
+_scheduler: Optional[Scheduler] = None
+
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler(SlotStore(settings.SCHEDULER_DB_PATH))
+    return _scheduler
+
+
+async def acquire(user_id, priority: int = PRIORITY_FULL, **kwargs):
+    """Acquire a generation slot for user_id, or a no-op lease when scheduling is disabled."""
+    if not settings.SCHEDULER_ENABLED:
+        return _Unlimited()
+    return await get_scheduler().acquire(str(user_id), priority, **kwargs)
+
+
+async def check_rate(user_id) -> None:
+    if settings.SCHEDULER_ENABLED:
+        await get_scheduler().check_rate(str(user_id))
+
+
+def rejection_response(e: Rejected) -> JSONResponse:
+    content = {"error": str(e), "retry_after": e.retry_after}
+    if e.queue_position is not None:
+        content["queue_position"] = e.queue_position
+    return JSONResponse(status_code=429, content=content, headers={"Retry-After": str(e.retry_after)})
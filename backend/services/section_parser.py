@@ -0,0 +1,95 @@
+import json
+from typing import AsyncIterator, List, Optional
+from backend.services.streaming import StreamEvent
+
+# The three-part response format requested by the unified system prompt.
+SECTIONS = ("analysis", "code", "summary")
+_MARKERS = {}
+for _section in SECTIONS:
+    _MARKERS[f"==={_section.upper()}_START==="] = (_section, True)
+    _MARKERS[f"==={_section.upper()}_END==="] = (_section, False)
+_MARKER_PREFIX = "==="
+
+
+class SectionParser:
+    """
+    Incremental parser for the ===X_START=== / ===X_END=== response format.
+
+    Each call to feed() only scans the new text (plus at most one marker's
+    worth of held-back tail), so the cost over a whole response is linear.
+    A marker split across chunks is held back until it can be decided.
+    """
+
+    def __init__(self):
+        self.section: Optional[str] = None
+        self.completed: List[str] = []
+        self._pending = ""
+        self._section_start = False
+
+    def _text(self, events: List[StreamEvent], text: str) -> None:
+        if self.section is None or not text:
+            return
+        if self._section_start:
+            text = text.lstrip()
+            if not text:
+                return
+            self._section_start = False
+        events.append((f"{self.section}.delta", text))
+
+    def feed(self, text: str) -> List[StreamEvent]:
+        buffer = self._pending + text
+        self._pending = ""
+        events: List[StreamEvent] = []
+        pos = 0
+        search = 0
+        while True:
+            idx = buffer.find(_MARKER_PREFIX, search)
+            if idx == -1:
+                # Keep a trailing "=" or "==" back: it may start a marker.
+                keep = len(buffer) - len(buffer.rstrip("="))
+                keep = min(keep, len(_MARKER_PREFIX) - 1)
+                end = max(pos, len(buffer) - keep)
+                self._text(events, buffer[pos:end])
+                self._pending = buffer[end:]
+                return events
+
+            tail = buffer[idx:]
+            marker = next((m for m in _MARKERS if tail.startswith(m)), None)
+            if marker is not None:
+                self._text(events, buffer[pos:idx])
+                section, is_start = _MARKERS[marker]
+                if is_start:
+                    self.section = section
+                    self._section_start = True
+                else:
+                    if self.section == section:
+                        self.completed.append(section)
+                    self.section = None
+                pos = search = idx + len(marker)
+            elif any(m.startswith(tail) for m in _MARKERS):
+                # Possibly a marker cut off by the chunk boundary.
+                self._text(events, buffer[pos:idx])
+                self._pending = tail
+                return events
+            else:
+                search = idx + 1
+
+    def finish(self) -> List[StreamEvent]:
+        events: List[StreamEvent] = []
+        self._text(events, self._pending)
+        self._pending = ""
+        events.append(("done", json.dumps({"sections": self.completed, "code_complete": "code" in self.completed})))
+        return events
+
+
+async def parse_sections(source: AsyncIterator[StreamEvent]) -> AsyncIterator[StreamEvent]:
+    """Turn a stream of raw model text into typed analysis/code/summary events."""
+    parser = SectionParser()
+    async for event, data in source:
+        if event is not None:
+            yield event, data
+            continue
+        for parsed in parser.feed(data):
+            yield parsed
+    for parsed in parser.finish():
+        yield parsed
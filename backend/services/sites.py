@@ -0,0 +1,269 @@
+import gzip
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.http_cache import accepts_encoding, etag_matches
+from backend.crud import crud_project
+from backend.db.models import PublishedSite
+from backend.db.session import get_async_db_with_retry, get_db_with_retry
+from backend.services.html_store import get_html
+from backend.services.projects import ProjectNotFound, _as_uuid
+
+try:
+    import brotli
+except ImportError:  # optional: sites are then served as gzip or identity
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPE = "text/html; charset=utf-8"
+# Generated pages run in an opaque origin, away from the API's own origin
+SANDBOX = "sandbox allow-scripts allow-forms allow-popups allow-modals"
+# Most preferred first; identity is always stored
+ENCODINGS = ("br", "gzip")
+
+
+def _compress(encoding: str, body: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=11, mode=brotli.MODE_TEXT)
+    return gzip.compress(body, 9, mtime=0)
+
+
+class SiteStore:
+    """
+    Published site files on disk, one directory per HTML hash holding the
+    identity bytes and every smaller precompressed variant. Files are
+    content addressed and never change once written, so their stat results
+    are cached; only the slug -> hash mapping is looked up in the database,
+    cached for SITES_LOOKUP_TTL seconds.
+    """
+
+    def __init__(self, directory: str, lookup_ttl: float, max_entries: int = 4096):
+        self.directory = directory
+        self.lookup_ttl = lookup_ttl
+        self.max_entries = max_entries
+        self._slugs: Dict[str, Tuple[float, Optional[str]]] = {}  # slug -> (expires, html_hash)
+        self._files: "OrderedDict[str, Dict[str, Tuple[str, os.stat_result]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, digest: str, encoding: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest, encoding)
+
+    def write(self, digest: str, html: str) -> None:
+        """Store the identity file and its compressed variants, once per digest."""
+        if os.path.exists(self._path(digest, "identity")):
+            return
+        os.makedirs(os.path.dirname(self._path(digest, "identity")), exist_ok=True)
+        body = html.encode("utf-8")
+        variants = {"identity": body}
+        for encoding in ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            compressed = _compress(encoding, body)
+            if len(compressed) < len(body):
+                variants[encoding] = compressed
+        # identity last: its presence marks the directory complete
+        for encoding in [*ENCODINGS, "identity"]:
+            if encoding not in variants:
+                continue
+            path = self._path(digest, encoding)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(variants[encoding])
+            os.replace(tmp, path)
+        metrics.inc("sites.files_written", len(variants))
+
+    def cached_files(self, digest: str) -> Optional[Dict[str, Tuple[str, os.stat_result]]]:
+        """The stored variants of digest from the stat cache, without touching the disk."""
+        with self._lock:
+            found = self._files.get(digest)
+            if found is not None:
+                self._files.move_to_end(digest)
+            return found
+
+    def files(self, digest: str) -> Dict[str, Tuple[str, os.stat_result]]:
+        """The stored variants of digest: encoding -> (path, stat). Blocking on a cache miss."""
+        found = self.cached_files(digest)
+        if found is not None:
+            return found
+        found = {}
+        for encoding in ("identity", *ENCODINGS):
+            path = self._path(digest, encoding)
+            try:
+                found[encoding] = (path, os.stat(path))
+            except FileNotFoundError:
+                pass
+        if "identity" in found:
+            with self._lock:
+                self._files[digest] = found
+                while len(self._files) > self.max_entries:
+                    self._files.popitem(last=False)
+        return found
+
+    def cached(self, slug: str) -> Tuple[bool, Optional[str]]:
+        """(found, html hash) of slug from the lookup cache, without touching the database."""
+        cached = self._slugs.get(slug)
+        if cached is not None and cached[0] > time.monotonic():
+            return True, cached[1]
+        return False, None
+
+    async def resolve(self, slug: str) -> Optional[str]:
+        """HTML hash currently published under slug, if any."""
+        found, digest = self.cached(slug)
+        if found:
+            return digest
+        now = time.monotonic()
+        async with get_async_db_with_retry() as db:
+            site = await db.get(PublishedSite, slug)
+            digest = site.html_hash if site is not None else None
+        with self._lock:
+            if len(self._slugs) >= self.max_entries:
+                self._slugs.clear()
+            self._slugs[slug] = (now + self.lookup_ttl, digest)
+        return digest
+
+    def forget(self, slug: str) -> None:
+        """
+        Drop slug from this process's lookup cache. Other workers keep
+        their cached mapping until it expires, so they may serve the
+        previous version for up to SITES_LOOKUP_TTL seconds.
+        """
+        self._slugs.pop(slug, None)
+
+
+_store: Optional[SiteStore] = None
+
+
+def get_store() -> SiteStore:
+    global _store
+    if _store is None:
+        _store = SiteStore(settings.SITES_DIR, settings.SITES_LOOKUP_TTL)
+    return _store
+
+
+def variant_etag(digest: str, encoding: str) -> str:
+    """Strong ETag of one stored representation; each content coding gets its own."""
+    return f'"{digest[:32]}"' if encoding == "identity" else f'"{digest[:32]}-{encoding}"'
+
+
+def _site_dict(site: PublishedSite) -> dict:
+    return {
+        "slug": site.slug,
+        "url": f"/sites/{site.slug}",
+        "project_id": site.project_id,
+        "version_id": site.version_id,
+        "etag": variant_etag(site.html_hash, "identity"),
+        "published_at": site.published_at,
+    }
+
+
+def publish(user_id, project_id, version_id=None) -> dict:
+    """
+    Publish a version (the project head when version_id is None) of one
+    of the user's projects. A project keeps its slug across republishes.
+
+    Runs in the threadpool on the sync session: it goes through the sync
+    crud_project helpers and writes the site files to disk anyway. Only
+    the per-request slug lookup in site_response uses the async session.
+    """
+    project_id, version_id = _as_uuid(project_id), _as_uuid(version_id)
+    store = get_store()
+    with get_db_with_retry() as db:
+        project = crud_project.get_project(db, project_id, user_id)
+        if project is None:
+            raise ProjectNotFound("Project not found")
+        version = crud_project.get_version(db, project, version_id)
+        if version is None:
+            raise ProjectNotFound("Version not found")
+        store.write(version.html_hash, get_html(db, version.html_hash))
+
+        site = db.execute(select(PublishedSite).where(PublishedSite.project_id == project.id)).scalar_one_or_none()
+        if site is None:
+            site = PublishedSite(slug=secrets.token_urlsafe(12), project_id=project.id)
+            db.add(site)
+        site.version_id = version.id
+        site.html_hash = version.html_hash
+        site.published_at = datetime.utcnow()
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent publish of the same project created its row first
+            db.rollback()
+            site = db.execute(select(PublishedSite).where(PublishedSite.project_id == project.id)).scalar_one()
+            site.version_id = version.id
+            site.html_hash = version.html_hash
+            site.published_at = datetime.utcnow()
+            db.commit()
+        store.forget(site.slug)
+        metrics.inc("sites.published")
+        return _site_dict(site)
+
+
+def get_published(user_id, project_id) -> Optional[dict]:
+    project_id = _as_uuid(project_id)
+    with get_db_with_retry() as db:
+        if crud_project.get_project(db, project_id, user_id) is None:
+            raise ProjectNotFound("Project not found")
+        site = db.execute(select(PublishedSite).where(PublishedSite.project_id == project_id)).scalar_one_or_none()
+        return _site_dict(site) if site is not None else None
+
+
+def unpublish(user_id, project_id) -> bool:
+    project_id = _as_uuid(project_id)
+    with get_db_with_retry() as db:
+        if crud_project.get_project(db, project_id, user_id) is None:
+            raise ProjectNotFound("Project not found")
+        site = db.execute(select(PublishedSite).where(PublishedSite.project_id == project_id)).scalar_one_or_none()
+        if site is None:
+            return False
+        slug = site.slug
+        db.delete(site)
+        db.commit()
+    get_store().forget(slug)
+    return True
+
+
+async def site_response(request: Request, slug: str) -> Optional[Response]:
+    """
+    The published site as the best stored variant the client accepts: a
+    304 on a matching If-None-Match, otherwise the file itself, sent by
+    FileResponse (which also answers Range and If-Range requests).
+    """
+    store = get_store()
+    digest = await store.resolve(slug)
+    if digest is None:
+        return None
+    files = store.cached_files(digest)
+    if files is None:
+        files = await run_in_threadpool(store.files, digest)
+    if "identity" not in files:
+        logger.error(f"Files of published site {slug} are missing")
+        return None
+    encoding = next((e for e in ENCODINGS if e in files and accepts_encoding(request, e)), "identity")
+    etag = variant_etag(digest, encoding)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": settings.SITES_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+        "Content-Security-Policy": SANDBOX,
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        metrics.inc("sites.not_modified")
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    path, stat_result = files[encoding]
+    metrics.inc("sites.served")
+    return FileResponse(path, headers=headers, media_type=MEDIA_TYPE, stat_result=stat_result)
@@ -0,0 +1,154 @@
+import asyncio
+from typing import AsyncIterator, List, Optional, Tuple
+from backend.core import metrics
+from backend.core.config import settings
+
+# (event name, data). A None event name is the default SSE "message" event.
+StreamEvent = Tuple[Optional[str], str]
+
+
+def is_delta(event: Optional[str]) -> bool:
+    """Only text deltas are merged; control events are sent as-is."""
+    return event is None or event.endswith(".delta")
+
+
+def format_sse(data: str, event: Optional[str] = None, event_id: Optional[str] = None) -> bytes:
+    """
+    Encode one text/event-stream frame. Multi-line data is split over
+    several data: lines, which the client joins back with newlines.
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    data = data.replace("\r\n", "\n").replace("\r", "\n")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+async def coalesce(
+    source: AsyncIterator[StreamEvent],
+    max_bytes: Optional[int] = None,
+    max_latency: Optional[float] = None,
+) -> AsyncIterator[StreamEvent]:
+    """
+    Merge consecutive deltas of the same event into larger frames.
+
+    A frame is flushed once it holds max_bytes, once its first delta is
+    max_latency seconds old, when the event type changes, or when a control
+    event arrives. The upstream read is kept pending across a timed-out
+    flush, so slow upstreams still see their text delivered on time.
+    """
+    max_bytes = max_bytes or settings.STREAM_FLUSH_BYTES
+    if max_latency is None:
+        max_latency = settings.STREAM_FLUSH_INTERVAL_MS / 1000
+    loop = asyncio.get_running_loop()
+    iterator = source.__aiter__()
+    buffer: List[str] = []
+    buffered_event: Optional[str] = None
+    size = 0
+    deadline = 0.0
+    pending = None
+
+    def flush() -> StreamEvent:
+        nonlocal buffer, size
+        frame = (buffered_event, "".join(buffer))
+        buffer, size = [], 0
+        return frame
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(0.0, deadline - loop.time()) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield flush()
+                continue
+
+            task, pending = pending, None
+            try:
+                event, data = task.result()
+            except StopAsyncIteration:
+                break
+
+            if buffer and (event != buffered_event or not is_delta(event)):
+                yield flush()
+            if not is_delta(event):
+                yield event, data
+                continue
+            if not buffer:
+                buffered_event = event
+                deadline = loop.time() + max_latency
+            buffer.append(data)
+            size += len(data.encode("utf-8"))
+            if size >= max_bytes:
+                yield flush()
+
+        if buffer:
+            yield flush()
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.wait({pending})
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+
+# Strong references to detached cleanup tasks until they finish.
+_cleanup_tasks = set()
+
+
+async def _wait_for_disconnect(request, interval: float) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+
+
+async def _close_frames(frames, step) -> None:
+    if step is not None and not step.done():
+        step.cancel()
+        await asyncio.wait({step})
+    await frames.aclose()
+
+
+async def sse_stream(source: AsyncIterator[StreamEvent], request=None, **kwargs) -> AsyncIterator[bytes]:
+    """
+    Coalesce a stream of events and encode it as text/event-stream.
+
+    When the client request is given, its connection is polled while frames
+    are produced; on disconnect the pending read is cancelled and the source
+    chain is closed, which closes the upstream completion.
+    """
+    frames = coalesce(source, **kwargs)
+    step = None
+    watcher = None
+    if request is not None:
+        watcher = asyncio.ensure_future(
+            _wait_for_disconnect(request, settings.STREAM_DISCONNECT_POLL_MS / 1000)
+        )
+    try:
+        while True:
+            step = asyncio.ensure_future(frames.__anext__())
+            waiting = {step} if watcher is None else {step, watcher}
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if step not in done:
+                metrics.inc("stream.client_disconnects")
+                break
+            try:
+                event, data = step.result()
+            except StopAsyncIteration:
+                break
+            frame = format_sse(data, event)
+            metrics.inc("stream.frames")
+            metrics.inc("stream.bytes", len(frame))
+            yield frame
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        # The server may be cancelling this task (client gone), in which case
+        # awaiting here would be interrupted; close the chain from a detached
+        # task so the upstream stream is always released.
+        cleanup = asyncio.ensure_future(_close_frames(frames, step))
+        _cleanup_tasks.add(cleanup)
+        cleanup.add_done_callback(_cleanup_tasks.discard)
@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+from typing import Dict, Optional
+from backend.core import metrics
+from backend.core.http_cache import Bundle
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+CACHE_CONTROL = "public, max-age=300"
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class TemplateLibrary:
+    """
+    The page templates and components shipped in backend/templates, loaded
+    once. Every response (the listing, each template) is prebuilt as a
+    Bundle, so requests never touch the disk or re-serialize anything.
+    """
+
+    def __init__(self, directory: str = TEMPLATES_DIR):
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        self.templates: Dict[str, dict] = {}
+        self.components: Dict[str, dict] = {}
+        for key, target in (("templates", self.templates), ("components", self.components)):
+            for entry in manifest.get(key, []):
+                with open(os.path.join(directory, entry["file"]), encoding="utf-8") as f:
+                    html = f.read()
+                item = {k: v for k, v in entry.items() if k != "file"}
+                item["html"] = html
+                target[item["id"]] = item
+
+        self._bundles: Dict[str, Bundle] = {}
+        for template_id, item in self.templates.items():
+            self._bundles[template_id] = Bundle(_dumps(item), cache_control=CACHE_CONTROL)
+        listing = [
+            {**{k: v for k, v in item.items() if k != "html"}, "size": len(item["html"]), "etag": self._bundles[template_id].etag}
+            for template_id, item in self.templates.items()
+        ]
+        components = [{k: v for k, v in item.items() if k != "html"} for item in self.components.values()]
+        self.listing = Bundle(_dumps({"templates": listing, "components": components}), cache_control=CACHE_CONTROL)
+        metrics.inc("templates.loaded", len(self.templates) + len(self.components))
+
+    def template(self, template_id: str) -> Optional[Bundle]:
+        return self._bundles.get(template_id)
+
+    def component(self, component_type: str) -> Optional[str]:
+        item = self.components.get(component_type)
+        return item["html"] if item else None
+
+
+_library: Optional[TemplateLibrary] = None
+
+
+def get_library() -> TemplateLibrary:
+    global _library
+    if _library is None:
+        _library = TemplateLibrary()
+    return _library
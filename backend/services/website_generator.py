@@ -1,17 +1,29 @@
 import os
-import asyncio
 import logging
 from dotenv import load_dotenv
-from openai import OpenAI
-from backend.db.models import User
-from sqlalchemy.orm import Session
-from fastapi import Depends
-from backend.core.security import get_current_user
+from backend.core.config import settings
+from backend.schemas.user import CurrentUser
+from typing import AsyncIterator
+from backend.services.streaming import StreamEvent, sse_stream
+from backend.services.section_parser import parse_sections
+from fastapi.concurrency import run_in_threadpool
+from backend.services.patch_engine import apply_patch_stream, document_as_diff
+from backend.services.projects import load_version, record_version
+from backend.services.context_slicer import slice_context
+from backend.services import generation_cache
+from backend.services import llm_router
+from backend.services import prompt_index
+from backend.services.continuation import complete_document
+from backend.services.parallel_generator import generate_parallel, get_section_system_prompt
 
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+TEMPERATURE = 0.2
+MAX_TOKENS = 85000
+EDIT_MAX_TOKENS = 16000
+
 
 def get_unified_system_prompt():
     return """
@@ -51,40 +63,168 @@ Remember to follow the three-part response format with proper markers for analys
 """
 
 
-async def generate_html_stream(prompt: str, db: Session, current_user: User, previous_html: str = None, previous_prompt: str = None):
-    
-    if not current_user or not current_user.api_key:
-        raise Exception("API key not found for user.")
+def get_modification_system_prompt():
+    return """
+You are an expert web developer modifying an existing HTML file.
+The user wants to apply changes based on their request.
+You MUST output ONLY the changes required using the following SEARCH/REPLACE block format. Do NOT output the entire file.
+Explain the changes briefly *before* the blocks if necessary, but the code changes THEMSELVES MUST be within the blocks.
+Format Rules:
+1. Start with <<<<<<< SEARCH
+2. Provide the exact lines from the current code that need to be replaced.
+3. Use ======= to separate the search block from the replacement.
+4. Provide the new lines that should replace the original lines.
+5. End with >>>>>>> REPLACE
+6. You can use multiple SEARCH/REPLACE blocks if changes are needed in different parts of the file.
+7. To insert code, use an empty SEARCH block (only <<<<<<< SEARCH and ======= on their lines) if inserting at the very beginning, otherwise provide the line *before* the insertion point in the SEARCH block and include that line plus the new lines in the REPLACE block.
+8. To delete code, provide the lines to delete in the SEARCH block and leave the REPLACE block empty (only ======= and >>>>>>> REPLACE on their lines).
+9. IMPORTANT: The SEARCH block must *exactly* match the current code, including indentation and whitespace.
+"""
 
-    nvidia_client = OpenAI(
-        base_url="https://integrate.api.nvidia.com/v1",
-        api_key=current_user.api_key
-    )
 
-    
-    system_prompt = get_unified_system_prompt()
-    enhanced_prompt = get_enhanced_user_prompt(prompt)
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": enhanced_prompt}
+def get_modification_messages(prompt, previous_html, previous_prompt=None, context=None):
+    """
+    Messages for an edit. With a sliced context only the outline and the
+    relevant fragments are sent instead of the whole document.
+    """
+    if context is not None:
+        current_code = f"The current code is too large to show in full.\n{context}"
+    else:
+        current_code = f"The current code is: \n```html\n{previous_html}\n```"
+    return [
+        {"role": "system", "content": get_modification_system_prompt()},
+        {"role": "user", "content": previous_prompt or "You are modifying the HTML file based on the user's request."},
+        {"role": "assistant", "content": current_code},
+        {"role": "user", "content": prompt}
     ]
 
-    completion = nvidia_client.chat.completions.create(
-        model="moonshotai/kimi-k2-instruct",
-        messages=messages,
-        temperature=0.2,
-        max_tokens=85000,
-        stream=True
-    )
 
-    async def stream_generator():
-        try:
-            for chunk in completion:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content.encode("utf-8")
-                    await asyncio.sleep(0.01)
-        except Exception as e:
-            logger.error(f"Stream error: {str(e)}")
-            yield f"\n[ERROR]: Stream interrupted - {str(e)}".encode("utf-8")
-
-    return stream_generator()
\ No newline at end of file
+async def generation_events(
+    prompt: str,
+    current_user: CurrentUser,
+    previous_html: str = None,
+    previous_prompt: str = None,
+    edit_output: str = "document",
+    project_id=None,
+    version_id=None,
+    mode: str = "single",
+    reuse: str = None,
+) -> AsyncIterator[StreamEvent]:
+    """
+    Start a generation (or an edit of previous_html / a stored version) and
+    return its event stream, before SSE encoding. Used directly by the
+    background job runner. A full generation in mode "parallel" is planned
+    and then generated section by section (see services.parallel_generator).
+
+    A full generation may reuse the site of a near-duplicate earlier prompt
+    (see services.prompt_index): reuse "return" serves it as is, "edit"
+    adapts it to the new prompt with an edit instead of generating anew.
+    """
+    if not current_user or not current_user.api_key:
+        raise Exception("API key not found for user.")
+
+    # Edits of a stored project load the base version server-side instead of
+    # receiving the whole HTML in the request body.
+    parent_version_id = None
+    if project_id is not None:
+        base = await run_in_threadpool(load_version, current_user.id, project_id, version_id)
+        parent_version_id = base["version_id"]
+        previous_html = base["html"] or previous_html
+        previous_prompt = previous_prompt or base["prompt"]
+
+    fresh = not previous_html and project_id is None
+    reuse = reuse or settings.PROMPT_INDEX_REUSE
+    match = None
+    if fresh and settings.PROMPT_INDEX_ENABLED and reuse in ("return", "edit"):
+        threshold = settings.PROMPT_INDEX_RETURN_THRESHOLD if reuse == "return" else settings.PROMPT_INDEX_EDIT_THRESHOLD
+        match = await prompt_index.find_similar(prompt, threshold, current_user.id)
+    model_prompt = prompt
+    if match is not None and reuse == "edit":
+        previous_html, previous_prompt = match["html"], match["prompt"]
+        model_prompt = f"Rework this website so that it fits this request instead: {prompt}"
+        edit_output = "document"
+
+    async def open_completion(messages, max_tokens, outcome=None):
+        # Routed over the configured providers, hedged on time-to-first-token
+        return await llm_router.open_stream(
+            settings.LLM_ROUTES, current_user.api_key, messages, TEMPERATURE, max_tokens, outcome
+        )
+
+    if match is not None and reuse == "return":
+        events = prompt_index.replay(match)
+    elif previous_html:
+        # Edit mode: the model only emits SEARCH/REPLACE blocks, which are
+        # applied to previous_html on the server as they arrive.
+        sliced = None
+        if len(previous_html) > settings.CONTEXT_SLICE_MIN_CHARS:
+            sliced = await run_in_threadpool(slice_context, previous_html, model_prompt)
+        if sliced is not None:
+            context, spans = sliced
+        else:
+            context, spans = None, None
+        messages = get_modification_messages(model_prompt, previous_html, previous_prompt, context)
+        deltas = await open_completion(messages, EDIT_MAX_TOKENS)
+        events = apply_patch_stream(deltas, previous_html, spans)
+    elif mode == "parallel":
+        async def open_stream():
+            return parse_sections(await generate_parallel(prompt, current_user.api_key, current_user.id))
+
+        key = generation_cache.cache_key(prompt, f"{settings.LLM_ROUTES}|parallel", TEMPERATURE, get_section_system_prompt())
+        events = generation_cache.cached_stream(key, open_stream)
+    else:
+        system_prompt = get_unified_system_prompt()
+        enhanced_prompt = get_enhanced_user_prompt(prompt)
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": enhanced_prompt}
+        ]
+
+        async def open_stream():
+            return parse_sections(await complete_document(open_completion, messages, MAX_TOKENS))
+
+        # Identical full generations are served from the cache or share one
+        # in-flight upstream stream.
+        key = generation_cache.cache_key(prompt, settings.LLM_ROUTES, TEMPERATURE, system_prompt)
+        events = generation_cache.cached_stream(key, open_stream)
+
+    events = record_version(events, current_user.id, prompt, project_id, parent_version_id)
+    if fresh and settings.PROMPT_INDEX_ENABLED and not (match is not None and reuse == "return"):
+        events = prompt_index.remember(events, prompt, current_user.id)
+    if match is not None:
+        events = prompt_index.announce(events, match, reuse)
+    if previous_html and edit_output == "diff":
+        events = document_as_diff(events, previous_html)
+    return events
+
+
+async def generate_html_stream(
+    prompt: str,
+    current_user: CurrentUser,
+    previous_html: str = None,
+    previous_prompt: str = None,
+    request=None,
+    edit_output: str = "document",
+    project_id=None,
+    version_id=None,
+    lease=None,
+    mode: str = "single",
+    reuse: str = None,
+):
+    """
+    SSE stream of a generation. A scheduler lease, when given, is held
+    until the stream ends or the client goes away.
+    """
+    events = await generation_events(
+        prompt,
+        current_user,
+        previous_html,
+        previous_prompt,
+        edit_output=edit_output,
+        project_id=project_id,
+        version_id=version_id,
+        mode=mode,
+        reuse=reuse,
+    )
+    if lease is not None:
+        events = lease.hold(events)
+    return sse_stream(events, request=request)
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+Benchmark: edit context slicing over a corpus of generated-looking pages.
+
+For pages of increasing size (nav, hero, repeated content sections with
+their own styles and scripts, footer), slices the context for a few
+typical edit requests and reports the time taken, the share of the
+document sent to the model, and whether the fragment the edit targets
+was included.
+
+    python -m benchmarks.context_slicer --sizes 20 50 100 200
+"""
+import argparse
+import statistics
+import time
+from tests.env import isolate
+
+isolate()
+
+from backend.services.context_slicer import slice_context  # noqa: E402
+
+TOPICS = ["pricing", "testimonials", "gallery", "team", "faq", "features", "contact", "blog", "careers", "partners"]
+
+EDITS = [
+    ("make the navbar background dark blue", "<nav"),
+    ("change the hero heading to Welcome home", 'id="hero"'),
+    ("add a fourth plan to the pricing table", 'class="pricing"'),
+    ("update the copyright year in the footer", "<footer"),
+]
+
+
+def build_page(size_kb: int) -> str:
+    head = (
+        "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n<title>Studio</title>\n"
+        "<style>\nbody { font-family: sans-serif; margin: 0; }\n.btn { padding: 8px 16px; }\n</style>\n</head>\n<body>\n"
+        "<nav class=\"navbar\">\n  <a href=\"#\">Home</a>\n  <a href=\"#pricing-0\">Pricing</a>\n</nav>\n"
+        "<header id=\"hero\">\n  <h1>Studio</h1>\n  <p>We build things.</p>\n  <a class=\"btn\">Start</a>\n</header>\n<main>\n"
+    )
+    tail = "</main>\n<footer>\n  <p>&copy; 2024 Studio</p>\n</footer>\n</body>\n</html>\n"
+    sections = []
+    i = 0
+    while len(head) + len(tail) + sum(map(len, sections)) < size_kb * 1024:
+        topic = TOPICS[i % len(TOPICS)]
+        items = "".join(
+            f"    <li class=\"card\"><h3>{topic.title()} item {j}</h3><p>Details of {topic} item {j} in section {i}.</p></li>\n"
+            for j in range(12)
+        )
+        sections.append(
+            f"<section id=\"{topic}-{i // len(TOPICS)}\" class=\"{topic}\">\n  <h2>{topic.title()}</h2>\n"
+            f"  <ul>\n{items}  </ul>\n"
+            f"  <script>\n  document.querySelectorAll('.{topic} .card').forEach(c => c.dataset.n = {i});\n  </script>\n"
+            "</section>\n"
+        )
+        i += 1
+    return head + "".join(sections) + tail
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 50, 100, 200], help="page sizes in KB")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':>7} {'edit':<42} {'ms':>7} {'sent':>6} {'target':>7}")
+    for size in args.sizes:
+        html = build_page(size)
+        for query, target in EDITS:
+            times = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                sliced = slice_context(html, query)
+                times.append(time.perf_counter() - started)
+            if sliced is None:
+                sent, found = 1.0, True
+            else:
+                context, spans = sliced
+                sent = len(context) / len(html)
+                found = any(target in html[start:end] for start, end in spans)
+            print(
+                f"{len(html) // 1024:>5}KB {query:<42} {statistics.median(times) * 1000:>7.1f} "
+                f"{sent:>6.0%} {'yes' if found else 'no':>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
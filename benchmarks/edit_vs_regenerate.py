@@ -0,0 +1,92 @@
+"""
+Benchmark: a small edit as SEARCH/REPLACE patches against full regeneration.
+
+A fake provider streams at a fixed token rate (--tokens-per-second, 4
+characters per token). The same change to a generated page is requested
+through /api/generate twice: once as a fresh generation, where the model
+writes the whole page again, and once with previous_html, where it writes
+one SEARCH/REPLACE block that the server applies to the stored page.
+Reports time to the final document and the completion tokens each way.
+
+    python -m benchmarks.edit_vs_regenerate --page-kb 40 --tokens-per-second 400
+"""
+import argparse
+import time
+from tests.env import isolate, register, route_to, sse_events
+
+isolate(SCHEDULER_ENABLED="false", PROMPT_INDEX_ENABLED="false")
+
+import httpx  # noqa: E402
+from tests.fake_provider import FakeProvider, ServerThread, count_tokens, text_reply  # noqa: E402
+
+
+def build_page(size: int) -> str:
+    rows = []
+    i = 0
+    while sum(map(len, rows)) < size:
+        rows.append(f'    <section id="s{i}"><h2>Section {i}</h2><p>Text of section {i}.</p></section>\n')
+        i += 1
+    return "<!DOCTYPE html>\n<html>\n<body>\n    <h1>Bakery</h1>\n" + "".join(rows) + "</body>\n</html>\n"
+
+
+def full_reply(page: str) -> str:
+    return (
+        "===ANALYSIS_START===\nA bakery page.\n===ANALYSIS_END===\n"
+        f"===CODE_START===\n{page}===CODE_END===\n"
+        "===SUMMARY_START===\nRenamed the bakery.\n===SUMMARY_END===\n"
+    )
+
+
+EDIT_REPLY = (
+    "Renaming the heading.\n<<<<<<< SEARCH\n    <h1>Bakery</h1>\n=======\n"
+    "    <h1>Corner Bakery</h1>\n>>>>>>> REPLACE\n"
+)
+
+
+def timed(client: httpx.Client, headers: dict, body: dict) -> tuple:
+    started = time.perf_counter()
+    response = client.post("/api/generate", json=body, headers=headers)
+    elapsed = time.perf_counter() - started
+    return elapsed, dict(sse_events(response.text))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--page-kb", type=int, default=40)
+    parser.add_argument("--tokens-per-second", type=float, default=400)
+    args = parser.parse_args()
+
+    page = build_page(args.page_kb * 1024)
+    edited = page.replace("<h1>Bakery</h1>", "<h1>Corner Bakery</h1>")
+    delay = 1 / args.tokens_per_second
+
+    def handler(body):
+        if "SEARCH/REPLACE" in body["messages"][0]["content"]:
+            return text_reply(EDIT_REPLY, size=4, chunk_delay=delay)
+        return text_reply(full_reply(edited), size=4, chunk_delay=delay)
+
+    from backend.main import app
+
+    with FakeProvider(handler) as provider:
+        route_to(provider.url)
+        with ServerThread(app, lifespan="on") as server:
+            with httpx.Client(base_url=server.base_url, timeout=600) as client:
+                headers = register(client, "edit-bench")
+                full_time, full_events = timed(client, headers, {"prompt": "a bakery called Corner Bakery"})
+                edit_time, edit_events = timed(
+                    client, headers, {"prompt": "rename it Corner Bakery", "previous_html": page}
+                )
+
+    assert "done" in full_events, "the regeneration did not finish"
+    assert edit_events["document"] == edited, "the edit did not produce the expected page"
+    full_tokens = count_tokens(full_reply(edited))
+    edit_tokens = count_tokens(EDIT_REPLY)
+    print(f"page {len(page) / 1024:.0f} KB, fake model at {args.tokens_per_second:.0f} tokens/s")
+    print(f"{'mode':>12} {'seconds':>8} {'completion tokens':>18}")
+    print(f"{'regenerate':>12} {full_time:>8.2f} {full_tokens:>18}")
+    print(f"{'edit':>12} {edit_time:>8.2f} {edit_tokens:>18}")
+    print(f"edit is {full_time / edit_time:.0f}x faster and uses {full_tokens / edit_tokens:.0f}x fewer tokens")
+
+
+if __name__ == "__main__":
+    main()
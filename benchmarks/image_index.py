@@ -0,0 +1,105 @@
+"""
+Benchmark: near-duplicate lookup in the perceptual-hash image index.
+
+Fills an in-memory index with --entries fingerprints spread over --users
+users, then looks up three kinds of query:
+
+- a stored fingerprint with up to max_distance bits flipped, by its owner
+  (should hit),
+- the same by another user (must miss: entries are per user),
+- fingerprints of images nobody uploaded (should miss),
+
+and reports the hit rate of each with lookup and insert latency. Two
+fills: uniformly random hashes, and hashes clustered around a few hundred
+layouts, as screenshots of similar pages are, which makes the index
+buckets uneven.
+
+    python -m benchmarks.image_index --entries 10000 100000 --users 1000
+"""
+import argparse
+import random
+import statistics
+import time
+from tests.env import isolate
+
+isolate()
+
+from backend.core.config import settings  # noqa: E402
+from backend.services.image_index import HASH_BITS, ImageIndex  # noqa: E402
+
+
+def flip(value: int, bits: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(HASH_BITS), bits):
+        value ^= 1 << bit
+    return value
+
+
+def percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def fingerprints(fill: str, count: int, rng: random.Random):
+    if fill == "random":
+        return [(rng.getrandbits(HASH_BITS), rng.getrandbits(HASH_BITS)) for _ in range(count)]
+    layouts = [(rng.getrandbits(HASH_BITS), rng.getrandbits(HASH_BITS)) for _ in range(300)]
+    return [
+        (flip(p, rng.randint(8, 20), rng), flip(d, rng.randint(8, 20), rng))
+        for p, d in (rng.choice(layouts) for _ in range(count))
+    ]
+
+
+def run(fill: str, entries: int, users: int, queries: int, rng: random.Random) -> None:
+    distance = settings.IMAGE_CACHE_MAX_DISTANCE
+    index = ImageIndex(None, distance, entries)
+    stored = [(hashes, str(rng.randrange(users))) for hashes in fingerprints(fill, entries, rng)]
+    inserts = []
+    for hashes, owner in stored:
+        started = time.perf_counter()
+        index.add(hashes, "a description", owner)
+        inserts.append(time.perf_counter() - started)
+
+    samples = rng.sample(stored, min(queries, len(stored)))
+    near = [
+        ((flip(p, rng.randint(0, distance), rng), flip(d, rng.randint(0, distance), rng)), owner)
+        for (p, d), owner in samples
+    ]
+    kinds = {
+        "owner near-dup": near,
+        "other user": [(hashes, str((int(owner) + 1) % users)) for hashes, owner in near],
+        "new image": [(hashes, str(rng.randrange(users))) for hashes in fingerprints(fill, len(samples), rng)],
+    }
+
+    timings = []
+    rates = []
+    for kind, batch in kinds.items():
+        hits = 0
+        for hashes, owner in batch:
+            started = time.perf_counter()
+            hits += index.lookup(hashes, owner) is not None
+            timings.append(time.perf_counter() - started)
+        rates.append(f"{kind} {hits / len(batch):.1%}")
+    print(
+        f"{fill:>9} {entries:>8}  lookup p50 {statistics.median(timings) * 1e6:>5.0f}us "
+        f"p99 {percentile(timings, 99) * 1e6:>5.0f}us  insert p50 {statistics.median(inserts) * 1e6:>4.0f}us  "
+        f"hits: {', '.join(rates)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"max distance {settings.IMAGE_CACHE_MAX_DISTANCE} bits, {args.users} users")
+    for fill in ("random", "clustered"):
+        for entries in args.entries:
+            run(fill, entries, args.users, args.queries, rng)
+
+
+if __name__ == "__main__":
+    main()
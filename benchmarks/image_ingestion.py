@@ -0,0 +1,129 @@
+"""
+Benchmark: peak memory and time to ingest one upload for image analysis.
+
+For photo-like JPEG uploads of roughly 1 to 10 MB, runs two pipelines,
+each in a fresh child process:
+
+- legacy: decode, convert to RGB, save a PNG to a NamedTemporaryFile,
+  re-open it, re-encode PNG into a BytesIO and base64 it, as
+  /api/analyze-image used to;
+- current: services.image_pipeline.prepare_image (one draft-mode decode,
+  fit, tile, adaptive WebP/JPEG encode in memory) and the tiles' data URLs.
+
+Peak memory is the growth of the child's resident set over its size
+before the upload bytes are handled (VmHWM after resetting it through
+/proc/self/clear_refs), so this runs on Linux (glibc) only.
+
+    python -m benchmarks.image_ingestion --sizes 1 2 5 10
+"""
+import argparse
+import base64
+import ctypes
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+from tests.env import isolate
+
+isolate()
+
+from PIL import Image  # noqa: E402
+
+
+def photo(megabytes: float) -> bytes:
+    """A noisy photo-like JPEG of about the given size."""
+    width = 1000
+    while True:
+        height = width * 3 // 4
+        noise = Image.effect_noise((width, height), 60).convert("RGB")
+        gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+        image = Image.blend(noise, gradient, 0.5)
+        buffered = io.BytesIO()
+        image.save(buffered, format="JPEG", quality=95)
+        data = buffered.getvalue()
+        if len(data) >= megabytes * 1024 * 1024:
+            return data
+        width = int(width * 1.05)
+
+
+def _status(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1]) * 1024
+    raise KeyError(field)
+
+
+def legacy(data: bytes) -> int:
+    image = Image.open(io.BytesIO(data))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_file:
+        image.save(temp_file.name, format="PNG")
+        temp_path = temp_file.name
+    try:
+        with Image.open(temp_path) as reopened:
+            buffered = io.BytesIO()
+            reopened.save(buffered, format="PNG")
+            encoded = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    finally:
+        os.unlink(temp_path)
+    return len(encoded)
+
+
+def current(data: bytes) -> int:
+    from backend.services.image_pipeline import prepare_image
+
+    prepared = prepare_image(data)
+    return sum(len(tile.data_url) for tile in prepared.tiles)
+
+
+def _measure(pipeline: str, path: str, results) -> None:
+    pipeline = {"legacy": legacy, "current": current}[pipeline]
+    # Load the codecs and plugins outside the measurement
+    pipeline(photo(0))
+    with open(path, "rb") as f:
+        data = f.read()
+    # Hand memory freed by the warm-up back to the OS, so reuse of it still shows as growth
+    ctypes.CDLL("libc.so.6").malloc_trim(0)
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    baseline = _status("VmRSS")
+    started = time.perf_counter()
+    sent = pipeline(data)
+    elapsed = time.perf_counter() - started
+    results.put((elapsed, _status("VmHWM") - baseline, sent))
+
+
+def measure(pipeline: str, path: str) -> tuple:
+    results = multiprocessing.Queue()
+    child = multiprocessing.Process(target=_measure, args=(pipeline, path, results))
+    child.start()
+    result = results.get(timeout=600)
+    child.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 2, 5, 10], help="upload sizes in MB")
+    args = parser.parse_args()
+
+    mb = 1024 * 1024
+    print(f"{'upload MB':>9} {'pixels':>10} {'pipeline':>8} {'seconds':>8} {'peak MB':>8} {'sent MB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            data = photo(size)
+            path = os.path.join(directory, "upload.jpg")
+            with open(path, "wb") as f:
+                f.write(data)
+            with Image.open(io.BytesIO(data)) as image:
+                label = f"{len(data) / mb:>9.1f} {f'{image.width}x{image.height}':>10}"
+            for pipeline in ("legacy", "current"):
+                elapsed, peak, sent = measure(pipeline, path)
+                print(f"{label} {pipeline:>8} {elapsed:>8.2f} {peak / mb:>8.1f} {sent / mb:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Load test: stream jitter while users log in.
+
+Keeps --streams /api/generate streams open against a fake provider (in
+its own process) that sends a chunk every --chunk-delay seconds, while
+--logins clients log in back to back. Reports the gaps between body
+chunks received on the streams (p50, p99, max) and the login rate:
+without logins as a baseline, then with bcrypt run two ways:
+
+- inline: on the event loop, as the routes used to call it;
+- pool: in core.executor.hash_pool (CPU_HASH_WORKERS threads).
+
+    python -m benchmarks.login_jitter --streams 10 --logins 4 --seconds 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import time
+from tests.env import isolate, register, route_to
+
+isolate(SCHEDULER_ENABLED="false", PROMPT_INDEX_ENABLED="false")
+
+import httpx  # noqa: E402
+from tests.fake_provider import FakeProvider, ServerThread, text_reply  # noqa: E402
+
+PAGE = "===CODE_START===\n<!DOCTYPE html><html><body>\n" + "<p>x</p>\n" * 5000 + "</body></html>\n===CODE_END===\n"
+
+
+def serve_provider(chunk_delay: float, ports) -> None:
+    with FakeProvider(lambda body: text_reply(PAGE, size=16, chunk_delay=chunk_delay)) as provider:
+        ports.put(provider.port)
+        while True:
+            time.sleep(3600)
+
+
+async def run(base_url: str, headers: dict, args, logins_clients: int) -> tuple:
+    limits = httpx.Limits(max_connections=args.streams + logins_clients + 5)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        gaps = []
+        logins = 0
+        deadline = time.monotonic() + args.seconds
+        warm = asyncio.Event()
+
+        async def stream(i: int) -> None:
+            body = {"prompt": f"jitter {i} {time.monotonic_ns()}"}
+            async with client.stream("POST", "/api/generate", json=body, headers=headers) as response:
+                last = None
+                async for _ in response.aiter_raw():
+                    now = time.monotonic()
+                    if now > deadline:
+                        return
+                    if last is not None and warm.is_set():
+                        gaps.append(now - last)
+                    last = now
+
+        async def login() -> None:
+            nonlocal logins
+            await warm.wait()
+            while time.monotonic() < deadline:
+                response = await client.post(
+                    "/api/users/login", data={"username": "jitter-bench", "password": "password123"}
+                )
+                response.raise_for_status()
+                logins += 1
+
+        async def settle() -> None:
+            await asyncio.sleep(1.0)
+            warm.set()
+
+        await asyncio.gather(settle(), *(stream(i) for i in range(args.streams)), *(login() for _ in range(logins_clients)))
+        return gaps, logins / (args.seconds - 1.0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--streams", type=int, default=10)
+    parser.add_argument("--logins", type=int, default=4, help="concurrent login clients")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    from backend.core import executor
+    from backend.main import app
+
+    pooled = executor.CpuPool.run
+
+    async def inline(self, fn, *fn_args, **kwargs):
+        return fn(*fn_args, **kwargs)
+
+    ports = multiprocessing.Queue()
+    provider = multiprocessing.Process(target=serve_provider, args=(args.chunk_delay, ports), daemon=True)
+    provider.start()
+    try:
+        route_to(f"http://127.0.0.1:{ports.get(timeout=30)}/v1")
+        with ServerThread(app, lifespan="on") as server:
+            with httpx.Client(base_url=server.base_url) as client:
+                headers = register(client, "jitter-bench")
+            print(
+                f"{args.streams} streams (a chunk every {args.chunk_delay * 1000:.0f} ms), "
+                f"{args.logins} login clients, {executor.hash_pool.max_workers} hash workers"
+            )
+            print(f"{'bcrypt':>9} {'gap p50':>8} {'p99':>8} {'max':>8} {'logins/s':>9}   (ms)")
+            for mode, method, clients in (("no logins", pooled, 0), ("inline", inline, args.logins), ("pool", pooled, args.logins)):
+                executor.CpuPool.run = method
+                gaps, rate = asyncio.run(run(server.base_url, headers, args, clients))
+                gaps.sort()
+                print(
+                    f"{mode:>9} {statistics.median(gaps) * 1000:>8.1f} {gaps[int(len(gaps) * 0.99)] * 1000:>8.1f} "
+                    f"{gaps[-1] * 1000:>8.1f} {rate:>9.1f}"
+                )
+            executor.CpuPool.run = pooled
+    finally:
+        provider.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: a full generation as one stream against plan + parallel sections.
+
+A fake provider models a hosted model: a fixed time to first token
+(--ttft) and then a fixed token rate (--tokens-per-second, 4 characters
+per token). The same page of --page-kb is generated through
+/api/generate in mode "single" (one stream writes the whole page) and in
+mode "parallel" split into 2, 4 and 8 sections, after a non-streamed
+planning call. Reports wall-clock time to the final document and the
+peak number of concurrent upstream streams.
+
+The scheduler is on: a parallel generation runs on as many of the user's
+slots as are free, so --user-slots bounds the fan-out together with
+--concurrency (PARALLEL_CONCURRENCY).
+
+    python -m benchmarks.parallel_generation --page-kb 24 --tokens-per-second 200 --user-slots 8
+"""
+import argparse
+import json
+import time
+from tests.env import isolate, register, route_to, sse_events
+
+isolate(PROMPT_INDEX_ENABLED="false")
+
+import httpx  # noqa: E402
+from backend.core.config import settings  # noqa: E402
+from tests.fake_provider import FakeProvider, Reply, ServerThread, text_reply  # noqa: E402
+
+
+def section_html(section_id: str, size: int) -> str:
+    rows = []
+    i = 0
+    while sum(map(len, rows)) < size:
+        rows.append(f"  <p>Paragraph {i} of the {section_id} section.</p>\n")
+        i += 1
+    return f'<section id="{section_id}">\n' + "".join(rows) + "</section>\n"
+
+
+def peak_streams(streams) -> int:
+    edges = sorted([(s.started, 1) for s in streams] + [(s.ended, -1) for s in streams])
+    running = peak = 0
+    for _, step in edges:
+        running += step
+        peak = max(peak, running)
+    return peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--page-kb", type=int, default=24)
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--ttft", type=float, default=0.5, help="seconds to the first token")
+    parser.add_argument("--sections", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--user-slots", type=int, default=8)
+    args = parser.parse_args()
+
+    settings.PARALLEL_CONCURRENCY = args.concurrency
+    settings.PARALLEL_MAX_SECTIONS = max(args.sections)
+    settings.SCHEDULER_USER_SLOTS = args.user_slots
+    chars_per_chunk = 16
+    chunk_delay = chars_per_chunk / 4 / args.tokens_per_second
+    page_size = args.page_kb * 1024
+    sections_wanted = {"count": 1}
+
+    def handler(body):
+        system = body["messages"][0]["content"]
+        if "planning a single-page website" in system:
+            plan = {
+                "title": "Bench",
+                "analysis": "A long page.",
+                "sections": [{"id": f"part{i}", "brief": f"Part {i}"} for i in range(sections_wanted["count"])],
+            }
+            text = json.dumps(plan)
+            return Reply(chunks=[text], delay=args.ttft + len(text) / 4 / args.tokens_per_second)
+        if "ONE section" in system:
+            section_id = body["messages"][1]["content"].split('id="')[1].split('"')[0]
+            html = section_html(section_id, page_size // sections_wanted["count"])
+            return text_reply(html, size=chars_per_chunk, first_delay=args.ttft, chunk_delay=chunk_delay)
+        page = "<!DOCTYPE html>\n<html>\n<body>\n" + section_html("page", page_size) + "</body>\n</html>\n"
+        reply = (
+            "===ANALYSIS_START===\nA long page.\n===ANALYSIS_END===\n"
+            f"===CODE_START===\n{page}===CODE_END===\n===SUMMARY_START===\nDone.\n===SUMMARY_END===\n"
+        )
+        return text_reply(reply, size=chars_per_chunk, first_delay=args.ttft, chunk_delay=chunk_delay)
+
+    from backend.main import app
+
+    print(
+        f"page {args.page_kb} KB, fake model at {args.tokens_per_second:.0f} tokens/s, {args.ttft:.1f}s TTFT, "
+        f"concurrency {args.concurrency}, {args.user_slots} user slots"
+    )
+    print(f"{'mode':>12} {'seconds':>8} {'speedup':>8} {'peak streams':>13}")
+    with FakeProvider(handler) as provider:
+        route_to(provider.url)
+        with ServerThread(app, lifespan="on") as server:
+            with httpx.Client(base_url=server.base_url, timeout=600) as client:
+                headers = register(client, "parallel-bench")
+                baseline = None
+                for count in [1] + args.sections:
+                    sections_wanted["count"] = count
+                    provider.streams.clear()
+                    mode = "single" if count == 1 else "parallel"
+                    started = time.perf_counter()
+                    response = client.post(
+                        "/api/generate",
+                        json={"prompt": f"a long page in {count} parts", "mode": mode},
+                        headers=headers,
+                    )
+                    elapsed = time.perf_counter() - started
+                    events = dict(sse_events(response.text))
+                    assert json.loads(events["done"]).get("code_complete"), f"{mode} x{count} did not finish"
+                    baseline = baseline or elapsed
+                    label = "single" if count == 1 else f"{count} sections"
+                    print(f"{label:>12} {elapsed:>8.2f} {baseline / elapsed:>7.1f}x {peak_streams(provider.streams):>13}")
+
+
+if __name__ == "__main__":
+    main()
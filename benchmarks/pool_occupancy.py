@@ -0,0 +1,78 @@
+"""
+Load test: concurrent generations against the database connection pool.
+
+Opens more concurrent /api/generate streams than the pool has connections
+(pool_size + max_overflow) and reports how many stream at once and the
+peak number of checked-out connections from /api/metrics. Generations
+return their connection before streaming, so the peak stays near the
+number of requests being authenticated at any instant, not the number
+of open streams.
+
+    python -m benchmarks.pool_occupancy --streams 60
+"""
+import argparse
+import asyncio
+import os
+import time
+from tests.env import isolate, register, route_to
+
+isolate(SCHEDULER_ENABLED="false", PROMPT_INDEX_ENABLED="false")
+
+import httpx  # noqa: E402
+from tests.fake_provider import FakeProvider, ServerThread, text_reply  # noqa: E402
+
+PAGE = "===CODE_START===\n<!DOCTYPE html><html><body>\n" + "<p>x</p>\n" * 400 + "</body></html>\n===CODE_END===\n"
+
+
+async def run(base_url: str, headers: dict, streams: int) -> None:
+    limits = httpx.Limits(max_connections=streams + 5)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        streaming = 0
+        peak_streaming = 0
+
+        async def one(i: int) -> None:
+            nonlocal streaming, peak_streaming
+            body = {"prompt": f"pool test {i} {time.monotonic_ns()}"}
+            async with client.stream("POST", "/api/generate", json=body, headers=headers) as response:
+                response.raise_for_status()
+                first = True
+                async for _ in response.aiter_raw():
+                    if first:
+                        streaming += 1
+                        peak_streaming = max(peak_streaming, streaming)
+                        first = False
+                streaming -= 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(streams)))
+        elapsed = time.perf_counter() - started
+        token = {"Authorization": f"Bearer {os.environ['METRICS_TOKEN']}"}
+        metrics = (await client.get("/api/metrics", headers=token)).json()
+
+    from backend.db.session import engine
+    print(f"streams requested          {streams}")
+    print(f"pool size + max overflow   {engine.pool.size()} + {engine.pool._max_overflow}")
+    print(f"peak concurrent streams    {peak_streaming}")
+    print(f"peak checked-out (sync)    {metrics['db.pool.peak_checked_out']}")
+    print(f"peak checked-out (async)   {metrics['db.async_pool.peak_checked_out']}")
+    print(f"wall time                  {elapsed:.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--streams", type=int, default=60)
+    parser.add_argument("--chunk-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    from backend.main import app
+
+    with FakeProvider(lambda body: text_reply(PAGE, size=64, chunk_delay=args.chunk_delay)) as provider:
+        route_to(provider.url)
+        with ServerThread(app, lifespan="on") as server:
+            with httpx.Client(base_url=server.base_url) as client:
+                headers = register(client, "pool-bench")
+            asyncio.run(run(server.base_url, headers, args.streams))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark: near-duplicate prompt lookup in the MinHash/LSH prompt index.
+
+Fills an in-memory index with synthetic prompts spread over a number of
+users, then looks up three kinds of query:
+
+- rephrasings of a stored prompt by its owner (should hit),
+- the same rephrasings by another user (must miss: entries are per user),
+- prompts for sites nobody asked for (should miss),
+
+and reports the hit rate of each at the edit and return thresholds, plus
+lookup and insert latency.
+
+    python -m benchmarks.prompt_index --entries 10000 100000 --users 1000
+"""
+import argparse
+import random
+import statistics
+import time
+from tests.env import isolate
+
+isolate()
+
+from backend.core.config import settings  # noqa: E402
+from backend.services.prompt_index import PromptIndex, signature, tokens  # noqa: E402
+
+BUSINESSES = [
+    "bakery", "dentist", "law firm", "yoga studio", "coffee shop", "photographer", "plumber", "bookstore",
+    "gym", "florist", "architect", "wedding planner", "car repair shop", "veterinary clinic", "language school",
+    "brewery", "hotel", "tattoo studio", "accounting firm", "bike shop", "pet groomer", "escape room",
+]
+CITIES = [
+    "Lisbon", "Berlin", "Austin", "Osaka", "Nairobi", "Lima", "Oslo", "Toronto", "Melbourne", "Prague",
+    "Seoul", "Dublin", "Cape Town", "Denver", "Porto", "Krakow",
+]
+FEATURES = [
+    "online booking", "a price list", "customer testimonials", "a photo gallery", "a contact form", "opening hours",
+    "a blog", "a newsletter signup", "team profiles", "an FAQ", "a map", "gift cards", "a loyalty program",
+    "live chat", "job openings", "an events calendar",
+]
+STYLES = ["minimal", "dark", "colorful", "elegant", "playful", "corporate", "retro", "modern"]
+FILLER = ["please", "I need", "make", "build me", "create", "we want"]
+
+
+def make_prompt(rng: random.Random) -> str:
+    features = rng.sample(FEATURES, rng.randint(2, 4))
+    return (
+        f"a {rng.choice(STYLES)} website for a {rng.choice(BUSINESSES)} in {rng.choice(CITIES)} "
+        f"with {', '.join(features[:-1])} and {features[-1]}"
+    )
+
+
+def rephrase(prompt: str, rng: random.Random) -> str:
+    """The same request worded differently: filler words, reordered features, plurals."""
+    head, _, features = prompt.partition(" with ")
+    parts = features.replace(" and ", ", ").split(", ")
+    rng.shuffle(parts)
+    return f"{rng.choice(FILLER)} {head.replace('a ', '', 1)} website, with {' and '.join(parts)}s"
+
+
+def percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(entries: int, users: int, queries: int, rng: random.Random) -> None:
+    index = PromptIndex(None, entries)
+    stored = []
+    rows = []
+    for entry_id in range(1, entries + 1):
+        prompt, owner = make_prompt(rng), str(rng.randrange(users))
+        stored.append((prompt, owner))
+        rows.append((entry_id, prompt, f"hash-{entry_id}", signature(tokens(prompt)), owner))
+    index.bulk_load(rows)
+
+    samples = rng.sample(stored, min(queries, len(stored)))
+    kinds = {
+        "owner rephrase": [(rephrase(prompt, rng), owner) for prompt, owner in samples],
+        "other user": [(rephrase(prompt, rng), str((int(owner) + 1) % users)) for prompt, owner in samples],
+        "new site": [(make_prompt(rng) + " and a " + rng.choice(BUSINESSES) + " shop", str(rng.randrange(users)))
+                     for _ in samples],
+    }
+    # A match for an "other user" query may only be an entry that user stored themselves
+    owned = {(" ".join(sorted(tokens(p))), o) for p, o in stored}
+
+    timings = []
+    for kind, batch in kinds.items():
+        hits = {settings.PROMPT_INDEX_EDIT_THRESHOLD: 0, settings.PROMPT_INDEX_RETURN_THRESHOLD: 0}
+        for prompt, owner in batch:
+            started = time.perf_counter()
+            match = index.lookup(prompt, settings.PROMPT_INDEX_EDIT_THRESHOLD, owner)
+            timings.append(time.perf_counter() - started)
+            if match is None:
+                continue
+            if kind == "other user" and (" ".join(sorted(tokens(match["prompt"]))), owner) not in owned:
+                raise AssertionError(f"cross-user match for {owner}: {match['prompt']!r}")
+            for threshold in hits:
+                hits[threshold] += match["similarity"] >= threshold
+        print(
+            f"{entries:>8} {kind:<15} "
+            + " ".join(f"{hits[t] / len(batch):>8.1%}" for t in sorted(hits))
+        )
+
+    inserts = []
+    for _ in range(min(queries, 2000)):
+        prompt, owner = make_prompt(rng), str(rng.randrange(users))
+        started = time.perf_counter()
+        index.add(prompt, "hash-new", owner)
+        inserts.append(time.perf_counter() - started)
+    print(
+        f"{entries:>8} lookup p50 {statistics.median(timings) * 1e6:.0f}us p99 {percentile(timings, 99) * 1e6:.0f}us, "
+        f"insert p50 {statistics.median(inserts) * 1e6:.0f}us p99 {percentile(inserts, 99) * 1e6:.0f}us"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    edit, ret = settings.PROMPT_INDEX_EDIT_THRESHOLD, settings.PROMPT_INDEX_RETURN_THRESHOLD
+    print(f"{'entries':>8} {'query':<15} {'>=' + str(edit):>8} {'>=' + str(ret):>8}   (hit rate)")
+    for entries in args.entries:
+        run(entries, args.users, args.queries, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Microbenchmark: incremental section parsing over large recorded outputs.
+
+Feeds three-part model outputs of growing size to SectionParser in
+token-sized chunks and reports the cost per KB, which stays constant
+when parsing is linear. For comparison it also times the approach the
+frontend used before: re-running the section regexes over the whole
+accumulated buffer on every chunk, which is quadratic (only run up to
+--rescan-max-kb, it gets slow quickly).
+
+    python -m benchmarks.section_parser --sizes-kb 128 256 512 1024 2048
+"""
+import argparse
+import random
+import re
+import time
+from tests.env import isolate
+
+isolate()
+
+from backend.services.section_parser import SectionParser  # noqa: E402
+
+_RESCAN = [
+    re.compile(r"===ANALYSIS_START===(.*?)(?====ANALYSIS_END===|$)", re.S),
+    re.compile(r"===CODE_START===(.*?)(?====CODE_END===|$)", re.S),
+    re.compile(r"===SUMMARY_START===(.*?)(?====SUMMARY_END===|$)", re.S),
+]
+
+
+def recorded_output(size: int, seed: int = 0) -> str:
+    """A response in the unified three-part format with about size bytes of HTML."""
+    rng = random.Random(seed)
+    words = "hero pricing feature team contact about services gallery testimonial faq".split()
+    parts = []
+    total = 0
+    while total < size:
+        tag = rng.choice(["section", "div", "article"])
+        block = (
+            f'<{tag} class="py-12 px-6 bg-gray-50"><h2 class="text-3xl">{" ".join(rng.choices(words, k=3))}</h2>'
+            f'<p class="mt-4">{" ".join(rng.choices(words, k=25))}</p>'
+            # "===" inside code, which the parser must not mistake for a marker
+            f'<script>if (a === b) {{ x = "==="; }}</script></{tag}>\n'
+        )
+        parts.append(block)
+        total += len(block)
+    return (
+        "===ANALYSIS_START===\nA landing page with several sections.\n===ANALYSIS_END===\n\n"
+        "===CODE_START===\n<!DOCTYPE html><html><body>\n" + "".join(parts) + "</body></html>\n===CODE_END===\n\n"
+        "===SUMMARY_START===\nBuilt the page.\n===SUMMARY_END===\n"
+    )
+
+
+def chunks(text: str, seed: int = 1):
+    """Token-like chunks of 1 to 12 characters."""
+    rng = random.Random(seed)
+    i = 0
+    while i < len(text):
+        n = rng.randint(1, 12)
+        yield text[i:i + n]
+        i += n
+
+
+def time_parser(pieces) -> float:
+    started = time.perf_counter()
+    parser = SectionParser()
+    for piece in pieces:
+        parser.feed(piece)
+    parser.finish()
+    return time.perf_counter() - started
+
+
+def time_rescan(pieces) -> float:
+    started = time.perf_counter()
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        for pattern in _RESCAN:
+            pattern.search(buffer)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[128, 256, 512, 1024, 2048])
+    parser.add_argument("--rescan-max-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{'size KB':>8} {'chunks':>8} {'parser ms':>10} {'us/KB':>7} {'rescan ms':>10} {'us/KB':>9}")
+    for size_kb in args.sizes_kb:
+        pieces = list(chunks(recorded_output(size_kb * 1024)))
+        kb = sum(map(len, pieces)) / 1024
+        parsed = time_parser(pieces)
+        line = f"{size_kb:>8} {len(pieces):>8} {parsed * 1000:>10.1f} {parsed * 1e6 / kb:>7.1f}"
+        if size_kb <= args.rescan_max_kb:
+            rescan = time_rescan(pieces)
+            line += f" {rescan * 1000:>10.1f} {rescan * 1e6 / kb:>9.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
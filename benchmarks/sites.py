@@ -0,0 +1,113 @@
+"""
+Benchmark: published sites served precompressed against compressing per request.
+
+Publishes one generated page of --page-kb and has --concurrency clients
+fetch it with Accept-Encoding gzip for --seconds from two routes: the
+application's /sites/{slug}, which sends the gzip file written once at
+publish time, and a route added to the same application that keeps the
+page in memory and gzips it at --level on every response. Reports
+requests per second, latency percentiles and bytes on the wire per
+response.
+
+    python -m benchmarks.sites --page-kb 60 --concurrency 16 --seconds 5
+"""
+import argparse
+import asyncio
+import gzip
+import random
+import statistics
+import time
+from uuid import UUID
+from tests.env import isolate, register
+
+isolate()
+
+import httpx  # noqa: E402
+from fastapi.responses import Response  # noqa: E402
+from tests.fake_provider import ServerThread  # noqa: E402
+
+
+WORDS = "fresh bread baked daily sourdough rye croissant oven flour butter morning corner shop order".split()
+
+
+def build_page(size: int) -> str:
+    """Tailwind-styled sections with varied copy, so the page compresses like a generated one."""
+    rng = random.Random(0)
+    rows = []
+    i = 0
+    while sum(map(len, rows)) < size:
+        text = " ".join(rng.choice(WORDS) for _ in range(40))
+        rows.append(
+            f'    <section id="s{i}" class="py-{rng.randint(4, 24)} px-8 bg-white"><h2 class="text-3xl font-bold">'
+            f'{rng.choice(WORDS).title()} {i}</h2><p class="mt-4 text-gray-{rng.randint(4, 8)}00">{text}</p></section>\n'
+        )
+        i += 1
+    return "<!DOCTYPE html>\n<html>\n<body>\n" + "".join(rows) + "</body>\n</html>\n"
+
+
+def add_compressing_route(app, page: str, level: int) -> str:
+    body = page.encode("utf-8")
+
+    async def serve_page():
+        return Response(gzip.compress(body, level), media_type="text/html", headers={"Content-Encoding": "gzip"})
+
+    app.add_api_route("/bench/page", serve_page, methods=["GET"])
+    return "/bench/page"
+
+
+async def run(base_url: str, path: str, args) -> tuple:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        latencies, sizes = [], []
+        deadline = time.monotonic() + args.seconds
+
+        async def worker() -> None:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                async with client.stream("GET", path, headers={"Accept-Encoding": "gzip"}) as response:
+                    size = sum([len(chunk) async for chunk in response.aiter_raw()])
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+                assert response.headers.get("content-encoding") == "gzip", "the response was not compressed"
+                sizes.append(size)
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        return latencies, sizes, time.monotonic() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--page-kb", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--level", type=int, default=6, help="gzip level of the per-request baseline")
+    args = parser.parse_args()
+
+    from backend.main import app
+    from backend.services import projects
+
+    page = build_page(args.page_kb * 1024)
+    with ServerThread(app, lifespan="on") as server, httpx.Client(base_url=server.base_url) as client:
+        headers = register(client, "sites-bench")
+        user_id = UUID(client.get("/api/users/me", headers=headers).json()["id"])
+        project_id = projects.save_version(user_id, None, None, page, "a bakery")["project_id"]
+        url = client.post(f"/api/projects/{project_id}/site", headers=headers).json()["url"]
+        precompressed = asyncio.run(run(server.base_url, url, args))
+        per_request = asyncio.run(run(server.base_url, add_compressing_route(app, page, args.level), args))
+
+    print(f"page {len(page) / 1024:.0f} KB, {args.concurrency} concurrent clients, {args.seconds:g}s each")
+    print(f"{'mode':>22} {'req/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'bytes/resp':>11}")
+    for label, (latencies, sizes, elapsed) in (
+        ("precompressed (site)", precompressed),
+        (f"gzip -{args.level} per request", per_request),
+    ):
+        latencies.sort()
+        print(
+            f"{label:>22} {len(latencies) / elapsed:>8.0f} {statistics.median(latencies) * 1000:>7.1f} "
+            f"{latencies[int(len(latencies) * 0.99)] * 1000:>7.1f} {statistics.mean(sizes):>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: coalesced SSE framing against the old per-delta writes.
+
+Streams the same N token deltas two ways through a real uvicorn server:
+
+- legacy: every delta is its own body write, followed by
+  asyncio.sleep(0.01), as the old stream_generator did;
+- coalesced: services.streaming.sse_stream, which merges deltas into
+  text/event-stream frames by size (STREAM_FLUSH_BYTES) and age
+  (STREAM_FLUSH_INTERVAL_MS).
+
+Reports tokens per second delivered to the client and body writes per
+response. Each ASGI body message is one transport write, so one send()
+syscall on the socket.
+
+    python -m benchmarks.sse_framing --tokens 2000 --upstream-delay 0
+"""
+import argparse
+import asyncio
+import time
+from tests.env import isolate
+
+isolate()
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+from tests.fake_provider import ServerThread  # noqa: E402
+
+
+class CountWrites:
+    """ASGI middleware counting the body messages (socket writes) of the last response per path."""
+
+    def __init__(self, app):
+        self.app = app
+        self.writes = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+        self.writes[path] = 0
+
+        async def counting_send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                self.writes[path] += 1
+            await send(message)
+
+        await self.app(scope, receive, counting_send)
+
+
+def build_app(tokens: int, upstream_delay: float) -> CountWrites:
+    from backend.services.streaming import sse_stream
+
+    app = FastAPI()
+
+    async def deltas():
+        for i in range(tokens):
+            if upstream_delay:
+                await asyncio.sleep(upstream_delay)
+            yield "code.delta", f"tok{i % 10} "
+
+    @app.get("/legacy")
+    async def legacy():
+        async def stream_generator():
+            async for _, text in deltas():
+                yield text.encode("utf-8")
+                await asyncio.sleep(0.01)
+        return StreamingResponse(stream_generator(), media_type="text/event-stream")
+
+    @app.get("/coalesced")
+    async def coalesced():
+        return StreamingResponse(sse_stream(deltas()), media_type="text/event-stream")
+
+    return CountWrites(app)
+
+
+def measure(base_url: str, path: str) -> tuple:
+    with httpx.Client(base_url=base_url, timeout=600) as client:
+        started = time.perf_counter()
+        size = 0
+        with client.stream("GET", path) as response:
+            for chunk in response.iter_raw():
+                size += len(chunk)
+        return time.perf_counter() - started, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--upstream-delay", type=float, default=0.0, help="seconds between upstream deltas")
+    args = parser.parse_args()
+
+    app = build_app(args.tokens, args.upstream_delay)
+    with ServerThread(app) as server:
+        print(f"{args.tokens} deltas, upstream delay {args.upstream_delay * 1000:.1f} ms")
+        print(f"{'mode':>10} {'seconds':>8} {'tokens/s':>9} {'writes':>7} {'bytes':>8}")
+        for path in ("/legacy", "/coalesced"):
+            elapsed, size = measure(server.base_url, path)
+            print(
+                f"{path[1:]:>10} {elapsed:>8.2f} {args.tokens / elapsed:>9.0f} "
+                f"{app.writes[path]:>7} {size:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
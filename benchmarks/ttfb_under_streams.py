@@ -0,0 +1,110 @@
+"""
+Load test: time to first byte of other routes while generations stream.
+
+A fake provider, in its own process, streams slow generations (a chunk
+every --chunk-delay seconds, roughly a model's token rate). For each
+level of concurrent /api/generate streams, the script measures the time
+to first byte of GET /api/templates and GET /api/users/me, requested
+one after the other while the streams run. With a non-blocking streaming
+path both stay flat as streams are added, until the CPU itself runs out.
+
+    python -m benchmarks.ttfb_under_streams --levels 0 25 50 100
+"""
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import time
+from tests.env import isolate, register, route_to
+
+isolate(SCHEDULER_ENABLED="false", PROMPT_INDEX_ENABLED="false")
+
+import httpx  # noqa: E402
+from tests.fake_provider import FakeProvider, ServerThread, text_reply  # noqa: E402
+
+PAGE = (
+    "===ANALYSIS_START===\nA page.\n===ANALYSIS_END===\n===CODE_START===\n<!DOCTYPE html><html><body>\n"
+    + "".join(f"<p>paragraph {i}</p>\n" for i in range(2000))
+    + "</body></html>\n===CODE_END===\n===SUMMARY_START===\nDone.\n===SUMMARY_END===\n"
+)
+
+
+def serve_provider(chunk_delay: float, ports) -> None:
+    with FakeProvider(lambda body: text_reply(PAGE, size=32, chunk_delay=chunk_delay)) as provider:
+        ports.put(provider.port)
+        while True:
+            time.sleep(3600)
+
+
+async def ttfb(client: httpx.AsyncClient, path: str, headers: dict) -> float:
+    started = time.perf_counter()
+    async with client.stream("GET", path, headers=headers) as response:
+        async for _ in response.aiter_raw():
+            break
+    return time.perf_counter() - started
+
+
+async def hold_stream(client: httpx.AsyncClient, headers: dict, prompt: str, streaming: asyncio.Event) -> None:
+    async with client.stream("POST", "/api/generate", json={"prompt": prompt}, headers=headers) as response:
+        async for _ in response.aiter_raw():
+            streaming.set()
+
+
+async def run_level(base_url: str, headers: dict, streams: int, samples: int) -> dict:
+    limits = httpx.Limits(max_connections=streams + 10, max_keepalive_connections=streams + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        started = [asyncio.Event() for _ in range(streams)]
+        tasks = [
+            asyncio.ensure_future(hold_stream(client, headers, f"site number {level_id(streams, i)}", started[i]))
+            for i in range(streams)
+        ]
+        if started:
+            await asyncio.wait_for(asyncio.gather(*(event.wait() for event in started)), timeout=60)
+            await asyncio.sleep(1.0)  # past the ramp-up, into steady streaming
+        results = {}
+        for path in ("/api/templates", "/api/users/me"):
+            times = [await ttfb(client, path, headers) for _ in range(samples)]
+            times.sort()
+            results[path] = (statistics.median(times), times[int(len(times) * 0.95) - 1])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return results
+
+
+def level_id(streams: int, i: int) -> str:
+    # Distinct prompts, so identical generations are not coalesced into one upstream stream
+    return f"{streams}-{i}-{time.monotonic_ns()}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=[0, 10, 25, 50, 100])
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--chunk-delay", type=float, default=0.1)
+    args = parser.parse_args()
+
+    from backend.main import app
+
+    ports = multiprocessing.Queue()
+    provider = multiprocessing.Process(target=serve_provider, args=(args.chunk_delay, ports), daemon=True)
+    provider.start()
+    try:
+        route_to(f"http://127.0.0.1:{ports.get(timeout=30)}/v1")
+        with ServerThread(app, lifespan="on") as server:
+            with httpx.Client(base_url=server.base_url) as client:
+                headers = register(client, "ttfb-bench")
+            print(f"{'streams':>8} {'templates p50':>14} {'p95':>8} {'users/me p50':>13} {'p95':>8}   (ms)")
+            for streams in args.levels:
+                results = asyncio.run(run_level(server.base_url, headers, streams, args.samples))
+                templates, me = results["/api/templates"], results["/api/users/me"]
+                print(
+                    f"{streams:>8} {templates[0] * 1000:>14.1f} {templates[1] * 1000:>8.1f} "
+                    f"{me[0] * 1000:>13.1f} {me[1] * 1000:>8.1f}"
+                )
+    finally:
+        provider.terminate()
+
+
+if __name__ == "__main__":
+    main()
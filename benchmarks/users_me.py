@@ -0,0 +1,79 @@
+"""
+Benchmark: GET /api/users/me throughput with and without the user cache.
+
+Registers --users users, then has --concurrency clients request
+/api/users/me as fast as they can for --seconds, spread over those users,
+once with the user cache disabled (USER_CACHE_TTL 0: every request loads
+the user in a database session) and once enabled. Reports requests per
+second, latency percentiles and database sessions opened per request.
+
+    python -m benchmarks.users_me --concurrency 16 --seconds 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from tests.env import isolate, register
+
+isolate()
+
+import httpx  # noqa: E402
+from tests.fake_provider import ServerThread  # noqa: E402
+
+
+async def run(base_url: str, headers: list, args) -> tuple:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        latencies = []
+        deadline = time.monotonic() + args.seconds
+
+        async def worker(i: int) -> None:
+            n = i
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                response = await client.get("/api/users/me", headers=headers[n % len(headers)])
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+                n += args.concurrency
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+        return latencies, time.monotonic() - started
+
+
+def acquisitions(client: httpx.Client) -> int:
+    token = {"Authorization": f"Bearer {os.environ['METRICS_TOKEN']}"}
+    return client.get("/api/metrics", headers=token).json().get("db.acquire.count", 0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    from backend.core.user_cache import cache
+    from backend.main import app
+
+    ttl = cache.ttl
+    with ServerThread(app, lifespan="on") as server, httpx.Client(base_url=server.base_url) as client:
+        headers = [register(client, f"me-bench-{i}") for i in range(args.users)]
+        print(f"{args.users} users, {args.concurrency} concurrent clients, {args.seconds:g}s each")
+        print(f"{'cache':>6} {'req/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'db sessions/req':>16}")
+        for label, cache_ttl in (("off", 0), ("on", ttl)):
+            cache.ttl = cache_ttl
+            cache._entries.clear()
+            before = acquisitions(client)
+            latencies, elapsed = asyncio.run(run(server.base_url, headers, args))
+            sessions = acquisitions(client) - before
+            latencies.sort()
+            print(
+                f"{label:>6} {len(latencies) / elapsed:>8.0f} {statistics.median(latencies) * 1000:>7.1f} "
+                f"{latencies[int(len(latencies) * 0.99)] * 1000:>7.1f} {sessions / len(latencies):>16.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
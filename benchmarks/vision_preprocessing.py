@@ -0,0 +1,131 @@
+"""
+Benchmark: vision request size and analysis latency with and without
+image preprocessing (IMAGE_PREPROCESS).
+
+Posts a fixture set of drawn mockups (a 4K landing page, a tall full-page
+capture, a phone screenshot, a photo-heavy page) to /api/analyze-image.
+The vision model is a fake provider whose response time is modelled from
+what it receives: the request body over --uplink-mbps plus the estimated
+vision tokens at --prefill-tokens-per-second. Reports the request body
+size, vision tokens and end-to-end latency for each mockup both ways.
+
+    python -m benchmarks.vision_preprocessing --uplink-mbps 50 --prefill-tokens-per-second 4000
+"""
+import argparse
+import base64
+import io
+import json
+import time
+from tests.env import isolate, register, route_to
+
+isolate(api_key="bench-key", IMAGE_CACHE_ENABLED="false", SCHEDULER_ENABLED="false")
+
+import httpx  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+from tests.fake_provider import FakeProvider, ServerThread, text_reply  # noqa: E402
+
+
+def mockup(width: int, height: int, photos: bool = False) -> Image.Image:
+    image = Image.new("RGB", (width, height), "#f7f7fb")
+    draw = ImageDraw.Draw(image)
+    unit = max(8, width // 120)
+    draw.rectangle((0, 0, width, unit * 8), fill="#1f2a44")
+    for i in range(5):
+        draw.rectangle((width - (i + 1) * unit * 14, unit * 3, width - (i + 1) * unit * 14 + unit * 10, unit * 5), fill="#e0e6f5")
+    y = unit * 12
+    row = 0
+    while y < height - unit * 20:
+        columns = 3 if row % 2 else 1
+        card_width = (width - unit * 4 * (columns + 1)) // columns
+        for c in range(columns):
+            x = unit * 4 + c * (card_width + unit * 4)
+            draw.rounded_rectangle((x, y, x + card_width, y + unit * 30), radius=unit, fill="white", outline="#d5d9e6")
+            if photos:
+                patch = Image.effect_noise((card_width - unit * 2, unit * 14), 50 + 10 * c).convert("RGB")
+                image.paste(patch, (x + unit, y + unit))
+            else:
+                draw.rectangle((x + unit, y + unit, x + card_width - unit, y + unit * 15), fill="#c8d3f0")
+            for line in range(5):
+                draw.rectangle(
+                    (x + unit, y + unit * (17 + line * 2), x + card_width - unit * (3 + line * 2), y + unit * (18 + line * 2)),
+                    fill="#9aa3b5",
+                )
+        y += unit * 36
+        row += 1
+    draw.rectangle((0, height - unit * 12, width, height), fill="#1f2a44")
+    return image
+
+
+FIXTURES = {
+    "landing 4K": lambda: mockup(3840, 2160),
+    "full page": lambda: mockup(1440, 9000),
+    "phone": lambda: mockup(1170, 2532),
+    "photo-heavy": lambda: mockup(2560, 1600, photos=True),
+}
+
+
+def png(image: Image.Image) -> bytes:
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def vision_tokens(body: dict) -> int:
+    from backend.services.image_pipeline import estimate_vision_tokens
+
+    tokens = 0
+    for part in body["messages"][0]["content"]:
+        if part["type"] == "image_url":
+            data = base64.b64decode(part["image_url"]["url"].split(",", 1)[1])
+            with Image.open(io.BytesIO(data)) as image:
+                tokens += estimate_vision_tokens(*image.size)
+    return tokens
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--uplink-mbps", type=float, default=50.0)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=4000.0)
+    args = parser.parse_args()
+
+    from backend.core.config import settings
+    from backend.main import app
+
+    seen = []
+
+    def handler(body):
+        size = len(json.dumps(body))
+        tokens = vision_tokens(body)
+        seen.append((size, tokens))
+        delay = size * 8 / (args.uplink_mbps * 1e6) + tokens / args.prefill_tokens_per_second
+        return text_reply("A landing page with a dark header and a grid of cards.", delay=delay)
+
+    with FakeProvider(handler) as provider:
+        route_to(provider.url)
+        with ServerThread(app, lifespan="on") as server, httpx.Client(base_url=server.base_url, timeout=600) as client:
+            headers = register(client, "vision-bench")
+            print(
+                f"uplink {args.uplink_mbps:g} Mbit/s, prefill {args.prefill_tokens_per_second:g} tokens/s\n"
+                f"{'mockup':>12} {'upload':>9} {'preprocess':>10} {'request':>10} {'tokens':>7} {'seconds':>8}"
+            )
+            for name, build in FIXTURES.items():
+                data = png(build())
+                for preprocess in (False, True):
+                    settings.IMAGE_PREPROCESS = preprocess
+                    started = time.perf_counter()
+                    response = client.post(
+                        "/api/analyze-image",
+                        files={"file": ("mockup.png", data, "image/png")},
+                        headers=headers,
+                    )
+                    elapsed = time.perf_counter() - started
+                    response.raise_for_status()
+                    size, tokens = seen[-1]
+                    print(
+                        f"{name:>12} {len(data) / 1024:>7.0f}KB {'on' if preprocess else 'off':>10} "
+                        f"{size / 1024:>8.0f}KB {tokens:>7} {elapsed:>8.2f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
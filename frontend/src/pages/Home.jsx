@@ -7,6 +7,7 @@ import {
   generateCode, 
   analyzeImage, 
   generateCodeFromImage,
+  readEventStream,
   refreshToken as apiRefreshToken 
 } from '../services/api';
 import './Home.css';
@@ -156,72 +157,39 @@ function HomePage() {
         stream = await generateCode({ prompt });
       }
 
-      const reader = stream.getReader();
-      const decoder = new TextDecoder();
-      let buffer = '';
+      // The backend parses the three-part response and sends typed events
+      const sections = { analysis: '', code: '', summary: '' };
       let currentPhase = 'analysis';
 
-      while (true) {
-        const { done, value } = await reader.read();
-        if (done) break;
-        
-        buffer += decoder.decode(value, { stream: true });
-        
-        // Parse the three-part response
-        if (buffer.includes('===ANALYSIS_START===') && currentPhase === 'analysis') {
-          setResponsePhase('explanation');
+      await readEventStream(stream, ({ event, data }) => {
+        if (event === 'error') {
+          throw new Error(data);
         }
-        
-        if (buffer.includes('===CODE_START===') && currentPhase !== 'code') {
-          currentPhase = 'code';
-          setResponsePhase('generating');
-          setActiveTab('code');
-          
-          // Extract and display analysis content
-          const analysisMatch = buffer.match(/===ANALYSIS_START===(.*?)===ANALYSIS_END===/s);
-          if (analysisMatch) {
-            setExplanationText(analysisMatch[1].trim());
-          }
-        }
-        
-        if (buffer.includes('===SUMMARY_START===') && currentPhase !== 'summary') {
-          currentPhase = 'summary';
-          setResponsePhase('summary');
-          
-          // Extract and display code content
-          const codeMatch = buffer.match(/===CODE_START===(.*?)===CODE_END===/s);
-          if (codeMatch) {
-            setCode(codeMatch[1].trim());
-          }
-        }
-        
-        // Real-time updates for current phase
-        if (currentPhase === 'analysis') {
-          const analysisPartial = buffer.match(/===ANALYSIS_START===(.*?)(?===ANALYSIS_END===|$)/s);
-          if (analysisPartial) {
-            setExplanationText(analysisPartial[1].trim());
-          }
-        } else if (currentPhase === 'code') {
-          const codePartial = buffer.match(/===CODE_START===(.*?)(?===CODE_END===|$)/s);
-          if (codePartial) {
-            setCode(codePartial[1].trim());
+
+        if (event === 'analysis.delta') {
+          sections.analysis += data;
+          setExplanationText(sections.analysis);
+        } else if (event === 'code.delta') {
+          if (currentPhase !== 'code') {
+            currentPhase = 'code';
+            setResponsePhase('generating');
+            setActiveTab('code');
           }
-        } else if (currentPhase === 'summary') {
-          const summaryPartial = buffer.match(/===SUMMARY_START===(.*?)(?===SUMMARY_END===|$)/s);
-          if (summaryPartial) {
-            setSummaryText(summaryPartial[1].trim());
+          sections.code += data;
+          setCode(sections.code);
+        } else if (event === 'summary.delta') {
+          if (currentPhase !== 'summary') {
+            currentPhase = 'summary';
+            setResponsePhase('summary');
           }
+          sections.summary += data;
+          setSummaryText(sections.summary);
         }
-      }
-      
-      // Final parsing to ensure all content is captured
-      const finalAnalysisMatch = buffer.match(/===ANALYSIS_START===(.*?)===ANALYSIS_END===/s);
-      const finalCodeMatch = buffer.match(/===CODE_START===(.*?)===CODE_END===/s);
-      const finalSummaryMatch = buffer.match(/===SUMMARY_START===(.*?)===SUMMARY_END===/s);
-      
-      if (finalAnalysisMatch) setExplanationText(finalAnalysisMatch[1].trim());
-      if (finalCodeMatch) setCode(finalCodeMatch[1].trim());
-      if (finalSummaryMatch) setSummaryText(finalSummaryMatch[1].trim());
+      });
+
+      setExplanationText(sections.analysis.trim());
+      setCode(sections.code.trim());
+      setSummaryText(sections.summary.trim());
       
     } catch (err) {
       setError(err.message || 'Failed to generate code');
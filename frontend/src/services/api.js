@@ -121,6 +121,40 @@ export const generateCode = async (options) => {
   }
 };
 
+// Parse a text/event-stream body, calling onEvent({ event, data, id }) per frame
+export const readEventStream = async (stream, onEvent) => {
+  const reader = stream.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let id = null;
+      const data = [];
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) {
+          event = line.slice(6).trim();
+        } else if (line.startsWith('id:')) {
+          id = line.slice(3).trim();
+        } else if (line.startsWith('data:')) {
+          data.push(line.startsWith('data: ') ? line.slice(6) : line.slice(5));
+        }
+      }
+      onEvent({ event, data: data.join('\n'), id });
+    }
+  }
+};
+
 // Image upload and analysis functions
 export const analyzeImage = async (imageFile) => {
   try {
@@ -151,6 +185,43 @@ export const analyzeImage = async (imageFile) => {
   }
 };
 
+// Analyze several screenshots (or zip archives of them) in one request.
+// Returns an SSE stream for readEventStream: "image.analysis" / "image.error"
+// per screenshot as it completes, then "brief" (with merge or generate),
+// then either the generation events (with generate) or "done".
+export const analyzeImages = async (files, { merge = false, generate = false } = {}) => {
+  try {
+    const token = localStorage.getItem('access_token');
+    const formData = new FormData();
+    for (const file of files) {
+      formData.append('files', file);
+    }
+    formData.append('merge', merge);
+    formData.append('generate', generate);
+
+    const headers = {};
+    if (token) {
+      headers['Authorization'] = `Bearer ${token}`;
+    }
+
+    const response = await fetch(`${API_URL}/analyze-images`, {
+      method: 'POST',
+      headers,
+      body: formData,
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json();
+      throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+    }
+
+    return response.body;
+  } catch (error) {
+    console.error('Batch Image Analysis Error:', error);
+    throw error;
+  }
+};
+
 export const generateCodeFromImage = async (description) => {
   try {
     const token = localStorage.getItem('access_token');
@@ -182,11 +253,17 @@ export const generateCodeFromImage = async (description) => {
 
 export const generateComponent = async (componentData) => {
   try {
+    const token = localStorage.getItem('access_token');
+    const headers = {
+      'Content-Type': 'application/json',
+    };
+    if (token) {
+      headers['Authorization'] = `Bearer ${token}`;
+    }
+
     const response = await fetch(`${API_URL}/generate-component`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
+      headers,
       body: JSON.stringify(componentData),
     });
 
@@ -0,0 +1,36 @@
+from tests.env import isolate
+
+isolate()
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def app_client():
+    """TestClient over the whole application, with its lifespan (job runner, templates) running."""
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    from backend.services import llm_clients
+
+    # Pools opened by earlier tests belong to their (closed) event loops;
+    # the lifespan would try to close them on its own loop.
+    llm_clients._transports.clear()
+    llm_clients._clients.clear()
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def provider():
+    """A fake OpenAI-compatible provider that every LLM route points at."""
+    from tests.env import route_to
+    from tests.fake_provider import FakeProvider
+
+    with FakeProvider() as fake:
+        route_to(fake.url)
+        yield fake
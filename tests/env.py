@@ -0,0 +1,66 @@
+"""
+Process setup and helpers shared by the tests and the benchmarks.
+
+backend.core.config reads the environment once, at import, so isolate()
+must run before anything under backend is imported.
+"""
+import os
+import tempfile
+from typing import Optional
+
+
+def isolate(directory: Optional[str] = None, **overrides: str) -> str:
+    """Point every database, cache and data file of the backend at a scratch directory."""
+    directory = directory or tempfile.mkdtemp(prefix="webagent-")
+    os.environ.update({
+        "DATABASE_URL": "sqlite:///" + os.path.join(directory, "webagent.db"),
+        "USER_CACHE_GENERATIONS_PATH": os.path.join(directory, "user_cache.gen"),
+        "SCHEDULER_DB_PATH": os.path.join(directory, "scheduler.sqlite3"),
+        "JOBS_DB_PATH": os.path.join(directory, "jobs.sqlite3"),
+        "PROMPT_INDEX_PATH": os.path.join(directory, "prompt_index.sqlite3"),
+        "IMAGE_CACHE_PATH": os.path.join(directory, "image_cache.sqlite3"),
+        "GENERATION_CACHE_DIR": os.path.join(directory, "generation_cache"),
+        "SITES_DIR": os.path.join(directory, "sites"),
+        "LLM_WARMUP_ENABLED": "false",  # no requests to the real providers
+        "METRICS_TOKEN": "test-metrics-token",
+        **overrides,
+    })
+    return directory
+
+
+def route_to(url: str, *more_urls: str) -> None:
+    """
+    Send every LLM call (text and vision) to the given OpenAI-compatible
+    base URLs, in preference order, as providers fake, fake2, ...
+    """
+    from backend.core.config import settings
+    from backend.services import llm_router
+
+    names = [f"fake{i + 1 if i else ''}" for i in range(1 + len(more_urls))]
+    settings.LLM_PROVIDERS = ",".join(f"{name}={u}" for name, u in zip(names, (url, *more_urls)))
+    settings.LLM_ROUTES = ",".join(f"{name}:fake-model" for name in names)
+    settings.LLM_VISION_ROUTES = settings.LLM_ROUTES
+    llm_router.routes.cache_clear()
+    llm_router._stats.clear()
+    llm_router._cooldowns.clear()
+
+
+def register(client, name: str, password: str = "password123", api_key: str = "user-key") -> dict:
+    """Register a user through the API and return Authorization headers for it."""
+    client.post("/api/users/register", json={"name": name, "password": password, "api_key": api_key})
+    token = client.post("/api/users/login", data={"username": name, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def sse_events(text):
+    """(event, data) pairs of a text/event-stream body."""
+    events = []
+    for frame in text.strip().split("\n\n"):
+        event, data = "message", []
+        for line in frame.split("\n"):
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                data.append(line[6:])
+        events.append((event, "\n".join(data)))
+    return events
@@ -0,0 +1,225 @@
+"""
+A local OpenAI-compatible chat completions server for tests and benchmarks.
+
+Each request is answered by a handler that returns a Reply: how long to
+wait before answering, an error status, the content chunks and their
+pacing, and how the stream ends. The server records every request and
+how each stream ended, so tests can check that an upstream stream was
+closed when the client went away.
+"""
+import asyncio
+import json
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class Reply:
+    chunks: List[str] = field(default_factory=list)
+    status: int = 200
+    headers: Dict[str, str] = field(default_factory=dict)
+    delay: float = 0.0  # before the response starts
+    first_delay: float = 0.0  # after the headers, before the first chunk (time to first token)
+    chunk_delay: float = 0.0  # between content chunks
+    finish_reason: Optional[str] = "stop"  # "length" for a truncated output
+    abort: bool = False  # end the stream after the chunks, without finish_reason or [DONE]
+
+
+def text_reply(text: str, size: int = 64, **kwargs) -> Reply:
+    """A Reply streaming text in chunks of size characters."""
+    return Reply(chunks=[text[i:i + size] for i in range(0, len(text), size)] or [""], **kwargs)
+
+
+@dataclass
+class StreamRecord:
+    model: str
+    started: float
+    ended: Optional[float] = None
+    outcome: Optional[str] = None  # "complete", "aborted" or "disconnected"
+    chunks_sent: int = 0
+
+
+def _chunk(model: str, content: Optional[str] = None, finish_reason: Optional[str] = None) -> str:
+    delta = {"content": content} if content is not None else {}
+    body = {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(body)}\n\n"
+
+
+def _usage_chunk(model: str, prompt_tokens: int, completion_tokens: int) -> str:
+    body = {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": model,
+        "choices": [],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+    return f"data: {json.dumps(body)}\n\n"
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count (4 characters per token), used for the fake usage figures."""
+    return (len(text) + 3) // 4
+
+
+class ServerThread:
+    """An ASGI app served by uvicorn on a free 127.0.0.1 port, in a daemon thread."""
+
+    def __init__(self, app, **config):
+        self.app = app
+        self.config = {"log_level": "warning", "lifespan": "off", **config}
+        self.port = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "ServerThread":
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", 0))
+        self.port = self._socket.getsockname()[1]
+        self._server = uvicorn.Server(uvicorn.Config(self.app, **self.config))
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [self._socket]}, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+        self._socket.close()
+
+    def __enter__(self) -> "ServerThread":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class FakeProvider:
+    """
+    An OpenAI-compatible server on 127.0.0.1, run by uvicorn in a thread.
+    Use as a context manager; .url is the base URL for the OpenAI client.
+    """
+
+    def __init__(self, handler: Optional[Callable[[dict], Reply]] = None):
+        self.handler = handler or (lambda body: text_reply("hello"))
+        self.requests: List[dict] = []
+        self.streams: List[StreamRecord] = []
+        self._server: Optional[ServerThread] = None
+        self.app = self._build_app()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/v1/chat/completions")
+        async def chat(request: Request):
+            body = await request.json()
+            self.requests.append(body)
+            reply = self.handler(body)
+            if reply.delay:
+                await asyncio.sleep(reply.delay)
+            if reply.status != 200:
+                return JSONResponse(
+                    {"error": {"message": f"fake error {reply.status}", "type": "fake"}},
+                    status_code=reply.status,
+                    headers=reply.headers,
+                )
+            model = body.get("model", "fake")
+            content = "".join(reply.chunks)
+            if not body.get("stream"):
+                return {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": reply.finish_reason or "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }],
+                    "usage": {
+                        "prompt_tokens": 10,
+                        "completion_tokens": count_tokens(content),
+                        "total_tokens": 10 + count_tokens(content),
+                    },
+                }
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            record = StreamRecord(model=model, started=time.monotonic())
+            self.streams.append(record)
+            return StreamingResponse(self._stream(model, reply, record, include_usage), media_type="text/event-stream")
+
+        return app
+
+    async def _stream(self, model: str, reply: Reply, record: StreamRecord, include_usage: bool):
+        sent = ""
+        try:
+            if reply.first_delay:
+                await asyncio.sleep(reply.first_delay)
+            for i, text in enumerate(reply.chunks):
+                if i and reply.chunk_delay:
+                    await asyncio.sleep(reply.chunk_delay)
+                yield _chunk(model, text)
+                sent += text
+                record.chunks_sent += 1
+            if reply.abort:
+                record.outcome = "aborted"
+                return
+            yield _chunk(model, finish_reason=reply.finish_reason or "stop")
+            if include_usage:
+                yield _usage_chunk(model, 10, count_tokens(sent))
+            yield "data: [DONE]\n\n"
+            record.outcome = "complete"
+        finally:
+            record.ended = time.monotonic()
+            if record.outcome is None:
+                record.outcome = "disconnected"
+
+    def start(self) -> "FakeProvider":
+        self._server = ServerThread(self.app).start()
+        self.port = self._server.port
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.stop()
+
+    def __enter__(self) -> "FakeProvider":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def wait_for(self, predicate: Callable[[], bool], timeout: float = 5.0) -> bool:
+        """Poll predicate until it is true or timeout seconds pass."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.01)
+        return predicate()
@@ -0,0 +1,111 @@
+import asyncio
+import io
+import json
+import uuid
+import pytest
+from PIL import Image
+from backend.core.config import settings
+from backend.services import image_to_website
+from tests.env import register, sse_events
+from tests.fake_provider import text_reply
+
+
+def jpeg(color):
+    buffered = io.BytesIO()
+    Image.new("RGB", (640, 480), color).save(buffered, format="JPEG")
+    return buffered.getvalue()
+
+
+def analyze(app_client, headers, files):
+    response = app_client.post(
+        "/api/analyze-images",
+        files=[("files", (name, data, "image/jpeg")) for name, data in files],
+        headers=headers,
+    )
+    assert response.status_code == 200
+    return [(event, json.loads(data)) for event, data in sse_events(response.text)]
+
+
+def test_bad_upload_fails_alone(app_client, provider, monkeypatch):
+    monkeypatch.setattr(image_to_website, "api_key", "server-key")
+    provider.handler = lambda body: text_reply("A landing page.")
+    headers = register(app_client, "batcher")
+    good = jpeg("orange")
+    truncated = jpeg("teal")[:300]
+
+    events = analyze(app_client, headers, [("good.jpg", good), ("truncated.jpg", truncated)])
+
+    results = {data["filename"]: (event, data) for event, data in events if event.startswith("image.")}
+    assert results["good.jpg"][0] == "image.analysis"
+    assert results["good.jpg"][1]["description"] == "A landing page."
+    assert results["truncated.jpg"][0] == "image.error"
+    assert events[-1] == ("done", {"analyzed": 1, "failed": 1})
+
+
+def test_decoder_errors_are_reported_per_upload(app_client, provider, monkeypatch):
+    monkeypatch.setattr(image_to_website, "api_key", "server-key")
+    provider.handler = lambda body: text_reply("A landing page.")
+    prepare = image_to_website.prepare_image
+
+    def failing(data, *args):
+        if data.startswith(b"BOMB"):
+            raise Image.DecompressionBombError("too many pixels")
+        if data.startswith(b"DISK"):
+            raise OSError("decoder error -2")
+        return prepare(data, *args)
+
+    monkeypatch.setattr(image_to_website, "prepare_image", failing)
+    headers = register(app_client, "batcher2")
+
+    events = analyze(app_client, headers, [("a.jpg", jpeg("red")), ("b.jpg", b"BOMB"), ("c.jpg", b"DISK")])
+
+    kinds = {data["filename"]: event for event, data in events if event.startswith("image.")}
+    assert kinds == {"a.jpg": "image.analysis", "b.jpg": "image.error", "c.jpg": "image.error"}
+
+
+def test_single_upload_decoder_errors_are_bad_requests(app_client, monkeypatch):
+    from backend.routes import image_to_website as route
+
+    def failing(data, *args):
+        if data.startswith(b"BOMB"):
+            raise Image.DecompressionBombError("too many pixels")
+        raise OSError("decoder error -2")
+
+    monkeypatch.setattr(route, "prepare_image", failing)
+    headers = register(app_client, "single-uploader")
+
+    for data in (b"BOMB", b"DISK"):
+        response = app_client.post(
+            "/api/analyze-image", files={"file": ("a.jpg", data, "image/jpeg")}, headers=headers
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid image file or unsupported format"
+
+
+@pytest.mark.anyio
+async def test_closing_a_batch_waits_for_cancelled_uploads(monkeypatch):
+    from backend.schemas.user import CurrentUser
+
+    started, unwound = [], []
+
+    async def describe(image, user_id):
+        started.append(image)
+        if len(started) == 1:
+            while len(started) < 3:  # the other uploads are being described too
+                await asyncio.sleep(0.01)
+            return "A landing page.", None
+        try:
+            await asyncio.sleep(60)
+        finally:
+            await asyncio.sleep(0.01)  # cleanup that itself awaits, like closing a stream
+            unwound.append("cancelled")
+
+    monkeypatch.setattr(image_to_website, "describe_image", describe)
+    user = CurrentUser(id=uuid.uuid4(), name="closer", api_key="key")
+    batch = image_to_website.analyze_images([(f"{n}.jpg", jpeg("red")) for n in range(3)], user)
+
+    assert (await batch.__anext__())["description"] == "A landing page."
+    await batch.aclose()
+
+    assert unwound == ["cancelled", "cancelled"]
+    assert image_to_website._user_slot(user.id)._value == settings.IMAGE_BATCH_CONCURRENCY
@@ -0,0 +1,31 @@
+import pytest
+from backend.services.context_slicer import index_fragments, slice_context
+
+
+def page(newline: str, filler: str = "") -> str:
+    sections = "".join(
+        f'<section id="s{i}">{newline}<h2>Section {i}{filler}</h2>{newline}'
+        f"<p>Text {filler}of section {i}.</p>{newline}</section>{newline}"
+        for i in range(30)
+    )
+    return f"<!DOCTYPE html>{newline}<html>{newline}<body>{newline}{sections}</body>{newline}</html>{newline}"
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+@pytest.mark.parametrize("filler", ["", "\u2028", "\f", "\x85", "\x1c"])
+def test_fragment_spans_match_the_markup(newline, filler):
+    html = page(newline, filler)
+    fragments = index_fragments(html, max_size=200)
+    assert [f.attrs for f in fragments] == [f' id="s{i}"' for i in range(30)]
+    for fragment in fragments:
+        text = html[fragment.start:fragment.end]
+        assert text.startswith("<section") and text.endswith("</section>")
+
+
+def test_slice_keeps_the_relevant_fragment_verbatim():
+    html = page("\n", " " * 200).replace("section 17.", "section 17. Opening hours and prices.")
+    context, spans = slice_context(html, "change the opening hours", budget=300)
+    start, end = spans[0]
+    assert "Opening hours and prices." in html[start:end]
+    assert html[start:end] in context
+    assert len(context) < len(html)
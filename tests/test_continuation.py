@@ -0,0 +1,122 @@
+import random
+import pytest
+from backend.core.config import settings
+from backend.services import llm_router
+from backend.services.continuation import CONTINUE_PROMPT, complete_document
+from tests.fake_provider import text_reply
+
+DOC = (
+    "===ANALYSIS_START===\nA long page.\n===ANALYSIS_END===\n===CODE_START===\n<!DOCTYPE html>\n<html>\n<body>\n"
+    + "".join(f'<p class="row">Row {i} of a long generated page.</p>\n' for i in range(200))
+    + "</body>\n</html>\n===CODE_END===\n===SUMMARY_START===\nRows.\n===SUMMARY_END===\n"
+)
+MARKERS = ["===ANALYSIS_END===", "===CODE_START===", "===CODE_END===", "===SUMMARY_START==="]
+LIMIT = 2500  # characters per response, like a max_tokens cut
+REPEAT = 300  # characters a continuation repeats before carrying on
+LONGEST_LINE = max(map(len, DOC.split("\n"))) + 1
+
+
+def truncating(doc: str = DOC, limit: int = LIMIT, repeat: int = REPEAT, cuts=(), sent=None):
+    """
+    Provider handler that cuts every response with finish_reason "length"
+    at the first of the given document offsets past where the previous
+    response stopped, and after limit characters at the latest. A
+    continuation restarts repeat characters before the end of the tail it
+    was given. Each response is appended to sent, as (characters
+    requested, start, end).
+    """
+    stopped = 0
+
+    def handler(body):
+        nonlocal stopped
+        messages = body["messages"]
+        start = 0
+        if messages[-1]["content"] == CONTINUE_PROMPT:
+            tail = messages[-2]["content"]
+            start = max(0, doc.index(tail) + len(tail) - repeat)
+        end = stopped = min([c for c in cuts if c > stopped] + [start + limit, len(doc)])
+        if sent is not None:
+            sent.append((sum(len(m["content"]) for m in messages), start, end))
+        return text_reply(doc[start:end], size=97, finish_reason="length" if end < len(doc) else "stop")
+
+    return handler
+
+
+def random_cuts(seed: int) -> list:
+    """
+    A few cut offsets spread over DOC, one in the middle of a section
+    marker, and one shortly after another cut, so that the continuation
+    after it is cut while still close to its repeated overlap.
+    """
+    rng = random.Random(seed)
+    cuts = [rng.randrange(REPEAT + 1, len(DOC)) for _ in range(rng.randint(2, 4))]
+    marker = rng.choice(MARKERS)
+    cuts.append(DOC.index(marker) + rng.randint(1, len(marker) - 1))
+    cuts.append(cuts[0] + rng.randint(1, REPEAT))
+    return sorted(cuts)
+
+
+async def generate() -> str:
+    async def open_completion(messages, max_tokens, outcome=None):
+        return await llm_router.open_stream(settings.LLM_ROUTES, "user-key", messages, 0.2, max_tokens, outcome)
+
+    deltas = await complete_document(open_completion, [{"role": "user", "content": "a long page"}], 1000)
+    text, errors = "", []
+    async for event, data in deltas:
+        if event is None:
+            text += data
+        elif event == "error":
+            errors.append(data)
+    assert not errors
+    return text
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("seed", range(8))
+async def test_truncated_output_is_continued_without_repeated_text(provider, monkeypatch, seed):
+    monkeypatch.setattr(settings, "GENERATION_MAX_CONTINUATIONS", 20)
+    cuts, sent = random_cuts(seed), []
+    provider.handler = truncating(cuts=cuts, sent=sent)
+
+    assert await generate() == DOC
+    ends = [end for _, _, end in sent]
+    assert any(DOC.index(m) < end < DOC.index(m) + len(m) for m in MARKERS for end in ends if end in cuts)
+
+    # Each continuation costs its prompt plus the tail, and re-sends at
+    # most the repeated overlap and the line that was cut; regenerating
+    # from scratch would send the whole document again instead.
+    first_request = sent[0][0]
+    continuation_request = first_request + settings.GENERATION_CONTINUATION_TAIL_CHARS + len(CONTINUE_PROMPT)
+    assert all(requested <= continuation_request for requested, _, _ in sent[1:])
+    received = sum(end - start for _, start, end in sent)
+    continuations = len(sent) - 1
+    assert received - len(DOC) <= continuations * (REPEAT + LONGEST_LINE)
+    assert received - len(DOC) < len(DOC) / 2
+
+
+@pytest.mark.anyio
+async def test_continuation_without_overlap_is_spliced_in_place(provider, monkeypatch):
+    monkeypatch.setattr(settings, "GENERATION_MAX_CONTINUATIONS", 10)
+    provider.handler = truncating(repeat=0)
+
+    assert await generate() == DOC
+
+
+@pytest.mark.anyio
+async def test_continuations_stop_at_the_limit(provider, monkeypatch):
+    monkeypatch.setattr(settings, "GENERATION_MAX_CONTINUATIONS", 2)
+    provider.handler = truncating()
+
+    text = await generate()
+
+    assert len(provider.requests) == 3
+    assert DOC.startswith(text)
+    assert "===CODE_END===" not in text
+
+
+@pytest.mark.anyio
+async def test_complete_output_is_not_continued(provider):
+    provider.handler = lambda body: text_reply(DOC, size=97)
+
+    assert await generate() == DOC
+    assert len(provider.requests) == 1
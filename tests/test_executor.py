@@ -0,0 +1,13 @@
+import pytest
+from backend.core.executor import CpuPool
+
+
+@pytest.mark.anyio
+async def test_pool_runs_again_after_shutdown():
+    pool = CpuPool("restart-test", 1)
+    assert await pool.run(sum, [1, 2]) == 3
+
+    pool.shutdown()  # app shutdown; the next lifespan reuses the module-level pool
+
+    assert await pool.run(sum, [3, 4]) == 7
+    pool.shutdown()
@@ -0,0 +1,49 @@
+from backend.core import metrics
+from backend.services.website_generator import MAX_TOKENS
+from tests.env import register, sse_events
+from tests.fake_provider import text_reply
+
+PAGE = (
+    "===ANALYSIS_START===\nA bakery.\n===ANALYSIS_END===\n===CODE_START===\n"
+    "<!DOCTYPE html><html><body><h1>Bakery</h1></body></html>\n===CODE_END===\n"
+    "===SUMMARY_START===\nA one-section page.\n===SUMMARY_END===\n"
+)
+
+
+def test_generate_streams_the_upstream_completion(app_client, provider):
+    provider.handler = lambda body: text_reply(PAGE, size=7, chunk_delay=0.001)
+    headers = register(app_client, "streamer")
+
+    response = app_client.post("/api/generate", json={"prompt": "a bakery"}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = sse_events(response.text)
+    code = "".join(data for event, data in events if event == "code.delta")
+    assert "<h1>Bakery</h1>" in code
+    assert any(event == "done" for event, _ in events)
+    assert provider.streams[0].outcome == "complete"
+
+
+def test_client_disconnect_closes_the_upstream_stream(provider):
+    import httpx
+    from backend.main import app
+    from tests.fake_provider import ServerThread
+
+    provider.handler = lambda body: text_reply(PAGE * 50, size=16, chunk_delay=0.02)
+    saved = metrics.snapshot().get("generation.tokens_saved_estimate", 0)
+    with ServerThread(app, lifespan="on") as server:
+        with httpx.Client(base_url=server.base_url, timeout=30) as client:
+            headers = register(client, "leaver")
+            with client.stream("POST", "/api/generate", json={"prompt": "a long bakery"}, headers=headers) as response:
+                assert response.status_code == 200
+                next(response.iter_raw())
+            # leaving the block closes the connection mid-stream
+
+        assert provider.wait_for(lambda: provider.streams and provider.streams[0].outcome is not None)
+    stream = provider.streams[0]
+    assert stream.outcome == "disconnected"
+    assert stream.chunks_sent < len(PAGE * 50) // 16
+    # MAX_TOKENS of budget, less the few chunks produced before the disconnect
+    assert provider.wait_for(lambda: metrics.snapshot().get("generation.tokens_saved_estimate", 0) > saved)
+    assert metrics.snapshot()["generation.tokens_saved_estimate"] - saved > MAX_TOKENS - len(PAGE * 50) // 4
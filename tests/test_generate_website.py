@@ -0,0 +1,27 @@
+import pytest
+from backend.services import scheduler
+from tests.env import register, sse_events
+from tests.fake_provider import text_reply
+
+PAGE = "===CODE_START===\n<!DOCTYPE html><html><body>Hi</body></html>\n===CODE_END===\n"
+
+
+@pytest.mark.parametrize("description", ["", "   ", "Error analyzing image: timeout"])
+def test_invalid_description_is_rejected_without_a_lease(app_client, description):
+    headers = register(app_client, "describer")
+
+    response = app_client.post("/api/generate-website", json={"description": description}, headers=headers)
+
+    assert response.status_code == 400
+    assert scheduler.get_scheduler().store.counts() == (0, 0)
+
+
+def test_valid_description_streams_and_releases_its_lease(app_client, provider):
+    provider.handler = lambda body: text_reply(PAGE)
+    headers = register(app_client, "describer2")
+
+    response = app_client.post("/api/generate-website", json={"description": "A bakery site"}, headers=headers)
+
+    assert response.status_code == 200
+    assert "Hi" in "".join(data for event, data in sse_events(response.text) if event == "code.delta")
+    assert scheduler.get_scheduler().store.counts() == (0, 0)
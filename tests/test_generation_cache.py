@@ -0,0 +1,85 @@
+import asyncio
+import os
+import pytest
+from backend.services import generation_cache
+from backend.services.generation_cache import GenerationCache, cached_stream
+
+DONE = ("done", '{"code_complete": true}')
+
+
+@pytest.mark.anyio
+async def test_evicted_entries_are_spilled_and_promoted_back(tmp_path):
+    cache = GenerationCache(max_bytes=100, ttl=60, directory=str(tmp_path))
+    first = [("code.delta", "a" * 80), DONE]
+    await cache.put("first", first)
+    await cache.put("second", [("code.delta", "b" * 80), DONE])
+
+    assert cache.lookup("first") is None
+    assert os.path.exists(tmp_path / "first.json.z")
+    assert await cache.get("first") == first
+    assert cache.lookup("first") == first
+    assert os.path.exists(tmp_path / "second.json.z")
+
+
+@pytest.mark.anyio
+async def test_disk_is_pruned_to_its_budget(tmp_path):
+    cache = GenerationCache(max_bytes=100, ttl=60, directory=str(tmp_path), disk_max_bytes=1)
+    for i in range(5):
+        await cache.put(f"entry{i}", [("code.delta", os.urandom(40).hex()), DONE])
+    assert len(os.listdir(tmp_path)) <= 1
+
+
+@pytest.mark.anyio
+async def test_identical_requests_share_one_upstream_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(generation_cache, "cache", GenerationCache(10_000, 60, str(tmp_path)))
+    opened = 0
+    release = asyncio.Event()
+
+    async def upstream():
+        await release.wait()
+        yield ("code.delta", "<html></html>")
+        yield DONE
+
+    async def open_stream():
+        nonlocal opened
+        opened += 1
+        return upstream()
+
+    async def collect():
+        return [event async for event in cached_stream("key", open_stream)]
+
+    readers = [asyncio.ensure_future(collect()) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    release.set()
+    results = await asyncio.gather(*readers)
+
+    assert opened == 1
+    assert results == [[("code.delta", "<html></html>"), DONE]] * 3
+    assert await collect() == results[0]
+    assert opened == 1
+
+
+@pytest.mark.anyio
+async def test_a_request_after_the_last_reader_left_starts_a_new_generation(tmp_path, monkeypatch):
+    monkeypatch.setattr(generation_cache, "cache", GenerationCache(10_000, 60, str(tmp_path)))
+    opened = 0
+
+    async def upstream():
+        yield ("code.delta", "<html>")
+        await asyncio.sleep(0.05)
+        yield ("code.delta", "</html>")
+        yield DONE
+
+    async def open_stream():
+        nonlocal opened
+        opened += 1
+        return upstream()
+
+    leaver = cached_stream("key", open_stream)
+    assert await leaver.__anext__() == ("code.delta", "<html>")
+    await leaver.aclose()  # cancels the upstream task; it has not finished unwinding yet
+
+    events = [event async for event in cached_stream("key", open_stream)]
+
+    assert opened == 2
+    assert events == [("code.delta", "<html>"), ("code.delta", "</html>"), DONE]
@@ -0,0 +1,33 @@
+import backend.main  # noqa: F401  (creates the tables)
+from backend.db.models import HtmlBlob
+from backend.db.session import SessionLocal
+from backend.services.html_store import get_html, put_html
+
+PAGE = "<!DOCTYPE html>\n<html>\n<body>\n" + "".join(f"<p>line {i}</p>\n" for i in range(200)) + "</body>\n</html>\n"
+
+
+def test_versions_round_trip_through_deltas():
+    edited = PAGE.replace("<p>line 7</p>", "<p>line seven</p>")
+    with SessionLocal() as db:
+        base = put_html(db, PAGE)
+        digest = put_html(db, edited, base)
+        db.commit()
+        assert db.get(HtmlBlob, digest).kind == "delta"
+        assert get_html(db, digest) == edited
+        assert get_html(db, base) == PAGE
+
+
+def test_concurrent_store_of_the_same_html(monkeypatch):
+    html = PAGE + "<!-- raced -->\n"
+    with SessionLocal() as first, SessionLocal() as second:
+        # first checked for the blob before second committed it
+        monkeypatch.setattr(first, "get", lambda *args, **kwargs: None)
+        digest = put_html(second, html)
+        second.commit()
+
+        assert put_html(first, html) == digest
+        first.commit()
+
+    with SessionLocal() as db:
+        assert db.query(HtmlBlob).filter(HtmlBlob.hash == digest).count() == 1
+        assert get_html(db, digest) == html
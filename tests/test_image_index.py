@@ -0,0 +1,49 @@
+import sqlite3
+from PIL import Image, ImageDraw
+from backend.services.image_index import ImageIndex, perceptual_hashes
+
+
+def screenshot(shift=0):
+    image = Image.new("RGB", (640, 400), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 640, 60), fill="navy")
+    draw.rectangle((40 + shift, 100, 300 + shift, 360), fill="orange")
+    draw.ellipse((380, 120, 600, 340), fill="teal")
+    return image
+
+
+def test_near_duplicate_matches_only_for_its_owner():
+    index = ImageIndex(None, max_distance=6, max_entries=100)
+    index.add(perceptual_hashes(screenshot()), "alice's dashboard", "alice")
+
+    near = perceptual_hashes(screenshot(shift=2))
+    description, distance = index.lookup(near, "alice")
+    assert description == "alice's dashboard" and distance <= 6
+    assert index.lookup(near, "bob") is None
+
+
+def test_owners_are_kept_across_restarts(tmp_path):
+    path = str(tmp_path / "images.sqlite3")
+    hashes = perceptual_hashes(screenshot())
+    ImageIndex(path, 6, 100).add(hashes, "alice's dashboard", 1)
+
+    reloaded = ImageIndex(path, 6, 100)
+    assert reloaded.lookup(hashes, 1) == ("alice's dashboard", 0)
+    assert reloaded.lookup(hashes, 2) is None
+
+
+def test_unowned_entries_from_older_versions_are_dropped(tmp_path):
+    path = str(tmp_path / "images.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE image_analyses (id INTEGER PRIMARY KEY, phash INTEGER NOT NULL, "
+        "dhash INTEGER NOT NULL, description TEXT NOT NULL, last_used REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO image_analyses VALUES (1, 5, 5, 'someone else', 0)")
+    conn.commit()
+    conn.close()
+
+    index = ImageIndex(path, 6, 100)
+    assert len(index) == 0
+    index.add(perceptual_hashes(screenshot()), "mine", "alice")
+    assert len(ImageIndex(path, 6, 100)) == 1
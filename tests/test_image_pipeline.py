@@ -0,0 +1,41 @@
+import io
+import pytest
+from PIL import Image
+from backend.core.config import settings
+from backend.services.image_pipeline import InvalidImage, estimate_vision_tokens, prepare_image
+
+
+def encoded(width, height, fmt="JPEG", mode="RGB"):
+    buffered = io.BytesIO()
+    Image.new(mode, (width, height), "white").save(buffered, format=fmt)
+    return buffered.getvalue()
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+def test_truncated_image_is_invalid(fmt):
+    data = encoded(800, 600, fmt)
+    with pytest.raises(InvalidImage):
+        prepare_image(data[: len(data) // 2])
+
+
+def test_garbage_is_invalid():
+    with pytest.raises(InvalidImage):
+        prepare_image(b"not an image at all")
+
+
+def test_large_image_is_fitted_and_encoded_once(monkeypatch):
+    monkeypatch.setattr(settings, "IMAGE_PREPROCESS", True)
+    prepared = prepare_image(encoded(4000, 3000), max_dimension=1024)
+    assert (prepared.original_width, prepared.original_height) == (4000, 3000)
+    assert max(max(tile.width, tile.height) for tile in prepared.tiles) <= 1024
+    assert prepared.vision_tokens < estimate_vision_tokens(4000, 3000)
+    assert prepared.fingerprint is not None
+
+
+def test_tall_screenshot_is_split_into_tiles(monkeypatch):
+    monkeypatch.setattr(settings, "IMAGE_PREPROCESS", True)
+    monkeypatch.setattr(settings, "IMAGE_MAX_TILES", 4)
+    prepared = prepare_image(encoded(1000, 6000, "PNG", "RGBA"), max_dimension=1000)
+    assert len(prepared.tiles) > 1
+    assert sum(tile.height for tile in prepared.tiles) == 4000
+    assert all(tile.width == 667 for tile in prepared.tiles)  # scaled so 4 tiles hold the height
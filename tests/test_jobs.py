@@ -0,0 +1,128 @@
+import json
+import time
+import pytest
+from backend.core.config import settings
+from backend.services.jobs import FAILED, RUNNING, JobStore
+from tests.env import register, sse_events
+from tests.fake_provider import text_reply
+
+PAGE = (
+    "===ANALYSIS_START===\nA bakery.\n===ANALYSIS_END===\n===CODE_START===\n"
+    "<!DOCTYPE html><html><body><h1>Bakery</h1></body></html>\n===CODE_END===\n"
+    "===SUMMARY_START===\nA one-section page.\n===SUMMARY_END===\n"
+)
+
+
+def submit(client, headers, prompt: str) -> str:
+    response = client.post("/api/jobs", json={"kind": "generate", "prompt": prompt}, headers=headers)
+    assert response.status_code == 202
+    return response.json()["id"]
+
+
+def wait_until(client, headers, job_id: str, statuses, timeout: float = 10) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/api/jobs/{job_id}", headers=headers).json()
+        if job["status"] in statuses or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def frames(text: str):
+    """(id, event, data) of every frame of a job stream."""
+    parsed = []
+    for frame in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.split("\n") if line.startswith(("id: ", "event: ")))
+        [(event, data)] = sse_events(frame)
+        parsed.append((fields.get("id"), event, data))
+    return parsed
+
+
+def test_job_runs_to_completion_and_streams_its_log(app_client, provider):
+    provider.handler = lambda body: text_reply(PAGE, size=7)
+    headers = register(app_client, "job-runner")
+
+    job_id = submit(app_client, headers, "a bakery job")
+    response = app_client.get(f"/api/jobs/{job_id}/stream", headers=headers)
+
+    log = frames(response.text)
+    code = "".join(data for _, event, data in log if event == "code.delta")
+    assert "<h1>Bakery</h1>" in code
+    assert [int(seq) for seq, _, _ in log[:-1]] == list(range(1, len(log)))
+    assert log[-1][1] == "job" and json.loads(log[-1][2])["status"] == "succeeded"
+    assert app_client.get("/api/jobs", headers=headers).json()[0]["id"] == job_id
+
+
+def test_stream_resumes_after_a_sequence_number(app_client, provider):
+    provider.handler = lambda body: text_reply(PAGE, size=7)
+    headers = register(app_client, "job-resumer")
+    job_id = submit(app_client, headers, "a resumable bakery job")
+    full = frames(app_client.get(f"/api/jobs/{job_id}/stream", headers=headers).text)[:-1]
+    middle = len(full) // 2
+
+    by_query = frames(app_client.get(f"/api/jobs/{job_id}/stream?after={middle}", headers=headers).text)[:-1]
+    by_header = frames(app_client.get(
+        f"/api/jobs/{job_id}/stream", headers={**headers, "Last-Event-ID": str(middle)}
+    ).text)[:-1]
+
+    assert by_query == by_header == full[middle:]
+
+
+def test_cancel_stops_a_running_job_and_its_upstream_stream(app_client, provider):
+    provider.handler = lambda body: text_reply(PAGE * 50, size=16, chunk_delay=0.02)
+    headers = register(app_client, "job-canceller")
+    job_id = submit(app_client, headers, "a long bakery job")
+    assert wait_until(app_client, headers, job_id, (RUNNING,))["status"] == RUNNING
+    assert provider.wait_for(lambda: provider.streams)
+
+    response = app_client.post(f"/api/jobs/{job_id}/cancel", headers=headers)
+
+    assert response.json()["status"] == "cancelled"
+    assert provider.wait_for(lambda: provider.streams[0].outcome is not None)
+    assert provider.streams[0].outcome == "disconnected"
+    assert wait_until(app_client, headers, job_id, ("succeeded", "failed"), timeout=0.5)["status"] == "cancelled"
+
+
+def test_truncated_generation_fails_the_job(app_client, provider, monkeypatch):
+    monkeypatch.setattr(settings, "GENERATION_MAX_CONTINUATIONS", 0)
+    provider.handler = lambda body: text_reply(PAGE[:PAGE.index("</body>")], finish_reason="length")
+    headers = register(app_client, "job-truncated")
+
+    job_id = submit(app_client, headers, "a truncated bakery job")
+    log = frames(app_client.get(f"/api/jobs/{job_id}/stream", headers=headers).text)
+
+    done = [json.loads(data) for _, event, data in log if event == "done"]
+    assert done and done[-1]["code_complete"] is False
+    job = app_client.get(f"/api/jobs/{job_id}", headers=headers).json()
+    assert job["status"] == FAILED and job["error"].startswith("Incomplete")
+
+
+def test_other_users_cannot_see_a_job(app_client, provider):
+    owner = register(app_client, "job-owner")
+    other = register(app_client, "job-stranger")
+    job_id = submit(app_client, owner, "a private bakery job")
+
+    assert app_client.get(f"/api/jobs/{job_id}", headers=other).status_code == 404
+    assert app_client.get(f"/api/jobs/{job_id}/stream", headers=other).status_code == 404
+    assert app_client.post(f"/api/jobs/{job_id}/cancel", headers=other).status_code == 404
+
+
+def test_jobs_of_a_dead_worker_are_failed(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job = store.create("user", "generate", {"prompt": "a bakery"})
+    assert store.claim(job["id"])
+    store._execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - 120, job["id"]))
+
+    assert store.fail_stale(60) == 1
+    job = store.get(job["id"])
+    assert job["status"] == FAILED and job["error"].startswith("Interrupted")
+
+
+@pytest.mark.parametrize("header", ["abc", "1.5"])
+def test_invalid_last_event_id_is_rejected(app_client, provider, header):
+    headers = register(app_client, "job-bad-header")
+    job_id = submit(app_client, headers, "a bakery job with a bad header")
+
+    response = app_client.get(f"/api/jobs/{job_id}/stream", headers={**headers, "Last-Event-ID": header})
+
+    assert response.status_code == 400
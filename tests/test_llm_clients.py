@@ -0,0 +1,54 @@
+import pytest
+from backend.core.config import settings
+from backend.services import llm_clients
+from backend.services.llm_clients import NVIDIA_BASE_URL, OPENROUTER_BASE_URL, get_client
+
+
+@pytest.fixture
+async def registry():
+    """An empty client registry, closed again on the test's own event loop."""
+    llm_clients._transports.clear()
+    llm_clients._clients.clear()
+    yield
+    await llm_clients.close_all()
+
+
+@pytest.mark.anyio
+async def test_keys_of_one_host_share_its_transport(registry):
+    alice = get_client(NVIDIA_BASE_URL, "alice-key")
+    bob = get_client(NVIDIA_BASE_URL, "bob-key")
+    server = get_client(OPENROUTER_BASE_URL, "server-key")
+
+    assert alice is not bob
+    assert alice.api_key == "alice-key" and bob.api_key == "bob-key"
+    assert alice._client is bob._client is llm_clients._transports[NVIDIA_BASE_URL]
+    assert server._client is llm_clients._transports[OPENROUTER_BASE_URL] is not alice._client
+    assert len(llm_clients._transports) == 2
+
+
+@pytest.mark.anyio
+async def test_clients_are_reused_per_key(registry):
+    first = get_client(NVIDIA_BASE_URL, "alice-key")
+
+    assert get_client(NVIDIA_BASE_URL, "alice-key") is first
+    assert get_client(OPENROUTER_BASE_URL, "alice-key") is not first
+
+
+@pytest.mark.anyio
+async def test_evicted_clients_leave_the_transport_open(registry, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CLIENT_CACHE_SIZE", 2)
+    first = get_client(NVIDIA_BASE_URL, "key-1")
+    get_client(NVIDIA_BASE_URL, "key-2")
+    get_client(NVIDIA_BASE_URL, "key-1")  # now the most recently used
+    get_client(NVIDIA_BASE_URL, "key-3")
+
+    assert list(llm_clients._clients) == [(NVIDIA_BASE_URL, "key-1"), (NVIDIA_BASE_URL, "key-3")]
+    assert get_client(NVIDIA_BASE_URL, "key-1") is first
+    assert get_client(NVIDIA_BASE_URL, "key-2")._client is first._client
+    assert not first._client.is_closed
+
+
+def test_tests_do_not_warm_the_real_providers(app_client):
+    assert not settings.LLM_WARMUP_ENABLED
+    assert NVIDIA_BASE_URL not in llm_clients._transports
+    assert OPENROUTER_BASE_URL not in llm_clients._transports
@@ -0,0 +1,105 @@
+import openai
+import pytest
+from backend.core import metrics
+from backend.core.config import settings
+from backend.services import llm_router
+from tests.env import route_to
+from tests.fake_provider import FakeProvider, Reply, text_reply
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Two fake providers, routed as fake (preferred) and fake2, with a short hedge deadline."""
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_DEFAULT_DELAY", 0.2)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY", 0.1)
+    with FakeProvider() as first, FakeProvider() as second:
+        route_to(first.url, second.url)
+        yield first, second
+
+
+async def stream_text(**kwargs):
+    deltas = await llm_router.open_stream(settings.LLM_ROUTES, "user-key", MESSAGES, 0.2, 100, **kwargs)
+    return "".join([data async for event, data in deltas if event is None])
+
+
+def test_default_text_routes_bill_only_the_user():
+    from backend.core.config import Settings
+
+    assert all(route.api_key is None for route in llm_router.routes(Settings.LLM_ROUTES))
+
+
+@pytest.mark.anyio
+async def test_hedge_wins_and_the_losing_stream_is_cancelled(providers):
+    slow, fast = providers
+    slow.handler = lambda body: text_reply("from the slow route", first_delay=5)
+    fast.handler = lambda body: text_reply("from the fast route")
+    cancelled = metrics.snapshot().get("llm.router.cancelled", 0)
+
+    assert await stream_text() == "from the fast route"
+
+    assert slow.wait_for(lambda: slow.streams and slow.streams[0].outcome is not None)
+    assert slow.streams[0].outcome == "disconnected"
+    assert slow.streams[0].chunks_sent == 0
+    assert metrics.snapshot()["llm.router.cancelled"] == cancelled + 1
+
+
+@pytest.mark.anyio
+async def test_no_hedge_when_the_first_route_answers_in_time(providers):
+    first, second = providers
+
+    assert await stream_text() == "hello"
+
+    assert len(first.requests) == 1 and not second.requests
+
+
+@pytest.mark.anyio
+async def test_server_error_fails_over_and_cools_the_route_down(providers):
+    failing, healthy = providers
+    failing.handler = lambda body: Reply(status=503, headers={"retry-after": "120"})
+    healthy.handler = lambda body: text_reply("from the healthy route")
+
+    assert await stream_text() == "from the healthy route"
+
+    route = llm_router.routes(settings.LLM_ROUTES)[0]
+    assert route.provider == "fake"
+    assert llm_router.cooldown_until(route) > 0
+    # The cooling route now goes last
+    assert await stream_text() == "from the healthy route"
+    assert len(failing.requests) == 1
+
+
+@pytest.mark.anyio
+async def test_client_errors_do_not_fail_over(providers):
+    failing, other = providers
+    failing.handler = lambda body: Reply(status=400)
+
+    with pytest.raises(openai.BadRequestError):
+        await stream_text()
+    assert not other.requests
+
+
+@pytest.mark.anyio
+async def test_complete_fails_over(providers):
+    failing, healthy = providers
+    failing.handler = lambda body: Reply(status=429)
+    healthy.handler = lambda body: text_reply("fine")
+
+    assert await llm_router.complete(settings.LLM_ROUTES, "user-key", MESSAGES, 0.2, 100) == "fine"
+
+
+@pytest.mark.anyio
+async def test_completion_latency_does_not_move_the_stream_hedge_deadline(providers, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", False)
+    first, second = providers
+    first.handler = lambda body: text_reply("plan", delay=0 if body.get("stream") else 0.3)
+
+    await llm_router.complete(settings.LLM_ROUTES, "user-key", MESSAGES, 0.2, 100)
+    await stream_text()
+
+    route = llm_router.routes(settings.LLM_ROUTES)[0]
+    [total] = llm_router.stats(route, llm_router.TOTAL).samples
+    [ttft] = llm_router.stats(route, llm_router.TTFT).samples
+    assert total >= 0.3 > ttft
@@ -0,0 +1,15 @@
+from backend.core.config import settings
+
+
+def test_metrics_require_the_metrics_token(app_client):
+    assert app_client.get("/api/metrics").status_code == 401
+    assert app_client.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    response = app_client.get("/api/metrics", headers={"Authorization": f"Bearer {settings.METRICS_TOKEN}"})
+    assert response.status_code == 200
+    assert "db.pool.checked_out" in response.json()
+
+
+def test_metrics_are_off_without_a_token(app_client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    assert app_client.get("/api/metrics", headers={"Authorization": "Bearer "}).status_code == 404
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import pytest
+from backend.core.config import settings
+from backend.services import scheduler
+from backend.services.parallel_generator import generate_parallel
+from tests.env import register, sse_events
+from tests.fake_provider import text_reply
+
+PLAN = {
+    "title": "Bakery",
+    "analysis": "A bakery site.",
+    "sections": [{"id": f"part{i}", "brief": f"Part {i}"} for i in range(4)],
+}
+
+
+def handler(body):
+    system = body["messages"][0]["content"]
+    if "planning a single-page website" in system:
+        return text_reply(json.dumps(PLAN))
+    section = body["messages"][1]["content"].split('id="')[1].split('"')[0]
+    return text_reply(f'<section id="{section}"><p>{section}</p></section>\n', size=8, chunk_delay=0.05)
+
+
+def most_concurrent(streams) -> int:
+    edges = sorted([(s.started, 1) for s in streams] + [(s.ended, -1) for s in streams])
+    running = peak = 0
+    for _, step in edges:
+        running += step
+        peak = max(peak, running)
+    return peak
+
+
+def generate(app_client, headers, prompt):
+    response = app_client.post("/api/generate", json={"prompt": prompt, "mode": "parallel"}, headers=headers)
+    assert response.status_code == 200
+    code = "".join(data for event, data in sse_events(response.text) if event == "code.delta")
+    positions = [code.index(f'<section id="part{i}">') for i in range(4)]
+    assert positions == sorted(positions)
+
+
+def test_sections_run_on_the_users_free_slots(app_client, provider, monkeypatch):
+    monkeypatch.setattr(settings, "PARALLEL_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "SCHEDULER_USER_SLOTS", 3)
+    provider.handler = handler
+
+    generate(app_client, register(app_client, "sectioned"), "a bakery")
+
+    sections = provider.streams  # the plan is a non-streamed completion
+    assert len(sections) == 4
+    assert most_concurrent(sections) == 3
+    assert scheduler.get_scheduler().store.counts() == (0, 0)
+
+
+def test_sections_run_one_at_a_time_when_the_user_has_no_free_slot(app_client, provider, monkeypatch):
+    monkeypatch.setattr(settings, "PARALLEL_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "SCHEDULER_USER_SLOTS", 2)
+    monkeypatch.setattr(settings, "PARALLEL_SLOT_WAIT", 0.1)
+    provider.handler = handler
+    headers = register(app_client, "busy")
+    user_id = str(app_client.get("/api/users/me", headers=headers).json()["id"])
+    # Another generation of the same user holds the second slot
+    store = scheduler.get_scheduler().store
+    store.enqueue("other-generation", user_id, scheduler.PRIORITY_FULL, None)
+    assert store.try_admit("other-generation", settings.SCHEDULER_GLOBAL_SLOTS, 2, 60)[0]
+    try:
+        generate(app_client, headers, "a busy bakery")
+    finally:
+        store.release("other-generation")
+
+    assert most_concurrent(provider.streams) == 1
+    assert store.counts() == (0, 0)
+
+
+@pytest.mark.anyio
+async def test_nothing_is_streamed_until_the_generation_is_read(provider):
+    provider.handler = handler
+
+    generation = await generate_parallel("a bakery", "user-key", "reader")
+    await asyncio.sleep(0.3)
+    assert len(provider.requests) == 1 and not provider.streams  # just the plan
+
+    await generation.aclose()
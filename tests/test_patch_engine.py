@@ -0,0 +1,104 @@
+import json
+import pytest
+from backend.services.patch_engine import PatchBlock, PatchStreamParser, apply_block, apply_patch_stream, document_as_diff
+from tests.env import register, sse_events
+from tests.fake_provider import text_reply
+
+DOCUMENT = """<!DOCTYPE html>
+<html>
+<body>
+    <h1>Bakery</h1>
+    <p class="lead">Fresh bread   every day.</p>
+</body>
+</html>
+"""
+
+EDIT = """Renaming the heading.
+<<<<<<< SEARCH
+    <h1>Bakery</h1>
+=======
+    <h1>Corner Bakery</h1>
+>>>>>>> REPLACE
+"""
+
+
+def blocks(text, size):
+    parser = PatchStreamParser()
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    items.extend(parser.finish())
+    return items
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(EDIT)])
+def test_parser_finds_blocks_across_chunk_boundaries(size):
+    items = blocks(EDIT, size)
+    assert "".join(item for item in items if isinstance(item, str)) == "Renaming the heading.\n"
+    assert [item for item in items if isinstance(item, PatchBlock)] == [
+        PatchBlock("    <h1>Bakery</h1>\n", "    <h1>Corner Bakery</h1>\n")
+    ]
+
+
+def test_exact_match():
+    patched, strategy = apply_block(DOCUMENT, PatchBlock("<h1>Bakery</h1>", "<h1>Shop</h1>"))
+    assert strategy == "exact"
+    assert "<h1>Shop</h1>" in patched
+
+
+def test_trailing_newline_is_tolerated():
+    patched, strategy = apply_block(DOCUMENT, PatchBlock("</html>\n\n", "</html>\n<!-- end -->\n"))
+    assert strategy == "trimmed"
+    assert patched.endswith("</html>\n<!-- end -->\n")
+
+
+def test_whitespace_tolerant_match():
+    block = PatchBlock('<p class="lead">Fresh bread every day.</p>\n', '    <p class="lead">Baked at dawn.</p>\n')
+    patched, strategy = apply_block(DOCUMENT, block)
+    assert strategy == "whitespace"
+    assert '    <p class="lead">Baked at dawn.</p>\n</body>' in patched
+
+
+def test_unmatched_block_leaves_the_document():
+    patched, strategy = apply_block(DOCUMENT, PatchBlock("<h2>Menu</h2>", "<h2>Prices</h2>"))
+    assert strategy is None
+    assert patched == DOCUMENT
+
+
+async def model(text, size=5):
+    for i in range(0, len(text), size):
+        yield None, text[i:i + size]
+
+
+@pytest.mark.anyio
+async def test_patch_stream_applies_blocks_and_reports_failures():
+    stream = EDIT + "<<<<<<< SEARCH\n<h2>Menu</h2>\n=======\n<h2>Prices</h2>\n>>>>>>> REPLACE\n"
+    events = [event async for event in apply_patch_stream(model(stream), DOCUMENT)]
+    names = [name for name, _ in events]
+    assert names.count("patch.applied") == 1 and names.count("patch.failed") == 1
+    assert dict(events)["document"] == DOCUMENT.replace("Bakery</h1>", "Corner Bakery</h1>")
+    assert json.loads(events[-1][1]) == {"applied": 1, "failed": 1}
+
+
+@pytest.mark.anyio
+async def test_patch_stream_as_diff():
+    events = [event async for event in document_as_diff(apply_patch_stream(model(EDIT), DOCUMENT), DOCUMENT)]
+    diff = dict(events)["diff"]
+    assert "-    <h1>Bakery</h1>\n+    <h1>Corner Bakery</h1>\n" in diff
+    assert "document" not in dict(events)
+
+
+def test_edit_request_is_patched_on_the_server(app_client, provider):
+    provider.handler = lambda body: text_reply(EDIT, size=9)
+    headers = register(app_client, "editor")
+
+    response = app_client.post(
+        "/api/generate",
+        json={"prompt": "rename the bakery", "previous_html": DOCUMENT, "edit_output": "diff"},
+        headers=headers,
+    )
+
+    events = dict(sse_events(response.text))
+    assert "SEARCH/REPLACE" in provider.requests[0]["messages"][0]["content"]
+    assert json.loads(events["patch.applied"]) == {"index": 0, "strategy": "exact"}
+    assert "+    <h1>Corner Bakery</h1>" in events["diff"]
@@ -0,0 +1,73 @@
+import json
+import sqlite3
+from backend.services.prompt_index import PromptIndex
+from tests.env import register, sse_events
+from tests.fake_provider import text_reply
+
+PROMPT = "A bakery in Lisbon with sourdough bread, pastries and online ordering"
+SIMILAR = "Bakery in Lisbon with sourdough bread, pastries, online ordering"
+
+
+def test_lookups_only_match_the_owners_entries():
+    index = PromptIndex(None, max_entries=100)
+    index.add(PROMPT, "hash-a", owner=1)
+
+    assert index.lookup(SIMILAR, 0.6, owner=2) is None
+    match = index.lookup(SIMILAR, 0.6, owner=1)
+    assert match["html_hash"] == "hash-a" and match["similarity"] >= 0.6
+
+
+def test_identical_prompts_of_different_owners_are_kept_apart():
+    index = PromptIndex(None, max_entries=100)
+    index.add(PROMPT, "hash-a", owner=1)
+    index.add(PROMPT, "hash-b", owner=2)
+
+    assert len(index) == 2
+    assert index.lookup(PROMPT, 0.9, owner=1)["html_hash"] == "hash-a"
+    assert index.lookup(PROMPT, 0.9, owner=2)["html_hash"] == "hash-b"
+
+
+def test_owners_survive_a_restart(tmp_path):
+    path = str(tmp_path / "prompts.sqlite3")
+    PromptIndex(path, max_entries=100).add(PROMPT, "hash-a", owner=1)
+
+    index = PromptIndex(path, max_entries=100)
+
+    assert index.lookup(SIMILAR, 0.6, owner=1)["html_hash"] == "hash-a"
+    assert index.lookup(SIMILAR, 0.6, owner=2) is None
+
+
+def test_entries_without_an_owner_are_dropped(tmp_path):
+    path = str(tmp_path / "prompts.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE prompts (id INTEGER PRIMARY KEY, prompt TEXT NOT NULL, html_hash TEXT NOT NULL, "
+        "signature BLOB NOT NULL, last_used REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO prompts VALUES (1, 'old', 'hash', x'00', 0)")
+    conn.commit()
+    conn.close()
+
+    assert len(PromptIndex(path, max_entries=100)) == 0
+
+
+def test_reuse_is_scoped_to_the_user_and_hides_the_matched_prompt(app_client, provider):
+    page = (
+        "===ANALYSIS_START===\nA bakery.\n===ANALYSIS_END===\n===CODE_START===\n"
+        "<!DOCTYPE html><html><body><h1>Bakery</h1></body></html>\n===CODE_END===\n"
+        "===SUMMARY_START===\nDone.\n===SUMMARY_END===\n"
+    )
+    provider.handler = lambda body: text_reply(page)
+    owner = register(app_client, "reuse-owner")
+    other = register(app_client, "reuse-other")
+    app_client.post("/api/generate", json={"prompt": PROMPT}, headers=owner)
+
+    response = app_client.post("/api/generate", json={"prompt": SIMILAR, "reuse": "return"}, headers=other)
+    assert not any(event == "reuse" for event, _ in sse_events(response.text))
+    assert len(provider.requests) == 2
+
+    response = app_client.post("/api/generate", json={"prompt": SIMILAR, "reuse": "return"}, headers=owner)
+    reuse = [json.loads(data) for event, data in sse_events(response.text) if event == "reuse"]
+    assert len(reuse) == 1 and "prompt" not in reuse[0]
+    assert reuse[0]["mode"] == "return"
+    assert len(provider.requests) == 2
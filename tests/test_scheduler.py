@@ -0,0 +1,134 @@
+import asyncio
+import time
+import pytest
+from backend.core.config import settings
+from backend.services import scheduler
+from backend.services.scheduler import PRIORITY_EDIT, PRIORITY_FULL, Rejected, Scheduler, SlotStore
+
+
+@pytest.fixture
+def store():
+    return SlotStore(":memory:")
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_GLOBAL_SLOTS", 2)
+    monkeypatch.setattr(settings, "SCHEDULER_USER_SLOTS", 1)
+    monkeypatch.setattr(settings, "SCHEDULER_MAX_QUEUE", 2)
+    monkeypatch.setattr(settings, "SCHEDULER_MAX_WAIT", 0.2)
+    monkeypatch.setattr(settings, "SCHEDULER_POLL_MS", 10)
+    monkeypatch.setattr(settings, "SCHEDULER_BURST", 5)
+    monkeypatch.setattr(settings, "SCHEDULER_RATE_PER_MINUTE", 60)
+
+
+def hold_slot(store: SlotStore, lease_id: str, user_id: str, ttl: float = 60) -> None:
+    store.enqueue(lease_id, user_id, PRIORITY_FULL, None)
+    assert store.try_admit(lease_id, 1, 1, ttl)[0]
+
+
+def test_edits_are_admitted_ahead_of_earlier_full_generations(store):
+    hold_slot(store, "running", "a")
+    store.enqueue("full", "b", PRIORITY_FULL, None)
+    store.enqueue("edit", "c", PRIORITY_EDIT, None)
+
+    assert store.try_admit("full", 1, 1, 60) == (False, 1)
+    store.release("running")
+
+    assert store.try_admit("full", 1, 1, 60) == (False, 1)
+    assert store.try_admit("edit", 1, 1, 60) == (True, 0)
+
+
+def test_a_user_at_the_cap_does_not_block_other_users(store):
+    hold_slot(store, "running", "a")
+    store.enqueue("a-again", "a", PRIORITY_FULL, None)
+    store.enqueue("b", "b", PRIORITY_FULL, None)
+
+    assert store.try_admit("a-again", 10, 1, 60) == (False, 0)
+    assert store.try_admit("b", 10, 1, 60) == (True, 0)
+
+
+def test_token_bucket_refills_at_the_configured_rate(store):
+    assert [store.take_token("a", rate=1.0, burst=2) for _ in range(2)] == [0.0, 0.0]
+    wait = store.take_token("a", rate=1.0, burst=2)
+    assert 0 < wait <= 1
+    assert store.take_token("b", rate=1.0, burst=2) == 0.0
+    time.sleep(wait)
+    assert store.take_token("a", rate=1.0, burst=2) == 0.0
+
+
+def test_expired_leases_free_their_slot(store):
+    hold_slot(store, "crashed", "a", ttl=0.05)
+    time.sleep(0.1)
+    store.enqueue("next", "a", PRIORITY_FULL, None)
+
+    assert store.try_admit("next", 1, 1, 60) == (True, 0)
+    assert store.counts() == (1, 0)
+
+
+@pytest.mark.anyio
+async def test_waiting_too_long_is_rejected_with_retry_after(store, limits):
+    sched = Scheduler(store)
+    lease = await sched.acquire("a")
+
+    with pytest.raises(Rejected) as rejected:
+        await sched.acquire("a")
+    response = scheduler.rejection_response(rejected.value)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert rejected.value.queue_position == 0
+    assert store.counts() == (1, 0)
+    await lease.release()
+    assert store.counts() == (0, 0)
+
+
+@pytest.mark.anyio
+async def test_full_queue_is_rejected_and_refunds_the_rate_token(store, limits, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_MAX_QUEUE", 0)
+    monkeypatch.setattr(settings, "SCHEDULER_BURST", 1)
+    sched = Scheduler(store)
+
+    for _ in range(3):
+        with pytest.raises(Rejected) as rejected:
+            await sched.acquire("a")
+        assert str(rejected.value) == "Too many requests are queued"
+
+
+@pytest.mark.anyio
+async def test_rate_limit_is_rejected_with_retry_after(store, limits, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_BURST", 1)
+    sched = Scheduler(store)
+    lease = await sched.acquire("a")
+    await lease.release()
+
+    with pytest.raises(Rejected) as rejected:
+        await sched.acquire("a")
+
+    assert str(rejected.value) == "Rate limit exceeded"
+    assert scheduler.rejection_response(rejected.value).headers["Retry-After"] == "1"
+
+
+@pytest.mark.anyio
+async def test_a_held_stream_that_never_starts_gives_its_slot_back(store, limits, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_START_TIMEOUT", 0.05)
+    sched = Scheduler(store)
+
+    gate = asyncio.Event()
+
+    async def events():
+        yield "code.delta", "<html>"
+        await gate.wait()
+        yield "code.delta", "</html>"
+
+    started = await sched.acquire("a")
+    held = started.hold(events())
+    assert await held.__anext__() == ("code.delta", "<html>")
+    unstarted = await sched.acquire("b")
+    unstarted.hold(events())  # e.g. the client left before the response began
+    await asyncio.sleep(0.2)
+
+    assert store.counts() == (1, 0)
+    gate.set()
+    assert [event async for event in held] == [("code.delta", "</html>")]
+    assert store.counts() == (0, 0)
@@ -0,0 +1,45 @@
+import json
+from backend.services.section_parser import SectionParser
+
+RESPONSE = (
+    "===ANALYSIS_START===\nA cafe.\n===ANALYSIS_END===\n"
+    "===CODE_START===\n<html><script>if (a === b) { s = '=='; }</script></html>\n===CODE_END===\n"
+    "===SUMMARY_START===\nDone.\n===SUMMARY_END===\n"
+)
+
+
+def parse(pieces):
+    parser = SectionParser()
+    events = []
+    for piece in pieces:
+        events.extend(parser.feed(piece))
+    events.extend(parser.finish())
+    sections = {}
+    for event, data in events:
+        if event.endswith(".delta"):
+            sections[event[:-6]] = sections.get(event[:-6], "") + data
+    return sections, json.loads(events[-1][1])
+
+
+def test_sections_of_a_whole_response():
+    sections, done = parse([RESPONSE])
+    assert sections["analysis"].strip() == "A cafe."
+    assert sections["code"].strip() == "<html><script>if (a === b) { s = '=='; }</script></html>"
+    assert sections["summary"].strip() == "Done."
+    assert done == {"sections": ["analysis", "code", "summary"], "code_complete": True}
+
+
+def test_markers_split_at_every_chunk_boundary():
+    expected = parse([RESPONSE])
+    for cut in range(1, len(RESPONSE)):
+        assert parse([RESPONSE[:cut], RESPONSE[cut:]]) == expected, cut
+
+
+def test_single_character_chunks():
+    assert parse(list(RESPONSE)) == parse([RESPONSE])
+
+
+def test_truncated_code_is_not_complete():
+    sections, done = parse([RESPONSE[:RESPONSE.index("===CODE_END===")]])
+    assert "<html>" in sections["code"]
+    assert done["code_complete"] is False
@@ -0,0 +1,107 @@
+from uuid import UUID
+import pytest
+from backend.services import projects
+from tests.env import register
+
+PAGE = "<!DOCTYPE html><html><body>" + "".join(f"<p>Row {i} of the menu.</p>" for i in range(400)) + "</body></html>"
+
+
+def published_project(client, name: str, html: str = PAGE):
+    """Headers of a new user and the id of their project, saved with one version."""
+    headers = register(client, name)
+    user_id = UUID(client.get("/api/users/me", headers=headers).json()["id"])
+    project_id = projects.save_version(user_id, None, None, html, "a menu")["project_id"]
+    return headers, user_id, project_id
+
+
+def test_republishing_keeps_the_slug_and_serves_the_new_version(app_client):
+    headers, user_id, project_id = published_project(app_client, "publisher")
+    first = app_client.post(f"/api/projects/{project_id}/site", headers=headers).json()
+    assert app_client.get(first["url"], headers={"Accept-Encoding": "identity"}).text == PAGE
+
+    head = app_client.get(f"/api/projects/{project_id}", headers=headers).json()
+    edited = PAGE.replace("Row 0", "Row zero")
+    projects.save_version(user_id, project_id, UUID(head["head_version_id"]), edited, "rename row 0")
+    second = app_client.post(f"/api/projects/{project_id}/site", headers=headers).json()
+
+    assert second["slug"] == first["slug"]
+    assert second["etag"] != first["etag"]
+    assert second["published_at"] > first["published_at"]
+    assert app_client.get(second["url"], headers={"Accept-Encoding": "identity"}).text == edited
+
+
+def test_each_encoding_revalidates_against_its_own_etag(app_client):
+    headers, _, project_id = published_project(app_client, "revalidator")
+    url = app_client.post(f"/api/projects/{project_id}/site", headers=headers).json()["url"]
+
+    plain = app_client.get(url, headers={"Accept-Encoding": "identity"})
+    packed = app_client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in plain.headers
+    assert packed.headers["content-encoding"] == "gzip"
+    assert packed.headers["vary"] == "Accept-Encoding"
+    assert plain.headers["etag"] != packed.headers["etag"]
+
+    for encoding, etag in (("identity", plain.headers["etag"]), ("gzip", packed.headers["etag"])):
+        response = app_client.get(url, headers={"Accept-Encoding": encoding, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+    # the gzip validator does not revalidate the identity representation
+    stale = app_client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": packed.headers["etag"]})
+    assert stale.status_code == 200
+
+
+def test_the_smallest_accepted_variant_is_served(app_client):
+    headers, _, project_id = published_project(app_client, "negotiator")
+    site = app_client.post(f"/api/projects/{project_id}/site", headers=headers).json()
+
+    response = app_client.get(site["url"], headers={"Accept-Encoding": "gzip;q=1, identity;q=0.5"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(PAGE)
+    assert response.text == PAGE
+
+    refused = app_client.get(site["url"], headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in refused.headers
+    assert refused.text == PAGE
+
+
+def test_brotli_is_preferred_when_accepted(app_client):
+    pytest.importorskip("brotli")
+    headers, _, project_id = published_project(app_client, "brotli-reader")
+    url = app_client.post(f"/api/projects/{project_id}/site", headers=headers).json()["url"]
+
+    assert app_client.get(url, headers={"Accept-Encoding": "gzip, br"}).headers["content-encoding"] == "br"
+    assert app_client.get(url, headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+
+
+def test_range_requests_are_answered_from_the_stored_file(app_client):
+    headers, _, project_id = published_project(app_client, "ranger")
+    url = app_client.post(f"/api/projects/{project_id}/site", headers=headers).json()["url"]
+    etag = app_client.get(url, headers={"Accept-Encoding": "identity"}).headers["etag"]
+
+    partial = app_client.get(url, headers={"Accept-Encoding": "identity", "Range": "bytes=0-14"})
+    assert partial.status_code == 206
+    assert partial.content == PAGE.encode()[:15]
+    assert partial.headers["content-range"] == f"bytes 0-14/{len(PAGE)}"
+
+    current = app_client.get(url, headers={"Accept-Encoding": "identity", "Range": "bytes=0-14", "If-Range": etag})
+    assert current.status_code == 206
+    changed = app_client.get(url, headers={"Accept-Encoding": "identity", "Range": "bytes=0-14", "If-Range": '"other"'})
+    assert changed.status_code == 200
+    assert changed.content == PAGE.encode()
+
+
+def test_unpublished_sites_are_gone(app_client):
+    headers, _, project_id = published_project(app_client, "unpublisher")
+    url = app_client.post(f"/api/projects/{project_id}/site", headers=headers).json()["url"]
+    assert app_client.get(url).status_code == 200
+
+    assert app_client.delete(f"/api/projects/{project_id}/site", headers=headers).status_code == 204
+    assert app_client.get(url).status_code == 404
+    assert app_client.get(f"/api/projects/{project_id}/site", headers=headers).status_code == 404
+    assert app_client.delete(f"/api/projects/{project_id}/site", headers=headers).status_code == 404
+
+
+def test_other_users_cannot_publish_a_project(app_client):
+    _, _, project_id = published_project(app_client, "owner")
+    intruder = register(app_client, "intruder")
+    assert app_client.post(f"/api/projects/{project_id}/site", headers=intruder).status_code == 404
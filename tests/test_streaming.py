@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+from backend.services.streaming import coalesce, format_sse
+
+
+async def collect(source):
+    return [event async for event in source]
+
+
+async def events(*items, delay: float = 0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+def test_format_sse_splits_multiline_data():
+    assert format_sse("a\nb\r\nc", "code.delta") == b"event: code.delta\ndata: a\ndata: b\ndata: c\n\n"
+
+
+@pytest.mark.anyio
+async def test_coalesce_merges_deltas_and_passes_control_events():
+    source = events(
+        ("code.delta", "<p>"), ("code.delta", "hi"), ("code.delta", "</p>"),
+        ("done", "{}"),
+        ("summary.delta", "ok"),
+    )
+    frames = await collect(coalesce(source, max_bytes=1024, max_latency=1.0))
+    assert frames == [("code.delta", "<p>hi</p>"), ("done", "{}"), ("summary.delta", "ok")]
+
+
+@pytest.mark.anyio
+async def test_coalesce_flushes_by_size_and_by_age():
+    by_size = await collect(coalesce(events(*[("code.delta", "abcd")] * 4), max_bytes=8, max_latency=1.0))
+    assert by_size == [("code.delta", "abcdabcd"), ("code.delta", "abcdabcd")]
+
+    slow = events(("code.delta", "a"), ("code.delta", "b"), delay=0.05)
+    by_age = await collect(coalesce(slow, max_bytes=1024, max_latency=0.01))
+    assert by_age == [("code.delta", "a"), ("code.delta", "b")]
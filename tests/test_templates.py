@@ -0,0 +1,97 @@
+import asyncio
+import uuid
+import pytest
+from backend.core.config import settings
+from backend.schemas.user import CurrentUser
+from tests.env import register
+from tests.fake_provider import Reply, text_reply
+
+
+def test_listing_is_served_with_an_etag_and_revalidates(app_client):
+    response = app_client.get("/api/templates", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert {t["id"] for t in response.json()["templates"]} >= {"saas-landing", "portfolio", "restaurant"}
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        revalidated = app_client.get("/api/templates", headers={"If-None-Match": if_none_match})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["etag"] == etag
+
+    assert app_client.get("/api/templates", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_template_bodies_are_gzipped_when_accepted(app_client):
+    plain = app_client.get("/api/templates/portfolio", headers={"Accept-Encoding": "identity"})
+    raw = app_client.get("/api/templates/portfolio", headers={"Accept-Encoding": "br, gzip"})
+    refused = app_client.get("/api/templates/portfolio", headers={"Accept-Encoding": "gzip;q=0"})
+
+    assert "content-encoding" not in plain.headers
+    assert raw.headers["content-encoding"] == "gzip"
+    assert raw.content == plain.content  # the client decodes it
+    assert int(raw.headers["content-length"]) < len(plain.content)
+    assert "content-encoding" not in refused.headers
+    assert raw.headers["etag"] == plain.headers["etag"]
+    assert app_client.get("/api/templates/missing").status_code == 404
+
+
+def test_listed_etags_match_the_template_responses(app_client):
+    listing = app_client.get("/api/templates").json()["templates"]
+    for item in listing:
+        assert app_client.get(f"/api/templates/{item['id']}").headers["etag"] == item["etag"]
+
+
+def test_library_components_need_no_model_call(app_client, provider):
+    headers = register(app_client, "component-library")
+
+    response = app_client.post("/api/generate-component", json={"type": "Navbar"}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["source"] == "library"
+    assert not provider.requests
+
+
+def test_repeated_component_requests_are_served_from_the_cache(app_client, provider):
+    provider.handler = lambda body: text_reply("```html\n<nav>Bakery</nav>\n```")
+    headers = register(app_client, "component-cache")
+    body = {"component_type": "navbar", "description": "for a  Bakery", "style": "warm"}
+
+    first = app_client.post("/api/generate-component", json=body, headers=headers).json()
+    again = app_client.post(
+        "/api/generate-component", json={**body, "description": "for a bakery"}, headers=headers
+    ).json()
+
+    assert first["source"] == "generated" and first["html"] == "<nav>Bakery</nav>\n"
+    assert again["source"] == "cache" and again["hash"] == first["hash"]
+    assert len(provider.requests) == 1
+
+
+def test_component_errors_do_not_leak_details(app_client, provider):
+    provider.handler = lambda body: Reply(status=400)
+    headers = register(app_client, "component-error")
+
+    response = app_client.post(
+        "/api/generate-component", json={"component_type": "navbar", "description": "broken"}, headers=headers
+    )
+
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Internal server error during component generation"
+
+
+@pytest.mark.anyio
+async def test_concurrent_identical_requests_share_one_model_call(provider, monkeypatch):
+    import backend.main  # noqa: F401  (creates the tables)
+    from backend.services import components
+
+    monkeypatch.setattr(settings, "SCHEDULER_ENABLED", False)
+    provider.handler = lambda body: text_reply("<footer>Shared</footer>", delay=0.2)
+    user = CurrentUser(id=uuid.uuid4(), name="coalescer", api_key="user-key")
+
+    results = await asyncio.gather(*[
+        components.get_component("footer", "shared by everyone", None, user) for _ in range(3)
+    ])
+
+    assert len(provider.requests) == 1
+    assert [r["html"] for r in results] == ["<footer>Shared</footer>\n"] * 3